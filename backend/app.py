@@ -1,21 +1,58 @@
 import os
+import atexit
 import eventlet
 eventlet.monkey_patch()  # Patch standard libraries for eventlet
 
-from flask import Flask, request, jsonify, render_template
-from flask_socketio import SocketIO, emit, join_room, leave_room
+from flask import Flask, Response, request, jsonify, render_template, send_file, stream_with_context
+from flask_socketio import SocketIO, ConnectionRefusedError, disconnect, emit, join_room, leave_room
 from flask_cors import CORS
 from dotenv import load_dotenv
 import uuid
+import json
+import click
+import jwt
 from datetime import datetime, timedelta, timezone
 
-from db_utils import supabase
+from db_utils import db, call_timeout, DatabaseUnavailable, UniqueViolation
+from pagination_utils import encode_cursor, decode_cursor, parse_limit
+from cache_utils import TTLCache, ResponseCache, CacheInvalidations
+from signaling_utils import (
+    RoomRegistry, RedisRoomRegistry, RoomRegistryUnavailable, IceCandidateBatcher, TokenBuckets
+)
+from metrics_utils import metrics, instrument_app, instrument_socketio, timed_event
+from write_queue_utils import WriteBehindQueue, WriteQueueFull
+from reaper_utils import ExpiryReaper
+from pii_utils import pii_filter, TextTooLong
+from storage_utils import storage_from_env, STORAGE_BACKEND, StorageError
+from photo_utils import PhotoPipeline, pick_variant, UPLOAD_CONTENT_TYPES, ENCODERS
 from auth_utils import (
-    hash_password, verify_password, generate_jwt, token_required, SECRET_KEY
+    hash_password, verify_password, generate_jwt, revoke_tokens, authenticate, token_required, admin_required,
+    keyring, revocations, user_cache, verified_tokens, PasswordHashingBusy, warm_up_password_hashing
 )
+from startup_utils import WarmUp
+from export_utils import export_ndjson
 
 load_dotenv()
 
+# Rating columns of public.ratings (profile_rating_stats keeps a <key>_sum for each)
+RATING_KEYS = ['honesty', 'communication', 'accountability', 'consistency', 'drama_level']
+
+# Columns of female_profiles a client may request via ?fields= (never invite tokens)
+PROFILE_FIELDS = {'id', 'display_name', 'bio', 'bio_snippet', 'photos', 'cover_photo', 'created_at', 'updated_at'}
+# Default projection for /api/profiles: just enough for a dashboard card
+PROFILE_CARD_FIELDS = ['id', 'display_name', 'cover_photo', 'bio_snippet', 'created_at']
+# Bounds on /api/search?q=; shorter queries match nearly everything, longer ones are abuse
+SEARCH_QUERY_MIN_LENGTH = 2
+SEARCH_QUERY_MAX_LENGTH = 200
+# A query on a very common word ranks most of the table; cap it well below DB_TIMEOUT
+SEARCH_DB_TIMEOUT = float(os.environ.get("SEARCH_DB_TIMEOUT", 3))
+# Most ids one moderation request may approve/reject (one UPDATE, one round-trip)
+MODERATION_BATCH_MAX = int(os.environ.get("MODERATION_BATCH_MAX", 500))
+MODERATION_STATUSES = {'approved', 'rejected'}
+# What a moderator needs to judge each pending item
+EXPERIENCE_REVIEW_FIELDS = 'id, profile_id, user_id, experience_text, tags, created_at'
+PROFILE_REVIEW_FIELDS = 'id, display_name, bio, photos, created_by_user_id, created_at'
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get("JWT_SECRET")
 
@@ -37,6 +74,8 @@ CORS(app, resources={
     }
 })
 
+SOCKETIO_DEBUG = os.environ.get("SOCKETIO_DEBUG", "0") == "1"
+
 socketio = SocketIO(
     app, 
     cors_allowed_origins=[
@@ -49,11 +88,224 @@ socketio = SocketIO(
         "http://localhost:3000"
     ],
     async_mode='eventlet',
-    logger=True,
-    engineio_logger=True
+    # e.g. redis://host:6379/0 -- relays emits between gunicorn workers and Fly
+    # machines so peers in one room may be connected to different processes
+    message_queue=os.environ.get("SOCKETIO_MESSAGE_QUEUE"),
+    channel=os.environ.get("SOCKETIO_CHANNEL", "bro-socketio"),
+    # Per-packet logging is expensive on the single worker; opt in with SOCKETIO_DEBUG=1
+    logger=SOCKETIO_DEBUG,
+    engineio_logger=SOCKETIO_DEBUG,
+    # Largest frame accepted; a bigger one closes the connection before it is read.
+    # Keep it above MAX_SDP_BYTES plus the message envelope.
+    max_http_buffer_size=int(os.environ.get("SOCKETIO_MAX_MESSAGE_BYTES", 32768))
+)
+
+# === METRICS ===
+# Route, Socket.IO handler and Supabase call timings, served on /metrics.
+# Set METRICS_TOKEN to require `Authorization: Bearer <token>` for scrapes.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+instrument_app(app)
+instrument_socketio(socketio)
+metrics.register_cache('user', user_cache)
+metrics.register_cache('verified_token', verified_tokens)
+
+# === RESPONSE CACHE ===
+# Serialized bodies of the profile read endpoints. Scopes:
+#   'profiles'          -> /api/profiles listing (bumped when moderation status changes)
+#   'profile:<id>'      -> /api/profiles/<id> (bumped by experiences, ratings, votes, approval)
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 300))
+response_cache = ResponseCache(
+    maxsize=int(os.environ.get("RESPONSE_CACHE_SIZE", 512)),
+    ttl=RESPONSE_CACHE_TTL
+)
+# experience_id -> profile_id, so a vote knows which profile's cache to bump
+experience_profiles = TTLCache(maxsize=20000, ttl=RESPONSE_CACHE_TTL)
+# Approved profile ids, so repeat ratings skip the existence check
+rateable_profiles = TTLCache(maxsize=20000, ttl=RESPONSE_CACHE_TTL)
+metrics.register_cache('response', response_cache)
+metrics.register_cache('experience_profile', experience_profiles)
+metrics.register_cache('rateable_profile', rateable_profiles)
+
+# Result pages of /api/search, keyed by normalized query. Small and short-lived:
+# only popular queries repeat, and experience moderation changes results without
+# bumping anything, so SEARCH_CACHE_TTL bounds staleness. Scope 'search' drops them all.
+search_cache = ResponseCache(
+    maxsize=int(os.environ.get("SEARCH_CACHE_SIZE", 256)),
+    ttl=float(os.environ.get("SEARCH_CACHE_TTL", 60))
+)
+metrics.register_cache('search', search_cache)
+
+# Both caches live in each worker. With a Redis SOCKETIO_MESSAGE_QUEUE every bump
+# is also published there and applied by the other workers; without one, run a
+# single worker (WEB_CONCURRENCY=1) or other workers serve stale bodies and
+# ETags for up to RESPONSE_CACHE_TTL after a write.
+cache_invalidations = None
+if os.environ.get("SOCKETIO_MESSAGE_QUEUE", "").startswith(('redis://', 'rediss://')):
+    import redis
+    cache_invalidations = CacheInvalidations(
+        redis.Redis.from_url(os.environ["SOCKETIO_MESSAGE_QUEUE"], socket_timeout=2, socket_connect_timeout=2),
+        channel=os.environ.get("SOCKETIO_CHANNEL", "bro-socketio") + ":cache"
+    )
+    cache_invalidations.attach('response', response_cache)
+    cache_invalidations.attach('search', search_cache)
+
+def cached_json_response(entry):
+    # 200 with a strong ETag, or 304 if it matches the client's If-None-Match
+    body, etag = entry
+    response = Response(body, status=200, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+# === WRITE-BEHIND QUEUE ===
+# Ratings, votes and audit_log rows are acknowledged at once and written in bulk
+# every WRITE_QUEUE_FLUSH_MS; repeat ratings/votes by one user within a window
+# collapse into a single upsert. The journal survives process restarts; point
+# WRITE_QUEUE_JOURNAL at a Fly volume to also survive machine replacement. With
+# WEB_CONCURRENCY > 1 each worker locks a journal of its own (WRITE_QUEUE_JOURNAL,
+# then .1, .2, ...) and adopts any left unlocked by a worker that has gone.
+
+def invalidate_flushed_profiles(written):
+    # Runs after each flush, so cached bundles are dropped only once the DB has the rows
+    scopes = {f"profile:{row['profile_id']}" for row in written.get('rating', ())}
+    unknown = []
+    for experience_id in {row['experience_id'] for row in written.get('vote', ())}:
+        profile_id = experience_profiles.get(experience_id)
+        if profile_id:
+            scopes.add(f'profile:{profile_id}')
+        else:
+            unknown.append(experience_id)
+    if unknown:
+        for experience_id, profile_id in db.get_experience_profile_ids(unknown).items():
+            experience_profiles.set(experience_id, profile_id)
+            scopes.add(f'profile:{profile_id}')
+    if scopes:
+        response_cache.bump(*scopes)
+
+# Queued rows are written after the client has its 202, so the routes check
+# what the database would reject (type, range, target) before queuing them
+
+def is_int_between(value, low: int, high: int) -> bool:
+    # bool is an int subclass: True must not pass for 1
+    return isinstance(value, int) and not isinstance(value, bool) and low <= value <= high
+
+def is_rateable_profile(profile_id: str) -> bool:
+    if rateable_profiles.get(profile_id) is None:
+        if profile_id not in db.get_approved_profile_ids([profile_id]):
+            return False
+        rateable_profiles.set(profile_id, True)
+    return True
+
+def get_experience_profile_id(experience_id: str):
+    profile_id = experience_profiles.get(experience_id)
+    if profile_id is None:
+        profile_id = db.get_experience_profile_ids([experience_id]).get(experience_id)
+        if profile_id:
+            experience_profiles.set(experience_id, profile_id)
+    return profile_id
+
+write_queue = WriteBehindQueue(
+    writers={
+        'rating': (('profile_id', 'user_id'), db.upsert_ratings),
+        'vote': (('experience_id', 'user_id'), db.upsert_votes),
+        'audit': (None, db.insert_audit_entries),  # last, after the rows it describes
+    },
+    journal_path=os.environ.get("WRITE_QUEUE_JOURNAL", "write_queue.journal"),
+    window=float(os.environ.get("WRITE_QUEUE_FLUSH_MS", 500)) / 1000,
+    batch_size=int(os.environ.get("WRITE_QUEUE_BATCH_SIZE", 500)),
+    max_pending=int(os.environ.get("WRITE_QUEUE_MAX_PENDING", 5000)),
+    fsync=os.environ.get("WRITE_QUEUE_FSYNC", "0") == "1",
+    on_flush=invalidate_flushed_profiles
+)
+# gunicorn's graceful SIGTERM shutdown ends in a normal interpreter exit
+atexit.register(write_queue.drain, float(os.environ.get("WRITE_QUEUE_DRAIN_TIMEOUT", 20)))
+
+# === PHOTO PIPELINE ===
+# The approve page PUTs originals to the private upload bucket through short-lived
+# signed URLs from /public/approve/uploads. Completing the invite queues them for
+# PHOTO_WORKERS green threads that strip EXIF and render WebP/AVIF variants at
+# PHOTO_WIDTHS into the public photo bucket, one render at a time so the worker
+# holds a single decoded image; the profile waits in 'processing' until they
+# are stored in `photos`, then moves to 'pending' moderation.
+# STORAGE_BACKEND=local keeps both buckets under STORAGE_LOCAL_ROOT, served below.
+PHOTO_UPLOAD_BUCKET = os.environ.get("PHOTO_UPLOAD_BUCKET", "photo_uploads")
+PHOTO_BUCKET = os.environ.get("PHOTO_BUCKET", "profile_photos")
+PHOTO_WIDTHS = sorted({int(w) for w in os.environ.get("PHOTO_WIDTHS", "320,640,1280").split(',')})
+# Any of ENCODERS; one this Pillow build can't encode (AVIF on some builds) is skipped
+PHOTO_FORMATS = [f for f in os.environ.get("PHOTO_FORMATS", "webp,avif").split(',') if f in ENCODERS]
+PHOTO_MAX_FILES = int(os.environ.get("PHOTO_MAX_FILES", 3))
+PHOTO_MAX_UPLOAD_BYTES = int(os.environ.get("PHOTO_MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+PHOTO_UPLOAD_URL_TTL = int(os.environ.get("PHOTO_UPLOAD_URL_TTL", 300))
+# Cover variant for listing cards when the client doesn't send ?photo_width=
+PROFILE_CARD_PHOTO_WIDTH = int(os.environ.get("PROFILE_CARD_PHOTO_WIDTH", 320))
+
+upload_storage = storage_from_env(PHOTO_UPLOAD_BUCKET)
+photo_storage = storage_from_env(PHOTO_BUCKET)
+photo_pipeline = PhotoPipeline(
+    db, upload_storage, photo_storage,
+    widths=PHOTO_WIDTHS,
+    formats=PHOTO_FORMATS,
+    workers=int(os.environ.get("PHOTO_WORKERS", 2)),
+    queue_size=int(os.environ.get("PHOTO_QUEUE_SIZE", 50)),
+    max_upload_bytes=PHOTO_MAX_UPLOAD_BYTES,
+    recover_interval=float(os.environ.get("PHOTO_RECOVER_INTERVAL", 300))
 )
 
+def upload_key_prefix(profile_id):
+    # Each invite may only hand its own uploads to the pipeline
+    return f"uploads/{profile_id}/"
+
+def card_photo_width():
+    # ?photo_width= (card width x devicePixelRatio) snapped up to a rendered width,
+    # so cache keys stay few whatever the screens ask for
+    try:
+        wanted = int(request.args.get('photo_width', PROFILE_CARD_PHOTO_WIDTH))
+    except ValueError:
+        wanted = PROFILE_CARD_PHOTO_WIDTH
+    return next((w for w in PHOTO_WIDTHS if w >= wanted), PHOTO_WIDTHS[-1])
 
+def attach_cover_variants(profiles, width):
+    # Swap each cover_photo for its smallest variant at least `width` wide; legacy
+    # profiles (a plain URL, no variants) keep theirs
+    for profile in profiles:
+        variants = profile.pop('cover_variants', None)
+        if not variants:
+            continue
+        webp, avif = pick_variant(variants, width, 'webp'), pick_variant(variants, width, 'avif')
+        if webp:
+            profile['cover_photo'] = webp['url']
+        profile['cover_photo_avif'] = avif['url'] if avif else None
+
+@app.before_request
+def start_background_tasks():
+    # Started by the first request (Fly's health check counts) rather than at
+    # import, so `flask` CLI commands never replay the journal or reap
+    write_queue.start()
+    revocations.start()
+    if cache_invalidations:
+        cache_invalidations.start()
+    if REAPER_ENABLED:
+        expiry_reaper.start()
+    photo_pipeline.start()
+
+def audit_entry(user_id, action, target_table, target_id, **details):
+    # entry_id is fixed now, so a journal replay of an entry already written is a no-op
+    return {
+        'entry_id': str(uuid.uuid4()),
+        'user_id': user_id,
+        'action': action,
+        'target_table': target_table,
+        'target_id': target_id,
+        'details': details or None,
+        'timestamp': datetime.now(timezone.utc).isoformat()
+    }
+
+def record_audit(*args, **details):
+    # For actions whose own write already succeeded: never fail the request over the log
+    try:
+        write_queue.enqueue('audit', audit_entry(*args, **details))
+    except WriteQueueFull:
+        app.logger.warning("Write queue full, audit entry dropped: %s", args)
 
 # === ERROR HANDLING ===
 @app.errorhandler(404)
@@ -64,11 +316,85 @@ def not_found(e):
 def internal_error(e):
     return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
 
+# === STARTUP ===
+# Fly stops idle machines (min_machines_running = 0), so requests often land on a
+# cold worker. Imports only some requests need (supabase-py, passlib) are deferred,
+# and WARM_UP runs the rest in the background as soon as gunicorn has booted the
+# worker (see gunicorn.conf.py): building the supabase client and opening its
+# connection (and DB_POOL_MIN direct Postgres connections), and loading bcrypt.
+# /ready answers 503 until that has succeeded; / only says the process is up.
+WARM_UP = os.environ.get("WARM_UP", "1") == "1"
+warm_up = WarmUp(
+    [('database', db.warm_up), ('password_hashing', warm_up_password_hashing)],
+    timeout=float(os.environ.get("WARM_UP_TIMEOUT", 10))
+)
+
 # === HEALTH CHECK ===
 @app.route('/')
 def index():
+    # Liveness: the worker is up, whether or not it can reach the database yet
     return jsonify({"status": "BRO API is running"}), 200
 
+@app.route('/ready')
+def readiness():
+    # Readiness: 200 once warm-up has succeeded; until then 503, and another attempt
+    if warm_up.ready:
+        return jsonify(warm_up.stats()), 200
+    warm_up.start()
+    return jsonify(warm_up.stats()), 503
+
+@app.route('/health/caches')
+def cache_stats():
+    # Hit/miss counters for the in-process caches
+    return jsonify({
+        "user_cache": user_cache.stats(),
+        "verified_token_cache": verified_tokens.stats(),
+        "response_cache": response_cache.stats(),
+        "search_cache": search_cache.stats(),
+        "redeem_room_cache": redeem_rooms.stats(),
+        "invalidations": cache_invalidations.stats() if cache_invalidations else None
+    }), 200
+
+@app.route('/metrics')
+def prometheus_metrics():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/health/db')
+def db_stats():
+    # Active backend, pool size and circuit breaker state
+    return jsonify(db.stats()), 200
+
+@app.route('/health/write-queue')
+def write_queue_stats():
+    # Pending write-behind rows per kind and flush health
+    return jsonify(write_queue.stats()), 200
+
+@app.route('/health/signaling')
+def signaling_stats():
+    # Live Socket.IO rooms/peers on this process, and the per-socket rate limits
+    return jsonify({**room_registry.stats(), "rate_limits": signaling_limits.stats()}), 200
+
+@app.route('/health/auth')
+def auth_stats():
+    # Signing key ids (never the keys) and revocation list freshness
+    return jsonify({
+        "active_kid": keyring.active_kid,
+        "kids": keyring.kids,
+        "revocations": revocations.stats()
+    }), 200
+
+@app.route('/health/reaper')
+def reaper_stats():
+    # Expired sessions/invites handled so far and the last pass
+    return jsonify(expiry_reaper.stats()), 200
+
+@app.route('/health/photos')
+def photo_stats():
+    # Photo jobs queued/in progress on this process and the variants produced
+    return jsonify(photo_pipeline.stats()), 200
+
 # === AUTHENTICATION ROUTES ===
 
 @app.route('/auth/register', methods=['POST'])
@@ -84,18 +410,17 @@ def register():
             'username': data['username'],
             'password_hash': hashed_pw
         }
-        res = supabase.table('users').insert(new_user).execute()
-        
-        if res.data:
-            return jsonify({"message": "User registered successfully"}), 201
-        else:
-            # Check for unique constraint violation
-            if "users_email_key" in str(res.error):
-                return jsonify({"error": "Email already exists"}), 409
-            if "users_username_key" in str(res.error):
-                return jsonify({"error": "Username already exists"}), 409
-            return jsonify({"error": "Failed to register user", "details": str(res.error)}), 500
-            
+        db.create_user(new_user)
+        return jsonify({"message": "User registered successfully"}), 201
+
+    except UniqueViolation as e:
+        if e.constraint == "users_email_key":
+            return jsonify({"error": "Email already exists"}), 409
+        if e.constraint == "users_username_key":
+            return jsonify({"error": "Username already exists"}), 409
+        return jsonify({"error": "Failed to register user", "details": str(e)}), 500
+    except PasswordHashingBusy:
+        return jsonify({"error": "Server busy, please retry shortly"}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -106,17 +431,31 @@ def login():
         return jsonify({"error": "Missing username or password"}), 400
 
     try:
-        res = supabase.table('users').select('*').eq('username', data['username']).execute()
-        if not res.data:
+        user = db.get_user_by_username(data['username'])
+        if not user:
             return jsonify({"error": "Invalid username or password"}), 401
 
-        user = res.data[0]
         if verify_password(data['password'], user['password_hash']):
-            token = generate_jwt(user['id'], user['email'])
+            token = generate_jwt(user['id'], user['email'], user.get('token_version', 0), user.get('is_admin'))
             return jsonify({"token": token, "username": user['username']}), 200
         else:
             return jsonify({"error": "Invalid username or password"}), 401
     
+    except PasswordHashingBusy:
+        return jsonify({"error": "Server busy, please retry shortly"}), 503, {"Retry-After": "1"}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/auth/revoke', methods=['POST'])
+@token_required
+def revoke_sessions(current_user, current_user_id, **kwargs):
+    # Sign out everywhere: every token issued so far (including this one) stops working
+    try:
+        revoke_tokens(current_user_id)
+        record_audit(current_user_id, 'tokens_revoked', 'users', current_user_id)
+        return jsonify({"message": "All sessions signed out."}), 200
+    except DatabaseUnavailable:
+        return jsonify({"error": "Service temporarily unavailable"}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -127,54 +466,110 @@ def login():
 @app.route('/api/profiles', methods=['GET'])
 @token_required
 def get_profiles(current_user, **kwargs):
-    # Get all profiles that are approved
+    # Get approved profiles, newest first, one keyset page at a time
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        cursor = decode_cursor(request.args['cursor'], 2) if request.args.get('cursor') else None
+        if cursor:
+            cursor[1] = str(uuid.UUID(str(cursor[1])))
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    if request.args.get('fields'):
+        fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+        if not set(fields) <= PROFILE_FIELDS:
+            return jsonify({"error": f"fields must be a subset of: {', '.join(sorted(PROFILE_FIELDS))}"}), 400
+    else:
+        fields = PROFILE_CARD_FIELDS
+    # id and created_at are needed to build next_cursor
+    columns = list(dict.fromkeys(['id', 'created_at', *fields]))
+    photo_width = None
+    if 'cover_photo' in columns:
+        columns.append('cover_variants')
+        photo_width = card_photo_width()
+
+    cache_key = response_cache.key(('profiles', limit, tuple(cursor or ()), tuple(columns), photo_width), ['profiles'])
+    entry = response_cache.get(cache_key)
+    if entry:
+        return cached_json_response(entry)
+
     try:
-        res = supabase.table('female_profiles').select('*').eq('moderation_status', 'approved').execute()
-        return jsonify(res.data), 200
+        rows = db.list_approved_profiles(columns, limit + 1, cursor)
+
+        profiles = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = profiles[-1]
+            next_cursor = encode_cursor(last['created_at'], last['id'])
+        if photo_width:
+            attach_cover_variants(profiles, photo_width)
+
+        body = app.json.dumps({"profiles": profiles, "next_cursor": next_cursor}).encode()
+        return cached_json_response(response_cache.set(cache_key, body))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/search', methods=['GET'])
+@token_required
+def search_profiles(current_user, **kwargs):
+    # Approved profiles matching ?q= in their name/bio or their experiences, best match first
+    query = ' '.join(request.args.get('q', '').split())
+    if not SEARCH_QUERY_MIN_LENGTH <= len(query) <= SEARCH_QUERY_MAX_LENGTH:
+        return jsonify({"error": f"q must be {SEARCH_QUERY_MIN_LENGTH}-{SEARCH_QUERY_MAX_LENGTH} characters"}), 400
+    try:
+        limit = parse_limit(request.args.get('limit'), maximum=50)
+        cursor = decode_cursor(request.args['cursor'], 2) if request.args.get('cursor') else None
+        if cursor:
+            cursor = [float(cursor[0]), str(uuid.UUID(str(cursor[1])))]
+    except (ValueError, TypeError):
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    photo_width = card_photo_width()
+    # Postgres text search is case-insensitive, so "Calm" and "calm" share an entry
+    cache_key = search_cache.key(('search', query.lower(), limit, tuple(cursor or ()), photo_width), ['search'])
+    entry = search_cache.get(cache_key)
+    if entry:
+        return cached_json_response(entry)
+
+    try:
+        with call_timeout(SEARCH_DB_TIMEOUT):
+            rows = db.search_profiles(query, limit + 1, cursor)
+
+        profiles = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = profiles[-1]
+            next_cursor = encode_cursor(last['rank'], last['id'])
+        attach_cover_variants(profiles, photo_width)
+
+        body = app.json.dumps({"profiles": profiles, "next_cursor": next_cursor}).encode()
+        return cached_json_response(search_cache.set(cache_key, body))
+    except DatabaseUnavailable:
+        return jsonify({"error": "Search is busy, please retry shortly"}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/profiles/<profile_id>', methods=['GET'])
 @token_required
 def get_profile_details(profile_id, current_user, **kwargs):
+    cache_key = response_cache.key(('profile', profile_id), [f'profile:{profile_id}'])
+    entry = response_cache.get(cache_key)
+    if entry:
+        return cached_json_response(entry)
+
     try:
-        # 1. Get profile
-        profile_res = supabase.table('female_profiles').select('*').eq('id', profile_id).eq('moderation_status', 'approved').single().execute()
-        if not profile_res.data:
+        # Profile, approved experiences and average ratings in a single round-trip
+        # (see get_profile_bundle in database/schema.sql)
+        profile = db.get_profile_bundle(profile_id)
+        if not profile:
             return jsonify({"error": "Profile not found or not approved"}), 404
-        
-        profile = profile_res.data
 
-        # 2. Get experiences (approved)
-        exp_res = supabase.table('experiences').select('*, user:users(username)').eq('profile_id', profile_id).eq('moderation_status', 'approved').execute()
-        profile['experiences'] = exp_res.data
+        rateable_profiles.set(profile_id, True)
+        for exp in profile['experiences']:
+            experience_profiles.set(exp['id'], profile_id)
 
-        # 3. Get average ratings
-        # This is slow. A better way is a Postgres function or view.
-        # For this build, we'll do it in the backend.
-        ratings_res = supabase.table('ratings').select('honesty, communication, accountability, consistency, drama_level').eq('profile_id', profile_id).execute()
-        
-        avg_ratings = {
-            "honesty": 0, "communication": 0, "accountability": 0,
-            "consistency": 0, "drama_level": 0, "count": 0
-        }
-        if ratings_res.data:
-            count = len(ratings_res.data)
-            avg_ratings['count'] = count
-            for r in ratings_res.data:
-                avg_ratings['honesty'] += r['honesty']
-                avg_ratings['communication'] += r['communication']
-                avg_ratings['accountability'] += r['accountability']
-                avg_ratings['consistency'] += r['consistency']
-                avg_ratings['drama_level'] += r['drama_level']
-            
-            for key in avg_ratings:
-                if key != 'count' and count > 0:
-                    avg_ratings[key] = round(avg_ratings[key] / count, 1)
-
-        profile['average_ratings'] = avg_ratings
-        
-        return jsonify(profile), 200
+        body = app.json.dumps(profile).encode()
+        return cached_json_response(response_cache.set(cache_key, body))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -197,11 +592,12 @@ def create_profile_invite(current_user, current_user_id, **kwargs):
             'moderation_status': 'pending' # Woman must approve *then* admin moderates
         }
         
-        res = supabase.table('female_profiles').insert(new_profile).execute()
-        if not res.data:
-            return jsonify({"error": "Failed to create profile invite", "details": str(res.error)}), 500
+        created = db.create_profile(new_profile)
+        if not created:
+            return jsonify({"error": "Failed to create profile invite"}), 500
         
-        profile_id = res.data[0]['id']
+        profile_id = created['id']
+        record_audit(current_user_id, 'profile_invite_created', 'female_profiles', profile_id)
         # This link would be sent via email/SMS (out of scope)
         invite_link = f"https://bro-bs1zhp3y4-theimma1s-projects.vercel.app/approve.html?token={invite_token}"
         
@@ -220,12 +616,20 @@ def create_profile_invite(current_user, current_user_id, **kwargs):
 @token_required
 def post_experience(profile_id, current_user, current_user_id, **kwargs):
     data = request.get_json()
-    if not data or not data.get('experience_text'):
+    if not data or not isinstance(data.get('experience_text'), str) or not data['experience_text'].strip():
         return jsonify({"error": "Missing experience_text"}), 400
-    
-    # Simple PII filter (replace with a real library in production)
-    if any(char.isdigit() for char in data['experience_text']) or '@' in data['experience_text']:
-         return jsonify({"error": "Experience cannot contain numbers or email addresses to prevent doxxing."}), 400
+
+    # Doxxing filter: phone numbers, emails, handles, URLs, addresses, denylisted terms.
+    # Spans let the frontend highlight what to remove.
+    try:
+        matches = pii_filter.scan(data['experience_text'])
+    except TextTooLong as e:
+        return jsonify({"error": str(e)}), 400
+    if matches:
+        return jsonify({
+            "error": "Experience cannot contain contact details or identifying information (highlighted).",
+            "matches": [{"kind": m.kind, "start": m.start, "end": m.end} for m in matches]
+        }), 400
 
     try:
         new_experience = {
@@ -235,11 +639,14 @@ def post_experience(profile_id, current_user, current_user_id, **kwargs):
             'tags': data.get('tags', []),
             'moderation_status': 'pending' # All posts must be moderated
         }
-        res = supabase.table('experiences').insert(new_experience).execute()
-        if not res.data:
-            return jsonify({"error": "Failed to post experience", "details": str(res.error)}), 500
+        created = db.create_experience(new_experience)
+        if not created:
+            return jsonify({"error": "Failed to post experience"}), 500
+
+        response_cache.bump(f'profile:{profile_id}')
+        record_audit(current_user_id, 'experience_submitted', 'experiences', created['id'], profile_id=profile_id)
         
-        return jsonify({"message": "Experience submitted for moderation.", "data": res.data[0]}), 201
+        return jsonify({"message": "Experience submitted for moderation.", "data": created}), 201
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -247,12 +654,18 @@ def post_experience(profile_id, current_user, current_user_id, **kwargs):
 @app.route('/api/profiles/<profile_id>/rating', methods=['POST'])
 @token_required
 def post_rating(profile_id, current_user, current_user_id, **kwargs):
-    data = request.get_json()
-    required_keys = ['honesty', 'communication', 'accountability', 'consistency', 'drama_level']
-    if not all(key in data and 0 <= data[key] <= 5 for key in required_keys):
-        return jsonify({"error": "Missing or invalid rating keys. Must be 0-5."}), 400
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not all(is_int_between(data.get(key), 0, 5) for key in RATING_KEYS):
+        return jsonify({"error": "Missing or invalid rating keys. Must be integers 0-5."}), 400
+    try:
+        uuid.UUID(profile_id)
+    except ValueError:
+        return jsonify({"error": "Invalid profile id"}), 400
         
     try:
+        if not is_rateable_profile(profile_id):
+            return jsonify({"error": "Profile not found or not approved"}), 404
+
         rating_data = {
             'profile_id': profile_id,
             'user_id': current_user_id,
@@ -264,38 +677,47 @@ def post_rating(profile_id, current_user, current_user_id, **kwargs):
             'updated_at': datetime.now(timezone.utc).isoformat()
         }
         
-        # Use upsert to create or update the user's single rating for this profile
-        res = supabase.table('ratings').upsert(rating_data, on_conflict='profile_id, user_id').execute()
-        
-        if not res.data:
-            return jsonify({"error": "Failed to post rating", "details": str(res.error)}), 500
+        # Upserted (one rating per user per profile) by the write-behind queue
+        write_queue.enqueue('rating', rating_data,
+                            audit=audit_entry(current_user_id, 'rating_submitted', 'female_profiles', profile_id))
             
-        return jsonify({"message": "Rating submitted.", "data": res.data[0]}), 201
+        return jsonify({"message": "Rating submitted.", "data": rating_data}), 202
         
+    except WriteQueueFull:
+        return jsonify({"error": "Server busy, please retry shortly"}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/experiences/<experience_id>/vote', methods=['POST'])
 @token_required
 def vote_on_experience(experience_id, current_user, current_user_id, **kwargs):
-    data = request.get_json()
-    vote = data.get('vote')
-    if vote not in [1, -1]:
+    data = request.get_json(silent=True)
+    vote = data.get('vote') if isinstance(data, dict) else None
+    if not is_int_between(vote, -1, 1) or vote == 0:
         return jsonify({"error": "Vote must be 1 or -1"}), 400
+    try:
+        uuid.UUID(experience_id)
+    except ValueError:
+        return jsonify({"error": "Invalid experience id"}), 400
         
     try:
+        if not get_experience_profile_id(experience_id):
+            return jsonify({"error": "Experience not found"}), 404
+
         vote_data = {
             'experience_id': experience_id,
             'user_id': current_user_id,
             'vote': vote
         }
-        res = supabase.table('experience_votes').upsert(vote_data, on_conflict='experience_id, user_id').execute()
-        
-        if not res.data:
-            return jsonify({"error": "Failed to cast vote", "details": str(res.error)}), 500
+        # Upserted by the write-behind queue; a vote storm on one experience
+        # becomes one row per user per flush
+        write_queue.enqueue('vote', vote_data,
+                            audit=audit_entry(current_user_id, 'vote_cast', 'experiences', experience_id, vote=vote))
         
-        return jsonify({"message": "Vote cast.", "data": res.data[0]}), 201
+        return jsonify({"message": "Vote cast.", "data": vote_data}), 202
         
+    except WriteQueueFull:
+        return jsonify({"error": "Server busy, please retry shortly"}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -318,10 +740,11 @@ def create_redeem_session(profile_id, current_user, current_user_id, **kwargs):
             'is_active': True
         }
         
-        res = supabase.table('redeem_sessions').insert(new_session).execute()
-        if not res.data:
-            return jsonify({"error": "Failed to create redeem session", "details": str(res.error)}), 500
+        if not db.create_redeem_session(new_session):
+            return jsonify({"error": "Failed to create redeem session"}), 500
             
+        redeem_rooms.set(room_name, expires_at)
+        record_audit(current_user_id, 'redeem_session_created', 'female_profiles', profile_id, room_name=room_name)
         redeem_link = f"https://bro-bs1zhp3y4-theimma1s-projects.vercel.app/redeem.html?token={session_token}"
         
         return jsonify({
@@ -335,6 +758,123 @@ def create_redeem_session(profile_id, current_user, current_user_id, **kwargs):
         return jsonify({"error": str(e)}), 500
 
 
+# === ADMIN ROUTES (Moderation) ===
+
+# kind -> (review columns, list query, set-based status update)
+MODERATION_QUEUES = {
+    'experiences': (EXPERIENCE_REVIEW_FIELDS, db.list_pending_experiences, db.moderate_experiences),
+    'profiles': (PROFILE_REVIEW_FIELDS, db.list_pending_profiles, db.moderate_profiles),
+}
+
+def invalidate_moderated(kind, changed):
+    # One pass over every cached response a status change can show up in
+    scopes = {f"profile:{row['profile_id']}" for row in changed}
+    if kind == 'profiles':
+        scopes.add('profiles')
+    if scopes:
+        response_cache.bump(*scopes)
+        search_cache.bump('search')
+
+@app.route('/api/admin/moderation/<kind>', methods=['GET'])
+@token_required
+@admin_required
+def list_moderation_queue(kind, current_user, **kwargs):
+    # Pending items of one kind, oldest first, one keyset page at a time
+    if kind not in MODERATION_QUEUES:
+        return jsonify({"error": f"kind must be one of: {', '.join(MODERATION_QUEUES)}"}), 404
+    try:
+        limit = parse_limit(request.args.get('limit'), default=50, maximum=MODERATION_BATCH_MAX)
+        cursor = decode_cursor(request.args['cursor'], 2) if request.args.get('cursor') else None
+        if cursor:
+            cursor[1] = str(uuid.UUID(str(cursor[1])))
+    except ValueError:
+        return jsonify({"error": "Invalid limit or cursor"}), 400
+
+    columns, list_pending, _ = MODERATION_QUEUES[kind]
+    try:
+        rows = list_pending(columns, limit + 1, cursor)
+
+        items = rows[:limit]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last['created_at'], last['id'])
+
+        return jsonify({"items": items, "next_cursor": next_cursor}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/admin/moderation/<kind>', methods=['POST'])
+@token_required
+@admin_required
+def moderate_items(kind, current_user, current_user_id, **kwargs):
+    # Approve or reject many pending items at once: {"ids": [...], "status": "approved"}
+    if kind not in MODERATION_QUEUES:
+        return jsonify({"error": f"kind must be one of: {', '.join(MODERATION_QUEUES)}"}), 404
+    data = request.get_json(silent=True) or {}
+    if data.get('status') not in MODERATION_STATUSES:
+        return jsonify({"error": f"status must be one of: {', '.join(sorted(MODERATION_STATUSES))}"}), 400
+    ids = data.get('ids')
+    if not isinstance(ids, list) or not 1 <= len(ids) <= MODERATION_BATCH_MAX:
+        return jsonify({"error": f"ids must be a list of 1-{MODERATION_BATCH_MAX} ids"}), 400
+    try:
+        ids = list(dict.fromkeys(str(uuid.UUID(str(i))) for i in ids))
+    except ValueError:
+        return jsonify({"error": "ids must be UUIDs"}), 400
+
+    _, _, moderate = MODERATION_QUEUES[kind]
+    try:
+        changed = moderate(ids, data['status'], current_user_id)
+        invalidate_moderated(kind, changed)
+
+        updated = {row['id'] for row in changed}
+        return jsonify({
+            "status": data['status'],
+            "updated": [i for i in ids if i in updated],
+            # Unknown ids, ids already in that status, and profiles still awaiting consent
+            "skipped": [i for i in ids if i not in updated]
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# === BULK EXPORT ===
+# Every approved profile as NDJSON, streamed a keyset page at a time so the worker
+# holds one page however big the table gets (see export_ndjson in export_utils.py
+# and export_profiles() in schema.sql). Pages above the API's max rows (1000 by
+# default on Supabase) come back short and would end the export early.
+EXPORT_PAGE_SIZE = int(os.environ.get("EXPORT_PAGE_SIZE", 1000))
+EXPORT_PAGE_TIMEOUT = float(os.environ.get("EXPORT_PAGE_TIMEOUT", 10))
+# Used when the client sends Accept-Encoding: gzip; low levels keep the single worker responsive
+EXPORT_GZIP_LEVEL = int(os.environ.get("EXPORT_GZIP_LEVEL", 1))
+
+@app.route('/api/export', methods=['GET'])
+@token_required
+@admin_required
+def export_profiles(current_user, current_user_id, **kwargs):
+    # One line per profile (with average_ratings and experience_count), oldest first.
+    # A {"next_cursor": ...} line follows every page: pass it as ?cursor= to resume
+    # after that page; null means the export is complete.
+    try:
+        cursor = decode_cursor(request.args['cursor'], 2) if request.args.get('cursor') else None
+        if cursor:
+            cursor[1] = str(uuid.UUID(str(cursor[1])))
+    except ValueError:
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    gzip_level = EXPORT_GZIP_LEVEL if request.accept_encodings['gzip'] else None
+    record_audit(current_user_id, 'profiles_exported', 'female_profiles', None, cursor=request.args.get('cursor'))
+    response = Response(
+        stream_with_context(export_ndjson(db.export_profiles, cursor, EXPORT_PAGE_SIZE, EXPORT_PAGE_TIMEOUT, gzip_level)),
+        mimetype='application/x-ndjson'
+    )
+    if gzip_level is not None:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
 # === PUBLIC ROUTES (Token-based) ===
 
 @app.route('/public/approve/validate', methods=['GET'])
@@ -344,11 +884,11 @@ def validate_approve_token():
         return jsonify({"error": "Missing token"}), 400
         
     try:
-        res = supabase.table('female_profiles').select('*').eq('invite_token', token).single().execute()
-        if not res.data:
+        profile = db.get_profile_by_invite_token(
+            token, 'id, display_name, bio, photos, moderation_status, invite_token_expires_at')
+        if not profile:
             return jsonify({"error": "Invalid or expired token"}), 404
             
-        profile = res.data
         expires = datetime.fromisoformat(profile['invite_token_expires_at'])
         
         if expires < datetime.now(timezone.utc):
@@ -360,46 +900,129 @@ def validate_approve_token():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/public/approve/uploads', methods=['POST'])
+def create_photo_uploads():
+    # Signed upload URLs for the approve page: {"files": [{"content_type": "image/jpeg", "size": 123456}]}
+    token = request.args.get('token')
+    data = request.get_json(silent=True) or {}
+    files = data.get('files')
+    if not token or not isinstance(files, list) or not files:
+        return jsonify({"error": "Missing token or files"}), 400
+    if len(files) > PHOTO_MAX_FILES:
+        return jsonify({"error": f"At most {PHOTO_MAX_FILES} photos"}), 400
+    for f in files:
+        if not isinstance(f, dict) or f.get('content_type') not in UPLOAD_CONTENT_TYPES:
+            return jsonify({"error": f"content_type must be one of: {', '.join(sorted(UPLOAD_CONTENT_TYPES))}"}), 400
+        if not isinstance(f.get('size'), int) or not 0 < f['size'] <= PHOTO_MAX_UPLOAD_BYTES:
+            return jsonify({"error": f"Each photo must be at most {PHOTO_MAX_UPLOAD_BYTES // (1024 * 1024)} MB"}), 400
+
+    try:
+        profile = db.get_profile_by_invite_token(token, 'id, invite_token_expires_at')
+        if not profile:
+            return jsonify({"error": "Invalid or expired token"}), 404
+
+        expires = datetime.fromisoformat(profile['invite_token_expires_at'])
+        if expires < datetime.now(timezone.utc):
+            return jsonify({"error": "Token has expired"}), 401
+
+        uploads = []
+        for f in files:
+            key = f"{upload_key_prefix(profile['id'])}{uuid.uuid4()}"
+            uploads.append({
+                "key": key,
+                "upload_url": upload_storage.create_upload_url(key, PHOTO_UPLOAD_URL_TTL),
+                "content_type": f['content_type']
+            })
+        return jsonify({"uploads": uploads, "expires_in": PHOTO_UPLOAD_URL_TTL}), 200
+
+    except StorageError as e:
+        app.logger.warning("Could not sign photo uploads: %s", e)
+        return jsonify({"error": "Photo uploads are unavailable, please retry shortly"}), 503
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/public/approve/complete', methods=['POST'])
 def complete_profile_approval():
     token = request.args.get('token')
     data = request.get_json()
     if not token or not data:
         return jsonify({"error": "Missing token or data"}), 400
-    
-    if not data.get('bio') or not data.get('photos'):
-        return jsonify({"error": "Missing bio or photos"}), 400
-        
+
+    uploads = data.get('uploads')
+    if not data.get('bio') or not isinstance(uploads, list) or not uploads:
+        return jsonify({"error": "Missing bio or uploads"}), 400
+    if len(uploads) > PHOTO_MAX_FILES or len(set(map(str, uploads))) != len(uploads):
+        return jsonify({"error": f"uploads must be at most {PHOTO_MAX_FILES} distinct keys"}), 400
+
     try:
         # 1. Validate token again
-        res = supabase.table('female_profiles').select('id, invite_token_expires_at').eq('invite_token', token).single().execute()
-        if not res.data:
+        profile = db.get_profile_by_invite_token(token, 'id, invite_token_expires_at')
+        if not profile:
             return jsonify({"error": "Invalid or expired token"}), 404
-            
-        profile = res.data
+
         expires = datetime.fromisoformat(profile['invite_token_expires_at'])
         if expires < datetime.now(timezone.utc):
             return jsonify({"error": "Token has expired"}), 401
-            
-        # 2. Update profile, set for moderation, and nullify token
+
+        # Only keys /public/approve/uploads issued for this invite
+        prefix = upload_key_prefix(profile['id'])
+        try:
+            for key in uploads:
+                if not key.startswith(prefix) or str(uuid.UUID(key[len(prefix):])) != key[len(prefix):]:
+                    raise ValueError(key)
+        except (AttributeError, ValueError):
+            return jsonify({"error": "Unknown upload key"}), 400
+
+        if not photo_pipeline.has_room():
+            return jsonify({"error": "Too many photos being processed, please retry shortly"}), 503, {"Retry-After": "30"}
+
+        # 2. Update profile, hand the uploads to the photo pipeline, and nullify token.
+        # The pipeline moves it to 'pending' (admin moderation) once the photos are ready.
         update_data = {
             'bio': data['bio'],
-            'photos': data['photos'], # Expects a JSON list of URLs
+            'photos': [{'upload': key} for key in uploads],
             'invite_token': None,     # Burn the token
             'invite_token_expires_at': None,
-            'moderation_status': 'pending' # NOW it goes to admin moderation
+            'moderation_status': 'processing',
+            'updated_at': datetime.now(timezone.utc).isoformat()
         }
-        
-        update_res = supabase.table('female_profiles').update(update_data).eq('id', profile['id']).execute()
-        
-        if not update_res.data:
-            return jsonify({"error": "Failed to update profile", "details": str(update_res.error)}), 500
-            
-        return jsonify({"message": "Profile submitted for final review."}), 200
-        
+
+        if not db.update_profile(profile['id'], update_data):
+            return jsonify({"error": "Failed to update profile"}), 500
+
+        # Lost only if this process dies first; the pipeline's recovery sweep requeues it
+        photo_pipeline.submit(profile['id'], uploads)
+        record_audit(None, 'profile_approval_submitted', 'female_profiles', profile['id'], photos=len(uploads))
+
+        return jsonify({"message": "Profile submitted. Photos are being processed before final review."}), 202
+
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# --- Local photo storage (STORAGE_BACKEND=local only) ---
+# Stand-ins for Supabase Storage's signed upload and public object URLs
+
+if STORAGE_BACKEND == 'local':
+    @app.route('/storage/v1/upload/<bucket>/<path:key>', methods=['PUT'])
+    def local_storage_upload(bucket, key):
+        if bucket != PHOTO_UPLOAD_BUCKET or not upload_storage.verify_upload(
+                key, request.args.get('expires'), request.args.get('signature')):
+            return jsonify({"error": "Invalid or expired upload URL"}), 403
+        if request.content_length is None or request.content_length > PHOTO_MAX_UPLOAD_BYTES:
+            return jsonify({"error": "Payload too large"}), 413
+        upload_storage.write(key, request.get_data(), request.content_type)
+        return jsonify({"Key": f"{bucket}/{key}"}), 200
+
+    @app.route('/storage/v1/public/<bucket>/<path:key>', methods=['GET'])
+    def local_storage_public(bucket, key):
+        extension = key.rsplit('.', 1)[-1]
+        if bucket != PHOTO_BUCKET or extension not in ENCODERS:
+            return jsonify({"error": "Not found"}), 404
+        try:
+            return send_file(photo_storage.path(key), mimetype=ENCODERS[extension][1], max_age=31536000)
+        except (StorageError, FileNotFoundError):
+            return jsonify({"error": "Not found"}), 404
+
 @app.route('/public/redeem/validate', methods=['GET'])
 def validate_redeem_token():
     # This validates the *woman's* token for the call
@@ -408,11 +1031,10 @@ def validate_redeem_token():
         return jsonify({"error": "Missing token"}), 400
         
     try:
-        res = supabase.table('redeem_sessions').select('*').eq('session_token', token).single().execute()
-        if not res.data:
+        session = db.get_redeem_session(token)
+        if not session:
             return jsonify({"error": "Invalid or expired session"}), 404
             
-        session = res.data
         expires = datetime.fromisoformat(session['expires_at'])
         
         if expires < datetime.now(timezone.utc) or not session['is_active']:
@@ -431,80 +1053,376 @@ def validate_redeem_token():
 
 # === WEBRTC SIGNALING SERVER (Socket.IO) ===
 
+# A join waiting on the DB holds the peer's UI; give up quickly instead
+SIGNALING_DB_TIMEOUT = float(os.environ.get("SIGNALING_DB_TIMEOUT", 2))
+MAX_ROOM_PARTICIPANTS = int(os.environ.get("MAX_ROOM_PARTICIPANTS", 2))
+# Who is in which room, so disconnects can be announced, relays checked and rooms
+# capped. Peers of one room may be on different workers once there is a message
+# queue, so with a Redis queue the registry lives in that Redis too. Its keys
+# expire SIGNALING_ROOM_TTL seconds after the last join (longer than a redeem session).
+SOCKETIO_MESSAGE_QUEUE = os.environ.get("SOCKETIO_MESSAGE_QUEUE", "")
+if SOCKETIO_MESSAGE_QUEUE.startswith(('redis://', 'rediss://')):
+    import redis
+    room_registry = RedisRoomRegistry(
+        redis.Redis.from_url(SOCKETIO_MESSAGE_QUEUE, socket_timeout=SIGNALING_DB_TIMEOUT,
+                             socket_connect_timeout=SIGNALING_DB_TIMEOUT),
+        max_participants=MAX_ROOM_PARTICIPANTS,
+        ttl=int(os.environ.get("SIGNALING_ROOM_TTL", 7200)),
+        prefix=os.environ.get("SOCKETIO_CHANNEL", "bro-socketio")
+    )
+else:
+    if SOCKETIO_MESSAGE_QUEUE:
+        print("SOCKETIO_MESSAGE_QUEUE is not Redis: room membership and caps are per worker")
+    room_registry = RoomRegistry(max_participants=MAX_ROOM_PARTICIPANTS)
+# room_name -> expires_at of its active redeem session (None if there is none),
+# so joins don't hit redeem_sessions every time
+redeem_rooms = TTLCache(maxsize=5000, ttl=float(os.environ.get("REDEEM_ROOM_CACHE_TTL", 30)))
+metrics.register_cache('redeem_room', redeem_rooms)
+
+# sid -> who authenticated on connect: {'user_id': ...} for a logged-in user, or
+# {'room_name': ...} for a redeem link holder, who may only join that room;
+# 'dropped' counts its messages dropped so far
+signaling_peers = {}
+
+# Per-socket (rate per second, burst). ICE is counted per candidate, whether sent
+# one per message or batched. Override with SIGNALING_RATE_LIMITS, e.g. "ice=100/400".
+SIGNALING_RATE_LIMITS = {
+    'join_room': (1, 5),
+    'leave_room': (1, 5),
+    'webrtc_offer': (2, 10),
+    'webrtc_answer': (2, 10),
+    'ice': (50, 200),
+}
+for _override in filter(None, os.environ.get("SIGNALING_RATE_LIMITS", "").split(',')):
+    _event, _, _limit = _override.partition('=')
+    _rate, _, _burst = _limit.partition('/')
+    SIGNALING_RATE_LIMITS[_event.strip()] = (float(_rate), float(_burst or _rate))
+signaling_limits = TokenBuckets(SIGNALING_RATE_LIMITS)
+# Real offers/answers are a few KB; anything bigger is dropped before relaying
+MAX_SDP_BYTES = int(os.environ.get("MAX_SDP_BYTES", 20000))
+# Most candidates one webrtc_ice_candidates message may carry
+MAX_ICE_BATCH = int(os.environ.get("MAX_ICE_BATCH", 50))
+# A socket that keeps sending what gets dropped is disconnected: each of its
+# messages still costs a decode and a handler call, a closed socket costs nothing
+SIGNALING_MAX_DROPS = int(os.environ.get("SIGNALING_MAX_DROPS", 100))
+
+signaling_dropped = metrics.counter(
+    'signaling_dropped_total', 'Socket.IO messages dropped instead of handled.', ('event', 'reason'))
+signaling_abuse_disconnects = metrics.counter(
+    'signaling_abuse_disconnects_total', 'Sockets disconnected after SIGNALING_MAX_DROPS dropped messages.')
+
+def get_redeem_room_expiry(room_name):
+    expires = redeem_rooms.get(room_name, default=False)
+    if expires is False:
+        with call_timeout(SIGNALING_DB_TIMEOUT):
+            expires = db.get_active_room_expiry(room_name)
+        expires = datetime.fromisoformat(expires) if expires else None
+        redeem_rooms.set(room_name, expires)
+    return expires
+
+def drop(event, reason):
+    signaling_dropped.inc(event, reason)
+    peer = signaling_peers.get(request.sid)
+    if peer is not None:
+        peer['dropped'] += 1
+        if peer['dropped'] == SIGNALING_MAX_DROPS:
+            signaling_abuse_disconnects.inc()
+            disconnect()
+
+def admit(event, data, cost=1):
+    # Cheapest checks first: rate, then shape. Returns False (and counts why) to drop.
+    if not signaling_limits.allow(request.sid, event, cost):
+        drop(event, 'rate_limited')
+        return False
+    if not isinstance(data, dict):
+        drop(event, 'invalid')
+        return False
+    return True
+
+def admit_relay(event, target_sid):
+    # Peers may only signal someone they share a room with
+    if not target_sid:
+        drop(event, 'not_in_room')
+        return False
+    try:
+        shared = room_registry.shares_room(request.sid, target_sid)
+    except RoomRegistryUnavailable:
+        # Our outage, not the peer's fault: not counted toward SIGNALING_MAX_DROPS
+        signaling_dropped.inc(event, 'registry_unavailable')
+        return False
+    if not shared:
+        drop(event, 'not_in_room')
+        return False
+    return True
+
+def sdp_too_large(event, sdp):
+    if len(json.dumps(sdp)) <= MAX_SDP_BYTES:
+        return False
+    drop(event, 'oversized')
+    emit('signaling_error', {'error': f'SDP is larger than {MAX_SDP_BYTES} bytes'})
+    return True
+
 @socketio.on('connect')
-def on_connect():
+@timed_event('connect')
+def on_connect(auth=None):
+    # Credentials arrive in the Socket.IO auth payload: {token: <JWT>} from a
+    # logged-in user, or {session_token: ...} from the woman's redeem link
+    auth = auth if isinstance(auth, dict) else {}
+    try:
+        if auth.get('token'):
+            user = authenticate(auth['token'])
+            if not user:
+                raise ConnectionRefusedError('User not found')
+            peer = {'user_id': user['id'], 'room_name': None, 'dropped': 0}
+        elif auth.get('session_token'):
+            with call_timeout(SIGNALING_DB_TIMEOUT):
+                session = db.get_redeem_session(auth['session_token'])
+            expires = datetime.fromisoformat(session['expires_at']) if session else None
+            if not session or not session['is_active'] or expires < datetime.now(timezone.utc):
+                raise ConnectionRefusedError('Invalid or expired session')
+            # Its join_room comes next; spare it the same lookup
+            redeem_rooms.set(session['room_name'], expires)
+            peer = {'user_id': None, 'room_name': session['room_name'], 'dropped': 0}
+        else:
+            raise ConnectionRefusedError('Authentication required')
+    except jwt.InvalidTokenError:
+        signaling_dropped.inc('connect', 'unauthorized')
+        raise ConnectionRefusedError('Token is invalid or expired')
+    except DatabaseUnavailable:
+        raise ConnectionRefusedError('Service temporarily unavailable')
+    except ConnectionRefusedError:
+        signaling_dropped.inc('connect', 'unauthorized')
+        raise
+    signaling_peers[request.sid] = peer
     print(f'Client connected: {request.sid}')
 
 @socketio.on('disconnect')
-def on_disconnect():
+@timed_event('disconnect')
+def on_disconnect(reason=None):
+    signaling_peers.pop(request.sid, None)
+    signaling_limits.forget(request.sid)
     print(f'Client disconnected: {request.sid}')
-    # In a real app, you'd find which room the sid was in and emit 'user_left'
-    # For simplicity, we let clients handle missing peers via RTCPeerConnectionState
+    # Tell the remaining peers in each of this client's rooms that it is gone
+    try:
+        rooms = room_registry.remove_sid(request.sid)
+    except RoomRegistryUnavailable as e:
+        # Its memberships expire with SIGNALING_ROOM_TTL
+        print(f'Could not remove {request.sid} from its rooms: {e}')
+        return
+    for room_name in rooms:
+        emit('user_left', {'sid': request.sid}, to=room_name)
 
 @socketio.on('join_room')
+@timed_event('join_room')
 def on_join_room(data):
+    if not admit('join_room', data):
+        return
     room_name = data.get('room_name')
     if not room_name:
         return
-        
+
+    allowed_room = signaling_peers.get(request.sid, {}).get('room_name')
+    if allowed_room and allowed_room != room_name:
+        drop('join_room', 'unauthorized')
+        emit('join_error', {'error': 'Not allowed in this room'})
+        return
+
+    try:
+        expires = get_redeem_room_expiry(room_name)
+    except Exception as e:
+        emit('join_error', {'error': str(e)})
+        return
+    if expires is None or expires < datetime.now(timezone.utc):
+        emit('join_error', {'error': 'Room does not exist or has expired'})
+        return
+
+    try:
+        joined = room_registry.join(request.sid, room_name)
+    except RoomRegistryUnavailable:
+        emit('join_error', {'error': 'Service temporarily unavailable'})
+        return
+    if not joined:
+        emit('join_error', {'error': 'Room is full'})
+        return
+
     join_room(room_name)
-    print(f"Client {request.sid} joined room {room_name}")
-    
+
     # Notify others in the room (except sender) that a new peer has joined
     emit('user_joined', {'sid': request.sid}, to=room_name, skip_sid=request.sid)
+    print(f"Client {request.sid} joined room {room_name}")
 
 @socketio.on('leave_room')
+@timed_event('leave_room')
 def on_leave_room(data):
+    if not admit('leave_room', data):
+        return
     room_name = data.get('room_name')
     if not room_name:
         return
-        
+    try:
+        left = room_registry.leave(request.sid, room_name)
+    except RoomRegistryUnavailable:
+        left = False
+    if not left:
+        return
+
     leave_room(room_name)
     print(f"Client {request.sid} left room {room_name}")
     emit('user_left', {'sid': request.sid}, to=room_name, skip_sid=request.sid)
 
 @socketio.on('webrtc_offer')
+@timed_event('webrtc_offer')
 def on_offer(data):
     # Send offer to a specific target SID
+    if not admit('webrtc_offer', data):
+        return
     target_sid = data.get('target_sid')
     sdp = data.get('sdp')
-    if not target_sid or not sdp:
+    if not sdp or not admit_relay('webrtc_offer', target_sid) or sdp_too_large('webrtc_offer', sdp):
         return
-        
-    print(f"Sending offer from {request.sid} to {target_sid}")
+
     emit('webrtc_offer', {
         'sdp': sdp,
         'sender_sid': request.sid
     }, to=target_sid)
 
 @socketio.on('webrtc_answer')
+@timed_event('webrtc_answer')
 def on_answer(data):
     # Send answer back to the original offerer
+    if not admit('webrtc_answer', data):
+        return
     target_sid = data.get('target_sid')
     sdp = data.get('sdp')
-    if not target_sid or not sdp:
+    if not sdp or not admit_relay('webrtc_answer', target_sid) or sdp_too_large('webrtc_answer', sdp):
         return
-        
-    print(f"Sending answer from {request.sid} to {target_sid}")
+
     emit('webrtc_answer', {
         'sdp': sdp,
         'sender_sid': request.sid
     }, to=target_sid)
 
 @socketio.on('webrtc_ice_candidate')
+@timed_event('webrtc_ice_candidate')
 def on_ice_candidate(data):
     # Relay ICE candidate to the target peer
+    if not admit('ice', data):
+        return
     target_sid = data.get('target_sid')
     candidate = data.get('candidate')
-    if not target_sid or not candidate:
+    if not candidate or not admit_relay('webrtc_ice_candidate', target_sid):
         return
-        
-    # print(f"Relaying ICE candidate from {request.sid} to {target_sid}")
+
     emit('webrtc_ice_candidate', {
         'candidate': candidate,
         'sender_sid': request.sid
     }, to=target_sid)
 
+def relay_ice_candidates(sender_sid, target_sid, candidates, done):
+    socketio.emit('webrtc_ice_candidates', {
+        'candidates': candidates,
+        'sender_sid': sender_sid,
+        'done': done
+    }, to=target_sid)
+
+ice_batcher = IceCandidateBatcher(
+    relay_ice_candidates,
+    window=float(os.environ.get("ICE_BATCH_WINDOW_MS", 5)) / 1000
+)
+
+@socketio.on('webrtc_ice_candidates')
+@timed_event('webrtc_ice_candidates')
+def on_ice_candidates(data):
+    # Batched form of webrtc_ice_candidate: {target_sid, candidates: [...], done}
+    # Candidates for the same target are coalesced for ICE_BATCH_WINDOW_MS;
+    # done=True (end of gathering) flushes straight away.
+    candidates = data.get('candidates') if isinstance(data, dict) else None
+    if not isinstance(candidates, list) or len(candidates) > MAX_ICE_BATCH:
+        drop('webrtc_ice_candidates', 'invalid')
+        return
+    if not admit('ice', data, cost=len(candidates)):
+        return
+    target_sid = data.get('target_sid')
+    done = bool(data.get('done'))
+    if not (candidates or done) or not admit_relay('webrtc_ice_candidates', target_sid):
+        return
+
+    ice_batcher.add(request.sid, target_sid, candidates, done)
+
+# === EXPIRY REAPER ===
+# Deactivates expired redeem sessions (closing their rooms), burns expired invite
+# tokens and purges long-dead sessions, in bounded batches every REAPER_INTERVAL.
+# With several workers each runs it (the batches skip each other's rows); set
+# REAPER_ENABLED=0 to run `flask --app app reap-expired` from cron instead.
+REAPER_ENABLED = os.environ.get("REAPER_ENABLED", "1") == "1"
+
+def teardown_expired_rooms(room_names):
+    # Tell the peers why the call is ending, then empty the room. With a message
+    # queue this reaches peers on every worker, including from the CLI.
+    for room_name in room_names:
+        redeem_rooms.set(room_name, None)  # rejoins fail without a DB round-trip
+        socketio.emit('room_expired', {'room_name': room_name}, to=room_name)
+        socketio.close_room(room_name)
+        try:
+            room_registry.close(room_name)
+        except RoomRegistryUnavailable as e:
+            print(f'Could not close room {room_name} in the registry: {e}')
+
+expiry_reaper = ExpiryReaper(
+    db,
+    interval=float(os.environ.get("REAPER_INTERVAL", 60)),
+    batch_size=int(os.environ.get("REAPER_BATCH_SIZE", 500)),
+    max_batches=int(os.environ.get("REAPER_MAX_BATCHES", 20)),
+    retention=timedelta(days=float(os.environ.get("REAPER_SESSION_RETENTION_DAYS", 7))),
+    on_sessions_expired=teardown_expired_rooms
+)
+
+# === MAINTENANCE COMMANDS ===
+
+MAINTENANCE_DB_TIMEOUT = float(os.environ.get("MAINTENANCE_DB_TIMEOUT", 600))
+
+@app.cli.command('rebuild-rating-stats')
+@click.option('--profile-id', default=None, help='Only rebuild this profile.')
+@click.option('--verify', is_flag=True, help='Report drift against a full recompute instead of rebuilding.')
+def rebuild_rating_stats(profile_id, verify):
+    """Backfill profile_rating_stats from the ratings table."""
+    # Full-table recomputes; allow far longer than a request would get
+    with call_timeout(MAINTENANCE_DB_TIMEOUT):
+        if verify:
+            drift = db.profile_rating_stats_drift()
+            if profile_id:
+                drift = [row for row in drift if row['profile_id'] == profile_id]
+            if not drift:
+                click.echo("profile_rating_stats matches a full recompute.")
+                return
+            for row in drift:
+                click.echo(f"Drift on {row['profile_id']}: stored {row['stored_count']}, actual {row['actual_count']}")
+            raise SystemExit(1)
+
+        rebuilt = db.rebuild_profile_rating_stats(profile_id)
+    click.echo(f"Rebuilt rating stats for {rebuilt} profile(s).")
+
+@app.cli.command('rebuild-vote-tallies')
+def rebuild_vote_tallies():
+    """Recount experiences.upvotes/downvotes from the experience_votes table."""
+    with call_timeout(MAINTENANCE_DB_TIMEOUT):
+        rebuilt = db.rebuild_experience_vote_tallies()
+    click.echo(f"Corrected vote tallies on {rebuilt} experience(s).")
+
+@app.cli.command('reap-expired')
+@click.option('--until-done', is_flag=True, help='Repeat passes until nothing is left to reap.')
+def reap_expired(until_done):
+    """Deactivate expired redeem sessions, burn expired invites, purge old sessions."""
+    totals = dict.fromkeys(ExpiryReaper.JOBS, 0)
+    while True:
+        done = expiry_reaper.run_once()
+        for job, count in done.items():
+            totals[job] += count
+        # A pass that hit max_batches on any job may have left rows behind
+        if not until_done or all(count < expiry_reaper.batch_size * expiry_reaper.max_batches for count in done.values()):
+            break
+    click.echo(', '.join(f"{job.replace('_', ' ')}: {count}" for job, count in totals.items()))
+
 # --- Main Entry Point ---
 if __name__ == '__main__':
     print("Starting Flask-SocketIO server with eventlet...")
@@ -1,28 +1,153 @@
 import jwt
 import os
+import threading
+import time
 from functools import wraps
+from eventlet import tpool
 from flask import request, jsonify
-from passlib.context import CryptContext
-from db_utils import supabase
-from datetime import datetime, timedelta
+from db_utils import db, call_timeout, DatabaseUnavailable
+from cache_utils import TTLCache
+from metrics_utils import metrics
+from token_utils import JwtKeyring, RevocationList
+from datetime import datetime, timedelta, timezone
 
-SECRET_KEY = os.environ.get("JWT_SECRET", "default-secret")
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Signing keys by kid (JWT_KEYS / JWT_ACTIVE_KID, or just JWT_SECRET); see JwtKeyring for rotation
+keyring = JwtKeyring.from_env()
+JWT_TTL = timedelta(hours=float(os.environ.get("JWT_TTL_HOURS", 24)))
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+_pwd_context = None
+_pwd_context_lock = threading.Lock()
+
+# bcrypt runs on eventlet's OS thread pool (EVENTLET_THREADPOOL_SIZE) so it never
+# blocks the hub. At most PASSWORD_QUEUE_LIMIT hashes may be running or queued;
+# past that, callers get PasswordHashingBusy and should answer 503.
+PASSWORD_QUEUE_LIMIT = int(os.environ.get("PASSWORD_QUEUE_LIMIT", 8))
+_password_slots = threading.BoundedSemaphore(PASSWORD_QUEUE_LIMIT)
+
+class PasswordHashingBusy(Exception):
+    pass
+
+# Users already confirmed to exist, so repeat requests skip the DB lookup
+user_cache = TTLCache(
+    maxsize=int(os.environ.get("USER_CACHE_SIZE", 10000)),
+    ttl=float(os.environ.get("USER_CACHE_TTL", 60))
+)
+
+# token_required fails fast rather than holding the request for the full DB_TIMEOUT
+AUTH_DB_TIMEOUT = float(os.environ.get("AUTH_DB_TIMEOUT", 3))
+
+# Tokens whose signature already checked out -> claims, so repeat requests skip
+# HMAC and JSON decoding. Expiry and revocation are still checked every time.
+verified_tokens = TTLCache(
+    maxsize=int(os.environ.get("VERIFIED_TOKEN_CACHE_SIZE", 20000)),
+    ttl=float(os.environ.get("VERIFIED_TOKEN_CACHE_TTL", 300))
+)
+
+# Users whose tokens were revoked within the last JWT_TTL. A revocation takes
+# effect everywhere within TOKEN_REVOCATION_REFRESH seconds; if the list can't
+# be refreshed for TOKEN_REVOCATION_MAX_STALENESS, tokens are checked against
+# the database again until it can.
+revocations = RevocationList(
+    fetch=lambda since: db.list_token_revocations(since),
+    token_ttl=JWT_TTL.total_seconds(),
+    refresh_interval=float(os.environ.get("TOKEN_REVOCATION_REFRESH", 10)),
+    max_staleness=float(os.environ.get("TOKEN_REVOCATION_MAX_STALENESS", 60))
+)
+
+auth_checks = metrics.counter(
+    'auth_token_checks_total', 'Bearer tokens checked, by how they were verified.', ('path',))
+
+class TokenRevoked(jwt.InvalidTokenError):
+    pass
+
+def _run_bcrypt(fn, *args):
+    if not _password_slots.acquire(blocking=False):
+        raise PasswordHashingBusy("Too many password operations in progress")
+    try:
+        return tpool.execute(fn, *args)
+    finally:
+        _password_slots.release()
+
+def password_context():
+    # Built on first use (or by warm-up): importing passlib and loading its bcrypt
+    # backend, which self-tests on load, cost ~70ms that only password checks need
+    global _pwd_context
+    if _pwd_context is None:
+        with _pwd_context_lock:
+            if _pwd_context is None:
+                from passlib.context import CryptContext
+                context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+                context.handler().get_backend()
+                _pwd_context = context
+    return _pwd_context
+
+def warm_up_password_hashing():
+    # The context, plus eventlet's thread pool, which starts its threads on first use
+    tpool.execute(password_context().handler().get_backend)
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return _run_bcrypt(password_context().hash, password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return _run_bcrypt(password_context().verify, plain_password, hashed_password)
 
-def generate_jwt(user_id: str, email: str) -> str:
+def generate_jwt(user_id: str, email: str, token_version: int = 0, is_admin: bool = False) -> str:
+    # ver and adm let token_required authorize without a DB lookup; bumping
+    # users.token_version (see schema.sql section 11) revokes older tokens
+    now = datetime.now(timezone.utc)
     payload = {
-        'exp': datetime.utcnow() + timedelta(days=1),
-        'iat': datetime.utcnow(),
+        'exp': now + JWT_TTL,
+        'iat': now,
         'sub': user_id,
-        'email': email
+        'email': email,
+        'ver': token_version,
+        'adm': bool(is_admin)
     }
-    return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+    return keyring.sign(payload)
+
+def revoke_tokens(user_id: str) -> int:
+    # Every token issued to the user so far stops working; returns the new version
+    version = db.revoke_user_tokens(user_id)
+    revocations.add(user_id, version)
+    user_cache.invalidate(user_id)
+    return version
+
+def _load_user(user_id: str):
+    user = user_cache.get(user_id)
+    if user is None:
+        with call_timeout(AUTH_DB_TIMEOUT):
+            user = db.get_user(user_id)
+        if user:
+            user_cache.set(user_id, user)
+    return user
+
+def authenticate(token: str):
+    """current_user for a bearer token, or None if the user no longer exists.
+
+    Tokens with a version are authorized from their claims and the
+    revocation list alone. Older tokens, and every token while the list is
+    stale, are checked against the users table instead. Raises
+    jwt.InvalidTokenError subclasses and DatabaseUnavailable.
+    """
+    claims = verified_tokens.get(token)
+    if claims is None:
+        claims = keyring.verify(token)
+        verified_tokens.set(token, claims)
+    elif claims['exp'] <= time.time():
+        raise jwt.ExpiredSignatureError("Signature has expired")
+
+    version = claims.get('ver')
+    if version is not None and revocations.fresh():
+        auth_checks.inc('stateless')
+        if revocations.is_revoked(claims['sub'], version):
+            raise TokenRevoked("Token has been revoked")
+        return {'id': claims['sub'], 'is_admin': bool(claims.get('adm'))}
+
+    auth_checks.inc('database')
+    user = _load_user(claims['sub'])
+    if user and (version or 0) < user.get('token_version', 0):
+        raise TokenRevoked("Token has been revoked")
+    return user
 
 def token_required(f):
     @wraps(f)
@@ -38,20 +163,31 @@ def token_required(f):
             return jsonify({"error": "Token is missing"}), 401
 
         try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            # Fetch user from DB to ensure they still exist
-            res = supabase.table('users').select('id').eq('id', data['sub']).execute()
-            if not res.data:
-                 return jsonify({"error": "User not found"}), 401
-            
+            user = authenticate(token)
+            if not user:
+                return jsonify({"error": "User not found"}), 401
+
             # Pass user data to the route
-            kwargs['current_user'] = res.data[0]
-            kwargs['current_user_id'] = res.data[0]['id']
-            
+            kwargs['current_user'] = user
+            kwargs['current_user_id'] = user['id']
+
         except jwt.ExpiredSignatureError:
             return jsonify({"error": "Token has expired"}), 401
+        except TokenRevoked:
+            return jsonify({"error": "Token has been revoked"}), 401
         except jwt.InvalidTokenError:
             return jsonify({"error": "Token is invalid"}), 401
+        except DatabaseUnavailable:
+            return jsonify({"error": "Service temporarily unavailable"}), 503, {"Retry-After": "1"}
+
+        return f(*args, **kwargs)
+    return decorated
 
+def admin_required(f):
+    # Goes under @token_required, which sets current_user (with is_admin)
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not kwargs['current_user'].get('is_admin'):
+            return jsonify({"error": "Admin access required"}), 403
         return f(*args, **kwargs)
-    return decorated
\ No newline at end of file
+    return decorated
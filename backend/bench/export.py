@@ -0,0 +1,178 @@
+"""Bulk export at scale: throughput, resumability and the worker's memory.
+
+Seeds (or reuses) a --profiles database (one rating and one experience per
+profile), starts the stand-in and the app as bench.run does, then reads
+/api/export as an admin:
+
+  plain     uncompressed; after --interrupt-after rows the connection is
+            dropped at the next checkpoint and the export resumed from its
+            cursor, as a client would after a network failure
+  gzip      Accept-Encoding: gzip, decompressed as it arrives
+
+Both are checked against the database (every approved profile exactly once,
+in keyset order, ending with {"next_cursor": null}) and report rows/s, bytes
+on the wire, time to first byte and the app worker's peak RSS while
+streaming. Also times the line encoder on one page, orjson against json.
+
+Usage (from backend/):
+    python -m bench.export --profiles 1000000
+    python -m bench.export --profiles 10000 --json /tmp/export.json
+"""
+import argparse
+import http.client
+import json
+import os
+import sqlite3
+import time
+import zlib
+
+from bench.postgrest_standin import Store, rpc_export_profiles
+from bench.run import HttpClient, RssSampler, Stack
+from bench.seed import ADMIN_USERNAME, SEED_PASSWORD, seed
+
+os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:9')
+os.environ.setdefault('SUPABASE_KEY', 'bench')
+
+import export_utils  # noqa: E402
+
+
+def read_export(port, token, wire: dict, cursor=None, gzip=False, stop_after=None):
+    """Stream one /api/export response; yields parsed lines and adds the bytes read to
+    wire['bytes']. Stops at the first checkpoint after `stop_after` rows, closing the
+    connection mid-stream."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    path = '/api/export' + (f'?cursor={cursor}' if cursor else '')
+    conn.request('GET', path, headers={'Authorization': f'Bearer {token}',
+                                       'Accept-Encoding': 'gzip' if gzip else 'identity'})
+    resp = conn.getresponse()
+    if resp.status != 200:
+        raise RuntimeError(f'/api/export answered {resp.status}: {resp.read()[:200]}')
+    decoder = zlib.decompressobj(31) if gzip else None
+    pending, rows = b'', 0
+    try:
+        while True:
+            chunk = resp.read1(256 * 1024)
+            if not chunk:
+                break
+            wire['bytes'] += len(chunk)
+            if decoder:
+                chunk = decoder.decompress(chunk)
+            *lines, pending = (pending + chunk).split(b'\n')
+            for line in lines:
+                item = json.loads(line)
+                yield item
+                if 'id' in item:
+                    rows += 1
+                elif stop_after and 'next_cursor' in item and rows >= stop_after:
+                    return
+    finally:
+        conn.close()
+    if pending:
+        raise RuntimeError('Export ended mid-line')
+
+
+def run_mode(stack, token, gzip, interrupt_after=None) -> dict:
+    wire = {'bytes': 0}
+    sampler = RssSampler(stack.worker_pid(), interval=0.1)
+    sampler.start()
+    started = time.perf_counter()
+    first_byte = None
+    ids, last_key, final, resumes, cursor = set(), None, None, 0, None
+    ordered = True
+    while final is None:
+        checkpoint = None
+        for item in read_export(stack.app_port, token, wire, cursor, gzip, stop_after=None if resumes else interrupt_after):
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            if 'id' in item:
+                key = (item['created_at'], item['id'])
+                ordered = ordered and (last_key is None or key > last_key)
+                last_key = key
+                ids.add(item['id'])
+            elif 'error' in item:
+                raise RuntimeError(f"Export failed: {item['error']}")
+            else:
+                checkpoint = item['next_cursor']
+                if checkpoint is None:
+                    final = True
+        if final is None:
+            if checkpoint is None:
+                raise RuntimeError('Export ended without a checkpoint')
+            # Resumed exports restart after the checkpoint, so keys keep increasing
+            cursor, resumes = checkpoint, resumes + 1
+    elapsed = time.perf_counter() - started
+    sampler.stop()
+    return {
+        'rows': len(ids),
+        'in_order': ordered,
+        'resumes': resumes,
+        'seconds': round(elapsed, 1),
+        'rows_per_sec': round(len(ids) / elapsed),
+        'wire_mb': round(wire['bytes'] / 1e6, 1),
+        'first_byte_ms': round(first_byte * 1000, 1),
+        'worker_rss_start_mb': round(sampler.samples[0], 1),
+        'worker_rss_peak_mb': round(max(sampler.samples), 1),
+    }
+
+
+def time_encoders(db_path, page_size=1000, repeat=20) -> dict:
+    rows = rpc_export_profiles(Store(db_path), {'p_limit': page_size})
+    results = {}
+    for name, module in (('orjson', export_utils.orjson), ('json', None)):
+        if name == 'orjson' and module is None:
+            continue
+        saved, export_utils.orjson = export_utils.orjson, module
+        try:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                b''.join(map(export_utils.ndjson_line, rows))
+            results[f'{name}_rows_per_sec'] = round(len(rows) * repeat / (time.perf_counter() - started))
+        finally:
+            export_utils.orjson = saved
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--profiles', type=int, default=1000000)
+    parser.add_argument('--db', help='SQLite file; defaults to /tmp/bro_export_<profiles>.sqlite')
+    parser.add_argument('--interrupt-after', type=int, default=50000, help='Rows before the plain run reconnects')
+    parser.add_argument('--modes', default='plain,gzip')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    db_path = args.db or f'/tmp/bro_export_{args.profiles}.sqlite'
+    seeded = {'db': db_path}
+    if not os.path.exists(db_path):
+        seeded.update(seed(db_path, profiles=args.profiles, users=100, ratings=args.profiles,
+                           experiences_per_profile=1, votes_per_experience=0, redeem_rooms=0, bcrypt_rounds=4))
+    with sqlite3.connect(db_path) as conn:
+        approved = conn.execute("SELECT COUNT(*) FROM female_profiles WHERE moderation_status = 'approved'").fetchone()[0]
+
+    results = {'encoder': time_encoders(db_path)}
+    with Stack(db_path, 4) as stack:
+        status, data = HttpClient(stack.app_port).request(
+            'POST', '/auth/login', {'username': ADMIN_USERNAME, 'password': SEED_PASSWORD})
+        if status != 200:
+            raise RuntimeError(f'Login failed: {status} {data}')
+        for mode in args.modes.split(','):
+            result = run_mode(stack, data['token'], gzip=mode == 'gzip',
+                              interrupt_after=args.interrupt_after if mode == 'plain' else None)
+            if result['rows'] != approved or not result['in_order']:
+                raise RuntimeError(f"{mode}: exported {result['rows']} of {approved} approved profiles "
+                                   f"(in order: {result['in_order']})")
+            results[mode] = result
+
+    print(f"\n{approved} approved profiles (of {args.profiles})")
+    print(f"encoder: {results['encoder']}")
+    for mode in args.modes.split(','):
+        print(f"{mode:<8}{results[mode]}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'dataset': seeded, 'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
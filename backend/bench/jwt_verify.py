@@ -0,0 +1,103 @@
+"""Bearer token verification throughput on one core.
+
+Times auth_utils.authenticate() -- everything token_required does before the
+route runs -- in a single thread, against:
+
+  warm            --users tokens reused round-robin, as real sessions do
+                  (verified-token cache hits)
+  cold            a fresh token every call (signature + JSON decode each time)
+  revoked         tokens of users on the revocation list (rejected)
+  pyjwt_decode    bare jwt.decode(), the CPU part of the old per-request check;
+                  the old path also needed a users lookup per USER_CACHE_TTL
+
+The revocation list is primed with --revoked entries first. No database or
+network is touched: SUPABASE_URL only has to parse.
+
+Usage (from backend/):
+    python -m bench.jwt_verify --seconds 3 --users 1000 --revoked 10000
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:9')
+os.environ.setdefault('SUPABASE_KEY', 'bench')
+os.environ.setdefault('JWT_KEYS', 'bench-old:' + 'o' * 32 + ',bench-new:' + 'n' * 32)
+os.environ.setdefault('JWT_ACTIVE_KID', 'bench-new')
+
+import jwt  # noqa: E402
+
+from auth_utils import TokenRevoked, authenticate, generate_jwt, keyring, revocations, verified_tokens  # noqa: E402
+
+
+def run_for(seconds, fn, tokens):
+    n, i, count = len(tokens), 0, 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while True:
+        for _ in range(1000):
+            fn(tokens[i])
+            i = i + 1 if i + 1 < n else 0
+        count += 1000
+        if time.perf_counter() >= deadline:
+            break
+    elapsed = time.perf_counter() - started
+    return {'ops_per_sec': round(count / elapsed), 'us_per_op': round(elapsed / count * 1e6, 2)}
+
+
+def expect_revoked(token):
+    try:
+        authenticate(token)
+    except TokenRevoked:
+        return
+    raise AssertionError("revoked token was accepted")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--revoked', type=int, default=10000)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc).isoformat()
+    revoked_ids = [str(uuid.uuid4()) for _ in range(args.revoked)]
+    rows = [{'user_id': u, 'min_token_version': 1, 'revoked_at': now} for u in revoked_ids]
+    revocations.fetch = lambda since: rows
+    revocations.refresh()
+
+    users = [str(uuid.uuid4()) for _ in range(args.users)]
+    warm = [generate_jwt(u, f'{u[:8]}@example.com') for u in users]
+    # Enough distinct tokens that none is seen twice within one cache lifetime
+    cold = [generate_jwt(str(uuid.uuid4()), 'x@example.com') for _ in range(verified_tokens.maxsize * 2)]
+    revoked = [generate_jwt(u, 'r@example.com', token_version=0) for u in revoked_ids[:args.users]]
+    key = os.environ['JWT_KEYS'].split(',')[-1].partition(':')[2]
+
+    for token in warm:
+        assert authenticate(token)['id']
+    results = {
+        'warm': run_for(args.seconds, authenticate, warm),
+        'cold': run_for(args.seconds, authenticate, cold),
+        'revoked': run_for(args.seconds, expect_revoked, revoked),
+        'pyjwt_decode': run_for(args.seconds, lambda t: jwt.decode(t, key, algorithms=['HS256']), warm),
+    }
+
+    print(f"\nOne core, keyring {keyring.kids} (active {keyring.active_kid}), "
+          f"{args.users} users, {revocations.stats()['entries']} revocations")
+    print(f"{'mode':<14}{'verifies/s':>12}{'us/op':>9}")
+    for mode, r in results.items():
+        print(f"{mode:<14}{r['ops_per_sec']:>12}{r['us_per_op']:>9}")
+    print(f"\nverified-token cache: {verified_tokens.stats()}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
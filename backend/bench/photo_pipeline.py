@@ -0,0 +1,106 @@
+"""Photo pipeline cost and page-weight savings on one core.
+
+Synthesizes --photos phone-style JPEGs (--megapixels, with EXIF orientation
+and GPS tags), then times photo_utils.render_variants() on each, checks
+that every output is upright and carries no EXIF, and compares what a
+dashboard card downloads before (the original) and after (the variant
+pick_variant() chooses for --card-width).
+
+Usage (from backend/):
+    python -m bench.photo_pipeline --photos 10 --megapixels 12 --card-width 320
+"""
+import argparse
+import io
+import json
+import os
+import time
+
+os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:9')
+os.environ.setdefault('SUPABASE_KEY', 'bench')
+
+import PIL  # noqa: E402
+from PIL import Image, ImageDraw  # noqa: E402
+
+from photo_utils import available_formats, pick_variant, render_variants  # noqa: E402
+
+GPS_IFD = 0x8825
+ORIENTATION = 0x0112
+
+
+def synthetic_photo(index, megapixels) -> bytes:
+    # Gradients plus shapes: compresses like a photo rather than a flat fill
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = width * 3 // 4
+    im = Image.radial_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(im)
+    for i in range(40):
+        x, y = (i * 7919 + index * 104729) % width, (i * 6271 + index * 1299709) % height
+        draw.ellipse((x, y, x + width // 6, y + height // 5), fill=((i * 37) % 256, (i * 91) % 256, (index * 53) % 256))
+    im = Image.merge('RGB', [im.getchannel(0), Image.linear_gradient('L').resize((width, height)), im.getchannel(2)])
+    exif = Image.Exif()
+    exif[ORIENTATION] = 6  # rotated 90 degrees, as phones write portrait shots
+    exif.get_ifd(GPS_IFD).update({1: 'N', 2: (52.0, 22.0, 7.2), 3: 'E', 4: (4.0, 53.0, 2.1)})
+    out = io.BytesIO()
+    im.save(out, 'JPEG', quality=90, exif=exif)
+    return out.getvalue()
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--photos', type=int, default=10)
+    parser.add_argument('--megapixels', type=float, default=12)
+    parser.add_argument('--widths', default='320,640,1280')
+    parser.add_argument('--card-width', type=int, default=320)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    widths = [int(w) for w in args.widths.split(',')]
+    formats = available_formats()
+    uploads = [synthetic_photo(i, args.megapixels) for i in range(args.photos)]
+
+    timings = []
+    card_bytes = {fmt: 0 for fmt in formats}
+    variant_bytes = 0
+    for data in uploads:
+        rendered, seconds = timed(render_variants, data, widths, formats, 100_000_000, 1024 ** 3)
+        timings.append(seconds)
+        variants = []
+        for fmt, width, height, body in rendered['variants']:
+            with Image.open(io.BytesIO(body)) as im:
+                assert not im.getexif(), "variant kept EXIF"
+                assert (im.width, im.height) == (width, height)
+            variants.append({'format': fmt, 'width': width, 'height': height, 'size': len(body)})
+            variant_bytes += len(body)
+        # Orientation 6: the portrait result is taller than wide
+        assert rendered['height'] > rendered['width']
+        for fmt in formats:
+            card_bytes[fmt] += pick_variant(variants, args.card_width, fmt)['size']
+
+    original_bytes = sum(len(d) for d in uploads)
+    results = {
+        'ms_per_photo': round(sum(timings) / len(timings) * 1000, 1),
+        'original_kb_per_photo': round(original_bytes / len(uploads) / 1024, 1),
+        'card_kb_per_photo': {fmt: round(b / len(uploads) / 1024, 1) for fmt, b in card_bytes.items()},
+        'stored_kb_per_photo': round(variant_bytes / len(uploads) / 1024, 1),
+        'card_weight_reduction': {fmt: f"{original_bytes / b:.0f}x" for fmt, b in card_bytes.items()},
+    }
+
+    print(f"\n{args.photos} photos, {args.megapixels} MP, widths {widths}, formats {formats}, "
+          f"Pillow {PIL.__version__}")
+    for name, value in results.items():
+        print(f"{name:<24}{value}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""Throughput and worst-case timing of the experience_text PII filter.
+
+Scans --posts synthetic posts of --size bytes (a --pii-share of them with a
+phone number, email, handle, URL or address buried somewhere) with:
+
+  combined      pii_utils.pii_filter: every detector in one compiled pass
+  per_detector  the same detectors compiled and run one after another
+  legacy        the old "any digit or @" check, for its rejection rate
+
+then times adversarial inputs at PII_MAX_TEXT_LENGTH to show the worst case
+stays bounded.
+
+Usage (from backend/):
+    python -m bench.pii --posts 2000 --size 10240
+"""
+import argparse
+import json
+import random
+import time
+
+from bench.seed import NAMES, WORDS
+from pii_utils import DEFAULT_DETECTORS, PII_MAX_TEXT_LENGTH, PiiFilter, load_denylist, pii_filter
+
+# Benign sentences with the digits and @-free punctuation real posts have
+SENTENCES = [
+    "We went on {n} dates before she stopped replying.",
+    "She was {n} minutes late, again.",
+    "In {year} we met through friends and it was fine for a while.",
+    "I paid for dinner {n} times and never heard a thank you.",
+    "She said she'd call at {n} and didn't.",
+    "We spent {n} nights at her place.",
+    "After {n} months in the same lane she changed jobs.",
+    "It was kind of - she ghosted me.",
+]
+PII_SNIPPETS = [
+    "text her at (555) 301-{n:04d}",
+    "her email is jane{n}@gmail.com",
+    "find her on ig: jane_{n}",
+    "her page is https://example.com/u/{n}",
+    "she lives at {n} North Maple Street",
+    "her number is five five five one two three four five six seven",
+]
+ADVERSARIAL = {
+    'digits': '1',
+    'at_signs': '@',
+    'letters': 'a',
+    'dotted_labels': 'a.',
+    'number_words': 'one ',
+    'address_prefix': '1 word ',
+    'email_prefix': 'x@y ',
+}
+
+
+def make_post(rng, size, with_pii):
+    parts, length = [], 0
+    while length < size:
+        if rng.random() < 0.2:
+            part = rng.choice(SENTENCES).format(n=rng.randint(2, 59), year=rng.randint(2015, 2024))
+        else:
+            part = ' '.join(rng.choice(WORDS) for _ in range(12)).capitalize() + '.'
+        parts.append(part)
+        length += len(part) + 1
+    if with_pii:
+        parts.insert(rng.randrange(len(parts)), rng.choice(PII_SNIPPETS).format(n=rng.randint(1, 9999)))
+    parts.insert(rng.randrange(len(parts)), f'{rng.choice(NAMES)} was there too.')
+    # Not truncated to `size`: that could cut the PII snippet in half
+    return ' '.join(parts)
+
+
+def legacy_check(text):
+    return any(ch.isdigit() for ch in text) or '@' in text
+
+
+def time_scans(name, fn, posts):
+    latencies, flagged = [], 0
+    started = time.perf_counter()
+    for post in posts:
+        t = time.perf_counter()
+        flagged += bool(fn(post))
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    total_mb = sum(len(p.encode()) for p in posts) / 1e6
+    return {
+        'mode': name,
+        'posts_per_sec': round(len(posts) / elapsed, 1),
+        'mb_per_sec': round(total_mb / elapsed, 2),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 3),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 3),
+        'flagged': flagged,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=10240, help='Bytes per post')
+    parser.add_argument('--pii-share', type=float, default=0.5)
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with_pii = [rng.random() < args.pii_share for _ in range(args.posts)]
+    posts = [make_post(rng, args.size, p) for p in with_pii]
+
+    separate = [PiiFilter({kind: pattern}) for kind, pattern in DEFAULT_DETECTORS.items()]
+    denylist = load_denylist()
+    if denylist:
+        separate.append(PiiFilter({}, denylist))
+    results = [
+        time_scans('combined', pii_filter.scan, posts),
+        time_scans('per_detector', lambda text: [m for f in separate for m in f.scan(text)], posts),
+        time_scans('legacy', legacy_check, posts),
+    ]
+
+    worst = []
+    for name, unit in ADVERSARIAL.items():
+        text = (unit * (PII_MAX_TEXT_LENGTH // len(unit) + 1))[:PII_MAX_TEXT_LENGTH]
+        t = time.perf_counter()
+        matches = pii_filter.scan(text)
+        worst.append({'input': name, 'chars': len(text), 'ms': round((time.perf_counter() - t) * 1000, 2),
+                      'matches': len(matches)})
+
+    # Linear growth check: double the input, time should roughly double
+    growth = []
+    for size in (2500, 5000, 10000, 20000):
+        text = (posts[0] * (size // len(posts[0]) + 1))[:size]
+        t = time.perf_counter()
+        for _ in range(20):
+            pii_filter.scan(text)
+        growth.append({'chars': size, 'ms': round((time.perf_counter() - t) * 1000 / 20, 3)})
+
+    print(f"\n{args.posts} posts of {args.size} bytes, {sum(with_pii)} with PII "
+          f"(regex flags should match; legacy also flags the benign ones)")
+    print(f"{'mode':<14}{'posts/s':>10}{'MB/s':>8}{'p50_ms':>10}{'p99_ms':>10}{'flagged':>9}")
+    for r in results:
+        print(f"{r['mode']:<14}{r['posts_per_sec']:>10}{r['mb_per_sec']:>8}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['flagged']:>9}")
+    print(f"\nWorst case at PII_MAX_TEXT_LENGTH={PII_MAX_TEXT_LENGTH}")
+    for w in worst:
+        print(f"  {w['input']:<16}{w['ms']:>8} ms  ({w['matches']} matches)")
+    print("\nScan time vs. input length: " + ', '.join(f"{g['chars']}: {g['ms']} ms" for g in growth))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results, 'worst_case': worst, 'growth': growth}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""database/schema.sql on a local Postgres, for benchmarks and the tests.
+
+apply_schema() loads schema.sql minus the sections that need Supabase
+(extensions, storage, RLS roles). load_seeded() copies a database written by
+bench.seed into it, so the same rows can be read through the real functions
+and through bench.postgrest_standin.
+"""
+import re
+import sqlite3
+from pathlib import Path
+
+import psycopg2.extras
+
+SCHEMA_PATH = Path(__file__).resolve().parents[2] / 'database' / 'schema.sql'
+SUPABASE_ONLY_SECTIONS = ('1', '4', '5')
+# In foreign-key order. The aggregates are copied as bench.seed computed them,
+# with the triggers that would recompute them row by row switched off meanwhile.
+SEEDED_TABLES = ('users', 'female_profiles', 'experiences', 'ratings', 'experience_votes', 'redeem_sessions',
+                 'profile_rating_stats', 'token_revocations', 'audit_log')
+AGGREGATE_TRIGGERS = (('ratings', 'trg_ratings_stats'), ('experience_votes', 'trg_experience_votes_tally'))
+CHUNK = 50000
+
+
+def schema_sections(path=SCHEMA_PATH):
+    """schema.sql split on its `-- ### N.` headers, Supabase-only sections dropped."""
+    sections = []
+    for part in re.split(r'(?m)^(?=-- ### \d+\.)', Path(path).read_text()):
+        header = re.match(r'-- ### (\d+)\.', part)
+        if header and header.group(1) not in SUPABASE_ONLY_SECTIONS:
+            sections.append(part)
+    return sections
+
+
+def apply_schema(conn, path=SCHEMA_PATH):
+    with conn.cursor() as cur:
+        for section in schema_sections(path):
+            cur.execute(section)
+
+
+def _copy_columns(cur, lite, table):
+    """Columns both sides store, and which of them are boolean. Postgres computes
+    its generated columns and search_vector itself."""
+    cur.execute("""SELECT column_name, data_type = 'boolean' FROM information_schema.columns
+                   WHERE table_schema = 'public' AND table_name = %s AND is_generated = 'NEVER'
+                     AND data_type <> 'tsvector' AND COALESCE(column_default, '') NOT LIKE 'nextval%%'
+                   ORDER BY ordinal_position""", (table,))
+    stored = {row[1] for row in lite.execute(f'PRAGMA table_xinfo({table})') if row[6] == 0}
+    columns = [row for row in cur.fetchall() if row[0] in stored]
+    return [name for name, _ in columns], [i for i, (_, boolean) in enumerate(columns) if boolean]
+
+
+def load_seeded(sqlite_path, conn) -> dict:
+    """Copy every row of a bench.seed database into `conn`, which must have
+    schema.sql applied and no rows yet. Returns rows copied per table."""
+    lite = sqlite3.connect(sqlite_path)
+    copied = {}
+    with conn.cursor() as cur:
+        for table, trigger in AGGREGATE_TRIGGERS:
+            cur.execute(f'ALTER TABLE public.{table} DISABLE TRIGGER {trigger}')
+        try:
+            for table in SEEDED_TABLES:
+                columns, booleans = _copy_columns(cur, lite, table)
+                rows = lite.execute(f"SELECT {', '.join(columns)} FROM {table}")
+                copied[table] = 0
+                while True:
+                    chunk = rows.fetchmany(CHUNK)
+                    if not chunk:
+                        break
+                    if booleans:
+                        chunk = [[bool(v) if i in booleans and v is not None else v for i, v in enumerate(row)]
+                                 for row in chunk]
+                    # Not COPY: psycopg2 refuses it once psycogreen's wait callback is installed
+                    psycopg2.extras.execute_values(
+                        cur, f"INSERT INTO public.{table} ({', '.join(columns)}) VALUES %s", chunk, page_size=1000)
+                    copied[table] += len(chunk)
+        finally:
+            for table, trigger in AGGREGATE_TRIGGERS:
+                cur.execute(f'ALTER TABLE public.{table} ENABLE TRIGGER {trigger}')
+        cur.execute('ANALYZE')
+    lite.close()
+    return copied
+
@@ -0,0 +1,850 @@
+"""Minimal PostgREST stand-in over SQLite, for benchmarks.
+
+Serves the subset of the PostgREST API that supabase-py sends for the
+queries in app.py (select/embed, eq/lt/in/is/... filters, or=/and= trees,
+order, limit, single-object responses, insert/upsert/update/delete with
+return=representation) plus Python versions of the RPCs in
+database/schema.sql. Triggers that maintain aggregates are mirrored in
+SQLite so write paths cost roughly what they do in Postgres.
+tests/test_standin_parity.py loads the same rows into Postgres and checks
+each RPC and trigger against the real one; search ranks are the exception
+(FTS5's bm25 for ts_rank), so only what matches is compared.
+
+--latency-ms delays every response, standing in for the network round-trip
+to a hosted Supabase.
+
+Usage (from backend/):
+    python -m bench.postgrest_standin --db /tmp/bro_bench.sqlite --port 54321
+"""
+import argparse
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
+
+from flask import Flask, Response, request
+from werkzeug.serving import WSGIRequestHandler, run_simple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL UNIQUE,
+    password_hash TEXT NOT NULL,
+    is_admin INTEGER NOT NULL DEFAULT 0,
+    token_version INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS female_profiles (
+    id TEXT PRIMARY KEY,
+    display_name TEXT NOT NULL,
+    bio TEXT,
+    photos TEXT DEFAULT '[]',
+    cover_photo TEXT GENERATED ALWAYS AS (COALESCE(json_extract(photos, '$[0].variants[0].url'), json_extract(photos, '$[0]'))) VIRTUAL,
+    cover_variants TEXT GENERATED ALWAYS AS (json_extract(photos, '$[0].variants')) VIRTUAL,
+    bio_snippet TEXT GENERATED ALWAYS AS (substr(bio, 1, 100)) VIRTUAL,
+    moderation_status TEXT NOT NULL DEFAULT 'pending',
+    invite_token TEXT UNIQUE,
+    invite_token_expires_at TEXT,
+    created_by_user_id TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS experiences (
+    id TEXT PRIMARY KEY,
+    profile_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    experience_text TEXT NOT NULL,
+    tags TEXT DEFAULT '[]',
+    moderation_status TEXT NOT NULL DEFAULT 'pending',
+    upvotes INTEGER NOT NULL DEFAULT 0,
+    downvotes INTEGER NOT NULL DEFAULT 0,
+    score INTEGER GENERATED ALWAYS AS (upvotes - downvotes) VIRTUAL,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS ratings (
+    id TEXT PRIMARY KEY,
+    profile_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    honesty INTEGER NOT NULL,
+    communication INTEGER NOT NULL,
+    accountability INTEGER NOT NULL,
+    consistency INTEGER NOT NULL,
+    drama_level INTEGER NOT NULL,
+    created_at TEXT,
+    updated_at TEXT,
+    UNIQUE (profile_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS experience_votes (
+    id TEXT PRIMARY KEY,
+    experience_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    vote INTEGER NOT NULL,
+    created_at TEXT,
+    UNIQUE (experience_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS redeem_sessions (
+    id TEXT PRIMARY KEY,
+    profile_id TEXT NOT NULL,
+    room_name TEXT NOT NULL UNIQUE,
+    session_token TEXT NOT NULL UNIQUE,
+    expires_at TEXT NOT NULL,
+    created_by_user_id TEXT NOT NULL,
+    is_active INTEGER DEFAULT 1,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS audit_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT,
+    action TEXT NOT NULL,
+    target_table TEXT,
+    target_id TEXT,
+    details TEXT,
+    timestamp TEXT,
+    entry_id TEXT
+);
+CREATE TABLE IF NOT EXISTS token_revocations (
+    user_id TEXT PRIMARY KEY,
+    min_token_version INTEGER NOT NULL,
+    revoked_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS profile_rating_stats (
+    profile_id TEXT PRIMARY KEY,
+    rating_count INTEGER NOT NULL DEFAULT 0,
+    honesty_sum INTEGER NOT NULL DEFAULT 0,
+    communication_sum INTEGER NOT NULL DEFAULT 0,
+    accountability_sum INTEGER NOT NULL DEFAULT 0,
+    consistency_sum INTEGER NOT NULL DEFAULT 0,
+    drama_level_sum INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_profiles_status_created ON female_profiles (moderation_status, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_experiences_profile_score ON experiences (profile_id, moderation_status, upvotes - downvotes DESC, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_ratings_profile_id ON ratings (profile_id);
+CREATE INDEX IF NOT EXISTS idx_experiences_status_created ON experiences (moderation_status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_sessions_active_expires ON redeem_sessions (expires_at) WHERE is_active;
+CREATE INDEX IF NOT EXISTS idx_sessions_inactive_expires ON redeem_sessions (expires_at) WHERE NOT is_active;
+CREATE INDEX IF NOT EXISTS idx_profiles_invite_expires ON female_profiles (invite_token_expires_at) WHERE invite_token IS NOT NULL;
+-- search_vector + GIN index stand-ins: external-content FTS5 tables over the same rows
+CREATE VIRTUAL TABLE IF NOT EXISTS female_profiles_fts USING fts5(
+    display_name, bio, content='female_profiles', tokenize='porter unicode61'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS experiences_fts USING fts5(
+    tags, experience_text, content='experiences', tokenize='porter unicode61'
+);
+"""
+
+# Mirrors trg_ratings_stats / trg_experience_votes_tally and the search_vector
+# triggers. Created after bulk seeding.
+# NOT EXISTS rather than INSERT OR IGNORE: an outer upsert's conflict policy
+# overrides the one on statements inside its triggers.
+TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_ratings_stats_del AFTER DELETE ON ratings BEGIN
+    UPDATE profile_rating_stats SET rating_count = rating_count - 1,
+        honesty_sum = honesty_sum - OLD.honesty, communication_sum = communication_sum - OLD.communication,
+        accountability_sum = accountability_sum - OLD.accountability, consistency_sum = consistency_sum - OLD.consistency,
+        drama_level_sum = drama_level_sum - OLD.drama_level
+    WHERE profile_id = OLD.profile_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_ratings_stats_upd AFTER UPDATE ON ratings BEGIN
+    UPDATE profile_rating_stats SET rating_count = rating_count - 1,
+        honesty_sum = honesty_sum - OLD.honesty, communication_sum = communication_sum - OLD.communication,
+        accountability_sum = accountability_sum - OLD.accountability, consistency_sum = consistency_sum - OLD.consistency,
+        drama_level_sum = drama_level_sum - OLD.drama_level
+    WHERE profile_id = OLD.profile_id;
+    INSERT INTO profile_rating_stats (profile_id) SELECT NEW.profile_id
+        WHERE NOT EXISTS (SELECT 1 FROM profile_rating_stats WHERE profile_id = NEW.profile_id);
+    UPDATE profile_rating_stats SET rating_count = rating_count + 1,
+        honesty_sum = honesty_sum + NEW.honesty, communication_sum = communication_sum + NEW.communication,
+        accountability_sum = accountability_sum + NEW.accountability, consistency_sum = consistency_sum + NEW.consistency,
+        drama_level_sum = drama_level_sum + NEW.drama_level
+    WHERE profile_id = NEW.profile_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_ratings_stats_ins AFTER INSERT ON ratings BEGIN
+    INSERT INTO profile_rating_stats (profile_id) SELECT NEW.profile_id
+        WHERE NOT EXISTS (SELECT 1 FROM profile_rating_stats WHERE profile_id = NEW.profile_id);
+    UPDATE profile_rating_stats SET rating_count = rating_count + 1,
+        honesty_sum = honesty_sum + NEW.honesty, communication_sum = communication_sum + NEW.communication,
+        accountability_sum = accountability_sum + NEW.accountability, consistency_sum = consistency_sum + NEW.consistency,
+        drama_level_sum = drama_level_sum + NEW.drama_level
+    WHERE profile_id = NEW.profile_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_votes_tally_ins AFTER INSERT ON experience_votes BEGIN
+    UPDATE experiences SET upvotes = upvotes + (NEW.vote = 1), downvotes = downvotes + (NEW.vote = -1)
+    WHERE id = NEW.experience_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_votes_tally_upd AFTER UPDATE ON experience_votes BEGIN
+    UPDATE experiences SET upvotes = upvotes - (OLD.vote = 1), downvotes = downvotes - (OLD.vote = -1)
+    WHERE id = OLD.experience_id;
+    UPDATE experiences SET upvotes = upvotes + (NEW.vote = 1), downvotes = downvotes + (NEW.vote = -1)
+    WHERE id = NEW.experience_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_votes_tally_del AFTER DELETE ON experience_votes BEGIN
+    UPDATE experiences SET upvotes = upvotes - (OLD.vote = 1), downvotes = downvotes - (OLD.vote = -1)
+    WHERE id = OLD.experience_id;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_profiles_fts_ins AFTER INSERT ON female_profiles BEGIN
+    INSERT INTO female_profiles_fts (rowid, display_name, bio) VALUES (NEW.rowid, NEW.display_name, NEW.bio);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_profiles_fts_upd AFTER UPDATE OF display_name, bio ON female_profiles BEGIN
+    INSERT INTO female_profiles_fts (female_profiles_fts, rowid, display_name, bio)
+        VALUES ('delete', OLD.rowid, OLD.display_name, OLD.bio);
+    INSERT INTO female_profiles_fts (rowid, display_name, bio) VALUES (NEW.rowid, NEW.display_name, NEW.bio);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_profiles_fts_del AFTER DELETE ON female_profiles BEGIN
+    INSERT INTO female_profiles_fts (female_profiles_fts, rowid, display_name, bio)
+        VALUES ('delete', OLD.rowid, OLD.display_name, OLD.bio);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_experiences_fts_ins AFTER INSERT ON experiences BEGIN
+    INSERT INTO experiences_fts (rowid, tags, experience_text) VALUES (NEW.rowid, NEW.tags, NEW.experience_text);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_experiences_fts_upd AFTER UPDATE OF tags, experience_text ON experiences BEGIN
+    INSERT INTO experiences_fts (experiences_fts, rowid, tags, experience_text)
+        VALUES ('delete', OLD.rowid, OLD.tags, OLD.experience_text);
+    INSERT INTO experiences_fts (rowid, tags, experience_text) VALUES (NEW.rowid, NEW.tags, NEW.experience_text);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_experiences_fts_del AFTER DELETE ON experiences BEGIN
+    INSERT INTO experiences_fts (experiences_fts, rowid, tags, experience_text)
+        VALUES ('delete', OLD.rowid, OLD.tags, OLD.experience_text);
+END;
+"""
+
+JSON_COLUMNS = {'photos', 'cover_variants', 'tags', 'details'}
+BOOL_COLUMNS = {'is_active', 'is_admin'}
+# Embedded resources (alias:table(cols)) are joined through these FK columns
+EMBED_FKS = {'users': 'user_id', 'female_profiles': 'profile_id', 'experiences': 'experience_id'}
+OPERATORS = {'eq': '=', 'neq': '!=', 'lt': '<', 'lte': '<=', 'gt': '>', 'gte': '>=', 'like': 'LIKE', 'ilike': 'LIKE'}
+RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+
+
+class QueryError(Exception):
+    def __init__(self, message, status=400, code='PGRST100'):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    return conn
+
+
+class Store:
+    """SQLite database plus the column metadata needed to translate PostgREST queries."""
+
+    def __init__(self, path: str):
+        self.conn = connect(path)
+        self.conn.executescript(SCHEMA)
+        # Databases seeded before audit entries carried an entry_id
+        if 'entry_id' not in [col['name'] for col in self.conn.execute("PRAGMA table_info(audit_log)")]:
+            self.conn.execute("ALTER TABLE audit_log ADD COLUMN entry_id TEXT")
+        self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_audit_log_entry_id ON audit_log (entry_id)")
+        self.conn.executescript(TRIGGERS)
+        self.lock = threading.Lock()
+        self.columns = {}   # table -> [column]
+        self.writable = {}  # table -> {column} (excludes generated columns)
+        for (table,) in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"):
+            info = self.conn.execute(f"PRAGMA table_xinfo({table})").fetchall()
+            self.columns[table] = [col['name'] for col in info]
+            self.writable[table] = {col['name'] for col in info if col['hidden'] == 0}
+
+    def table(self, name):
+        if name not in self.columns:
+            raise QueryError(f'relation "public.{name}" does not exist', 404, '42P01')
+        return name
+
+    def column(self, table, name):
+        if name not in self.columns[table]:
+            raise QueryError(f'column {table}.{name} does not exist', 400, '42703')
+        return name
+
+
+# --- value conversion ---
+
+def to_db(column, value):
+    if column in JSON_COLUMNS and value is not None and not isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def from_db(row) -> dict:
+    out = dict(row)
+    for column in JSON_COLUMNS & out.keys():
+        if out[column] is not None:
+            out[column] = json.loads(out[column])
+    for column in BOOL_COLUMNS & out.keys():
+        if out[column] is not None:
+            out[column] = bool(out[column])
+    return out
+
+
+def filter_value(column, raw):
+    if column in BOOL_COLUMNS and raw.lower() in ('true', 'false'):
+        return 1 if raw.lower() == 'true' else 0
+    return raw
+
+
+# --- PostgREST filter parsing ---
+
+def unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        out, i = [], 1
+        while i < len(value) - 1:
+            if value[i] == '\\':
+                i += 1
+            out.append(value[i])
+            i += 1
+        return ''.join(out)
+    return value
+
+
+def split_top_level(text: str) -> list:
+    # Split on commas that are outside parentheses and double quotes
+    parts, depth, quoted, start, i = [], 0, False, 0, 0
+    while i < len(text):
+        ch = text[i]
+        if quoted:
+            if ch == '\\':
+                i += 1
+            elif ch == '"':
+                quoted = False
+        elif ch == '"':
+            quoted = True
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+        i += 1
+    parts.append(text[start:])
+    return [p for p in parts if p]
+
+
+def condition_sql(store, table, column, expr, params) -> str:
+    column = store.column(table, column)
+    negate = expr.startswith('not.')
+    if negate:
+        expr = expr[4:]
+    op, _, raw = expr.partition('.')
+    if op in OPERATORS:
+        value = unquote(raw)
+        if op in ('like', 'ilike'):
+            value = value.replace('*', '%')
+        params.append(filter_value(column, value))
+        sql = f'"{column}" {OPERATORS[op]} ?'
+    elif op == 'is':
+        literal = {'null': 'NULL', 'true': '1', 'false': '0'}.get(raw.lower())
+        if literal is None:
+            raise QueryError(f'invalid is. value {raw}')
+        sql = f'"{column}" IS {literal}'
+    elif op == 'in':
+        values = [unquote(v) for v in split_top_level(raw.strip()[1:-1])]
+        if not values:
+            sql = '0'
+        else:
+            params.extend(filter_value(column, v) for v in values)
+            sql = f'"{column}" IN ({", ".join("?" * len(values))})'
+    else:
+        raise QueryError(f'unsupported operator {op}')
+    return f'NOT ({sql})' if negate else sql
+
+
+def tree_sql(store, table, joiner, body, params) -> str:
+    # body is the inside of or=(...) / and=(...)
+    clauses = []
+    for item in split_top_level(body):
+        for nested in ('and', 'or'):
+            if item.startswith(nested + '('):
+                clauses.append(tree_sql(store, table, nested, item[len(nested) + 1:-1], params))
+                break
+        else:
+            column, _, expr = item.partition('.')
+            clauses.append(condition_sql(store, table, column, expr, params))
+    return '(' + f' {joiner.upper()} '.join(clauses) + ')'
+
+
+def where_sql(store, table, args) -> tuple:
+    clauses, params = [], []
+    for key, value in args.items(multi=True):
+        if key in RESERVED_PARAMS:
+            continue
+        if key in ('or', 'and'):
+            clauses.append(tree_sql(store, table, key, value.strip()[1:-1], params))
+        else:
+            clauses.append(condition_sql(store, table, key, value, params))
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+
+def order_sql(store, table, order) -> str:
+    if not order:
+        return ''
+    terms = []
+    for term in order.split(','):
+        column, *mods = term.split('.')
+        direction = 'DESC' if 'desc' in mods else 'ASC'
+        terms.append(f'"{store.column(table, column)}" {direction}')
+    return ' ORDER BY ' + ', '.join(terms)
+
+
+def parse_select(store, table, select) -> tuple:
+    """Returns ([(output_name, column)], [(output_name, embed_table, [columns])])."""
+    columns, embeds = [], []
+    for item in split_top_level((select or '*').replace(' ', '')):
+        if '(' in item:
+            name, _, rest = item.partition('(')
+            alias, _, embed_table = name.rpartition(':')
+            embed_table = store.table(embed_table)
+            embed_columns = rest[:-1].split(',')
+            embeds.append((alias or embed_table, embed_table, embed_columns))
+        elif item == '*':
+            columns.extend((c, c) for c in store.columns[table])
+        else:
+            alias, _, column = item.rpartition(':')
+            columns.append((alias or column, store.column(table, column)))
+    return columns, embeds
+
+
+def attach_embeds(store, table, rows, embeds):
+    for alias, embed_table, embed_columns in embeds:
+        fk = EMBED_FKS[embed_table]
+        keys = list({row['__fk_' + fk] for row in rows if row.get('__fk_' + fk)})
+        related = {}
+        if keys:
+            if embed_columns == ['*']:
+                embed_columns = store.columns[embed_table]
+            wanted = ', '.join(f'"{store.column(embed_table, c)}"' for c in set(embed_columns) | {'id'})
+            query = f'SELECT {wanted} FROM "{embed_table}" WHERE id IN ({", ".join("?" * len(keys))})'
+            for rel in store.conn.execute(query, keys):
+                rel = from_db(rel)
+                related[rel['id']] = {c: rel[c] for c in embed_columns}
+        for row in rows:
+            row[alias] = related.get(row.get('__fk_' + fk))
+    for row in rows:
+        for key in [k for k in row if k.startswith('__fk_')]:
+            del row[key]
+    return rows
+
+
+def select_rows(store, table, args) -> list:
+    columns, embeds = parse_select(store, table, args.get('select'))
+    select_list = [f'"{col}" AS "{name}"' for name, col in columns]
+    select_list += [f'"{EMBED_FKS[t]}" AS "__fk_{EMBED_FKS[t]}"' for _, t, _ in embeds]
+    where, params = where_sql(store, table, args)
+    query = f'SELECT {", ".join(select_list)} FROM "{table}"{where}{order_sql(store, table, args.get("order"))}'
+    if args.get('limit'):
+        query += f' LIMIT {int(args["limit"])}'
+        if args.get('offset'):
+            query += f' OFFSET {int(args["offset"])}'
+    rows = [from_db(row) for row in store.conn.execute(query, params)]
+    return attach_embeds(store, table, rows, embeds)
+
+
+def fill_defaults(store, table, row) -> dict:
+    row = {store.column(table, k): to_db(k, v) for k, v in row.items()}
+    cols = store.columns[table]
+    if 'id' in cols and table != 'audit_log':
+        row.setdefault('id', str(uuid.uuid4()))
+    for stamp in ('created_at', 'updated_at', 'timestamp'):
+        if stamp in cols:
+            row.setdefault(stamp, now_iso())
+    return row
+
+
+def write_rows(store, table, rows, prefer, on_conflict) -> list:
+    upsert = 'resolution=merge-duplicates' in prefer
+    ignore = 'resolution=ignore-duplicates' in prefer
+    conflict_cols = [c.strip() for c in (on_conflict or 'id').split(',')]
+    out = []
+    for row in rows:
+        row = fill_defaults(store, table, row)
+        cols = list(row)
+        query = f'INSERT INTO "{table}" ({", ".join(cols)}) VALUES ({", ".join("?" * len(cols))})'
+        if upsert or ignore:
+            updates = [c for c in cols if c not in conflict_cols and c not in ('id', 'created_at')]
+            action = 'DO NOTHING' if ignore or not updates else 'DO UPDATE SET ' + ', '.join(f'"{c}" = excluded."{c}"' for c in updates)
+            query += f' ON CONFLICT ({", ".join(conflict_cols)}) {action}'
+        out.extend(from_db(r) for r in store.conn.execute(query + ' RETURNING *', [row[c] for c in cols]))
+    return out
+
+
+# --- RPCs (Python ports of database/schema.sql functions) ---
+
+RATING_KEYS = ['honesty', 'communication', 'accountability', 'consistency', 'drama_level']
+
+
+def average(total, count):
+    # ROUND(numeric, 1) takes halves away from zero; round() on a float goes to even
+    return float((Decimal(total) / count).quantize(Decimal('0.1'), ROUND_HALF_UP)) if count else 0
+
+
+def rpc_get_profile_bundle(store, params):
+    row = store.conn.execute(
+        "SELECT * FROM female_profiles WHERE id = ? AND moderation_status = 'approved'",
+        [params['p_profile_id']]
+    ).fetchone()
+    if row is None:
+        return []
+    bundle = from_db(row)
+    bundle.pop('invite_token', None)
+    bundle.pop('invite_token_expires_at', None)
+    experiences = []
+    for exp in store.conn.execute(
+        "SELECT e.*, u.username AS __username FROM experiences e JOIN users u ON u.id = e.user_id "
+        "WHERE e.profile_id = ? AND e.moderation_status = 'approved' ORDER BY e.score DESC, e.created_at DESC",
+        [bundle['id']]
+    ):
+        exp = from_db(exp)
+        exp['user'] = {'username': exp.pop('__username')}
+        experiences.append(exp)
+    bundle['experiences'] = experiences
+    stats = store.conn.execute("SELECT * FROM profile_rating_stats WHERE profile_id = ?", [bundle['id']]).fetchone()
+    count = stats['rating_count'] if stats else 0
+    bundle['average_ratings'] = {
+        key: average(stats[f'{key}_sum'], count) for key in RATING_KEYS
+    }
+    bundle['average_ratings']['count'] = count
+    return [{'bundle': bundle}]
+
+
+def rpc_rebuild_profile_rating_stats(store, params):
+    profile_id = params.get('p_profile_id')
+    where, args = ('WHERE profile_id = ?', [profile_id]) if profile_id else ('', [])
+    store.conn.execute(f"DELETE FROM profile_rating_stats {where}", args)
+    cur = store.conn.execute(
+        "INSERT INTO profile_rating_stats (profile_id, rating_count, honesty_sum, communication_sum, "
+        "accountability_sum, consistency_sum, drama_level_sum) "
+        "SELECT profile_id, COUNT(*), SUM(honesty), SUM(communication), SUM(accountability), "
+        f"SUM(consistency), SUM(drama_level) FROM ratings {where} GROUP BY profile_id", args
+    )
+    return [{'rebuilt': cur.rowcount}]
+
+
+def rpc_profile_rating_stats_drift(store, params):
+    sums = ', '.join(f'SUM({k}) AS {k}_sum' for k in RATING_KEYS)
+    actual = {r['profile_id']: r for r in store.conn.execute(f"SELECT profile_id, COUNT(*) AS rating_count, {sums} FROM ratings GROUP BY profile_id")}
+    stored = {r['profile_id']: r for r in store.conn.execute("SELECT * FROM profile_rating_stats")}
+    fields = ['rating_count'] + [f'{k}_sum' for k in RATING_KEYS]
+    drift = []
+    for profile_id in actual.keys() | stored.keys():
+        a = [actual[profile_id][f] if profile_id in actual else 0 for f in fields]
+        s = [stored[profile_id][f] if profile_id in stored else 0 for f in fields]
+        if a != s:
+            drift.append({'profile_id': profile_id, 'stored_count': s[0], 'actual_count': a[0]})
+    return drift
+
+
+def rpc_rebuild_experience_vote_tallies(store, params):
+    # Counts only the rows that were off, like the IS DISTINCT FROM in schema.sql
+    cur = store.conn.execute(
+        "UPDATE experiences SET upvotes = t.upvotes, downvotes = t.downvotes FROM ("
+        "SELECT e.id, COUNT(v.vote) FILTER (WHERE v.vote = 1) AS upvotes, COUNT(v.vote) FILTER (WHERE v.vote = -1) AS downvotes "
+        "FROM experiences e LEFT JOIN experience_votes v ON v.experience_id = e.id GROUP BY e.id"
+        ") t WHERE t.id = experiences.id AND (experiences.upvotes, experiences.downvotes) <> (t.upvotes, t.downvotes)"
+    )
+    return [{'rebuilt': cur.rowcount}]
+
+
+def fts_match(query: str):
+    """websearch_to_tsquery() as an FTS5 query: words and "phrases" are ANDed,
+    `or` between two of them ORs them and -word excludes. None when nothing is
+    left to require, which search_profiles() answers with no rows."""
+    groups, excluded, or_next = [], [], False
+    for token in re.findall(r'-?"[^"]*"?|\S+', query):
+        negate = token.startswith('-')
+        if not negate and token.lower() == 'or':
+            or_next = bool(groups)
+            continue
+        words = re.findall(r'\w+', token.lower())
+        if not words:
+            continue
+        phrase = '"' + ' '.join(words) + '"'
+        if negate:
+            excluded.append(phrase)
+        elif or_next:
+            groups[-1].append(phrase)
+        else:
+            groups.append([phrase])
+        or_next = False
+    if not groups:
+        return None
+    match = '(' + ' AND '.join('(' + ' OR '.join(group) + ')' for group in groups) + ')'
+    return match + ''.join(f' NOT {phrase}' for phrase in excluded)
+
+
+def rpc_search_profiles(store, params):
+    match = fts_match(params['p_query'])
+    if match is None:
+        return []
+    after_rank, after_id = params.get('p_after_rank'), params.get('p_after_id')
+    # Same shape as search_profiles() in schema.sql, with FTS5's rank (bm25
+    # with the column weights bench.seed configures) for ts_rank
+    query = """
+        WITH profile_hits AS (
+            SELECT p.id, -female_profiles_fts.rank AS rank
+            FROM female_profiles_fts JOIN female_profiles p ON p.rowid = female_profiles_fts.rowid
+            WHERE female_profiles_fts MATCH ? AND p.moderation_status = 'approved'
+        ),
+        experience_hits AS (
+            SELECT e.profile_id AS id, COUNT(*) AS matches
+            FROM experiences_fts JOIN experiences e ON e.rowid = experiences_fts.rowid
+            WHERE experiences_fts MATCH ? AND e.moderation_status = 'approved'
+            GROUP BY e.profile_id
+        ),
+        ranked AS (
+            SELECT ids.id, ROUND(2 * COALESCE(ph.rank, 0) + MIN(COALESCE(eh.matches, 0), 5) * 0.2, 6) AS rank,
+                   COALESCE(eh.matches, 0) AS matching_experiences
+            FROM (SELECT id FROM profile_hits UNION SELECT id FROM experience_hits) ids
+            LEFT JOIN profile_hits ph ON ph.id = ids.id
+            LEFT JOIN experience_hits eh ON eh.id = ids.id
+        )
+        SELECT p.id, p.display_name, p.cover_photo, p.cover_variants, p.bio_snippet, p.created_at, r.rank, r.matching_experiences
+        FROM ranked r JOIN female_profiles p ON p.id = r.id AND p.moderation_status = 'approved'
+        WHERE ? IS NULL OR (r.rank, r.id) < (?, ?)
+        ORDER BY r.rank DESC, r.id DESC
+        LIMIT ?
+    """
+    args = [match, match, after_rank, after_rank, after_id, int(params.get('p_limit') or 20)]
+    return [from_db(row) for row in store.conn.execute(query, args)]
+
+
+def _moderate(store, table, action, params, extra_where=''):
+    ids, status = params['p_ids'], params['p_status']
+    if status not in ('approved', 'rejected') or not ids:
+        return []
+    profile_column = 'profile_id' if table == 'experiences' else 'id'
+    changed = store.conn.execute(
+        f"UPDATE {table} SET moderation_status = ? WHERE id IN ({', '.join('?' * len(ids))}) "
+        f"AND moderation_status <> ?{extra_where} RETURNING id, {profile_column} AS profile_id",
+        [status, *ids, status]
+    ).fetchall()
+    stamp = now_iso()
+    store.conn.executemany(
+        "INSERT INTO audit_log (user_id, action, target_table, target_id, details, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+        [(params.get('p_moderator_id'), f'{action}_{status}', table, row['id'],
+          json.dumps({'profile_id': row['profile_id']}) if table == 'experiences' else None, stamp)
+         for row in changed]
+    )
+    return [dict(row) for row in changed]
+
+
+def rpc_moderate_experiences(store, params):
+    return _moderate(store, 'experiences', 'experience', params)
+
+
+def rpc_moderate_female_profiles(store, params):
+    return _moderate(store, 'female_profiles', 'profile', params,
+                     " AND invite_token IS NULL AND moderation_status NOT IN ('expired', 'processing')")
+
+
+def rpc_revoke_user_tokens(store, params):
+    row = store.conn.execute(
+        "UPDATE users SET token_version = token_version + 1 WHERE id = ? RETURNING token_version", [params['p_user_id']]
+    ).fetchone()
+    if row is None:
+        return []
+    # trg_users_revoke_tokens in Postgres
+    store.conn.execute(
+        "INSERT INTO token_revocations (user_id, min_token_version, revoked_at) VALUES (?, ?, ?) "
+        "ON CONFLICT (user_id) DO UPDATE SET min_token_version = excluded.min_token_version, revoked_at = excluded.revoked_at",
+        [params['p_user_id'], row['token_version'], now_iso()]
+    )
+    return [dict(row)]
+
+
+def rpc_deactivate_expired_sessions(store, params):
+    rows = store.conn.execute(
+        "UPDATE redeem_sessions SET is_active = 0 WHERE id IN ("
+        "SELECT id FROM redeem_sessions WHERE is_active AND expires_at < ? ORDER BY expires_at LIMIT ?"
+        ") RETURNING room_name",
+        [now_iso(), int(params.get('p_limit') or 500)]
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def rpc_purge_redeem_sessions(store, params):
+    cur = store.conn.execute(
+        "DELETE FROM redeem_sessions WHERE id IN ("
+        "SELECT id FROM redeem_sessions WHERE NOT is_active AND expires_at < ? ORDER BY expires_at LIMIT ?)",
+        [params['p_expired_before'], int(params.get('p_limit') or 500)]
+    )
+    return [{'purged': cur.rowcount}]
+
+
+def rpc_expire_profile_invites(store, params):
+    stamp = now_iso()
+    rows = store.conn.execute(
+        "UPDATE female_profiles SET invite_token = NULL, invite_token_expires_at = NULL, "
+        "moderation_status = 'expired', updated_at = ? WHERE id IN ("
+        "SELECT id FROM female_profiles WHERE invite_token IS NOT NULL AND invite_token_expires_at < ? "
+        "ORDER BY invite_token_expires_at LIMIT ?) RETURNING id",
+        [stamp, stamp, int(params.get('p_limit') or 500)]
+    ).fetchall()
+    store.conn.executemany(
+        "INSERT INTO audit_log (user_id, action, target_table, target_id, timestamp) VALUES (NULL, ?, ?, ?, ?)",
+        [('profile_invite_expired', 'female_profiles', row['id'], stamp) for row in rows]
+    )
+    return [dict(row) for row in rows]
+
+
+def rpc_export_profiles(store, params):
+    # '' sorts before every key, like the '-infinity' / nil-UUID defaults in schema.sql
+    after_created_at, after_id = params.get('p_after_created_at') or '', params.get('p_after_id') or ''
+    sums = ', '.join(f's.{k}_sum' for k in RATING_KEYS)
+    rows = store.conn.execute(
+        "SELECT p.id, p.display_name, p.bio, p.photos, p.created_at, p.updated_at, "
+        "(SELECT COUNT(*) FROM experiences e WHERE e.profile_id = p.id AND e.moderation_status = 'approved') "
+        f"AS experience_count, s.rating_count, {sums} "
+        "FROM female_profiles p LEFT JOIN profile_rating_stats s ON s.profile_id = p.id "
+        "WHERE p.moderation_status = 'approved' AND (p.created_at, p.id) > (?, ?) "
+        "ORDER BY p.created_at, p.id LIMIT ?",
+        [after_created_at, after_id, int(params.get('p_limit') or 1000)]
+    )
+    out = []
+    for row in rows:
+        profile = from_db(row)
+        count = profile.pop('rating_count') or 0
+        averages = {key: average(profile.pop(f'{key}_sum'), count) for key in RATING_KEYS}
+        averages['count'] = count
+        profile['average_ratings'] = averages
+        out.append(profile)
+    return out
+
+
+RPC_FUNCTIONS = {
+    'get_profile_bundle': rpc_get_profile_bundle,
+    'search_profiles': rpc_search_profiles,
+    'moderate_experiences': rpc_moderate_experiences,
+    'moderate_female_profiles': rpc_moderate_female_profiles,
+    'revoke_user_tokens': rpc_revoke_user_tokens,
+    'deactivate_expired_sessions': rpc_deactivate_expired_sessions,
+    'purge_redeem_sessions': rpc_purge_redeem_sessions,
+    'expire_profile_invites': rpc_expire_profile_invites,
+    'rebuild_profile_rating_stats': rpc_rebuild_profile_rating_stats,
+    'profile_rating_stats_drift': rpc_profile_rating_stats_drift,
+    'rebuild_experience_vote_tallies': rpc_rebuild_experience_vote_tallies,
+    'export_profiles': rpc_export_profiles,
+}
+
+
+# --- HTTP layer ---
+
+def create_app(store: Store, latency: float = 0.0) -> Flask:
+    app = Flask(__name__)
+
+    if latency:
+        @app.before_request
+        def round_trip():
+            time.sleep(latency)
+
+    def respond(payload, status=200):
+        return Response(json.dumps(payload), status=status, mimetype='application/json')
+
+    def error(e: QueryError):
+        return respond({'code': e.code, 'message': str(e), 'details': None, 'hint': None}, e.status)
+
+    def shape(rows):
+        # supabase-py's .single()/.maybe_single() ask for exactly one object
+        if 'vnd.pgrst.object' in request.headers.get('Accept', ''):
+            if len(rows) != 1:
+                raise QueryError('JSON object requested, multiple (or no) rows returned', 406, 'PGRST116')
+            return rows[0]
+        return rows
+
+    @app.route('/rest/v1/rpc/<name>', methods=['GET', 'POST'])
+    def rpc(name):
+        fn = RPC_FUNCTIONS.get(name)
+        if fn is None:
+            return error(QueryError(f'Could not find the function public.{name}', 404, 'PGRST202'))
+        params = request.get_json(silent=True) or dict(request.args)
+        with store.lock:
+            try:
+                store.conn.execute('BEGIN')
+                result = fn(store, params)
+                store.conn.execute('COMMIT')
+            except Exception:
+                store.conn.execute('ROLLBACK')
+                raise
+        return respond(result)
+
+    @app.route('/rest/v1/<table>', methods=['GET', 'HEAD', 'POST', 'PATCH', 'DELETE'])
+    def rest(table):
+        prefer = request.headers.get('Prefer', '')
+        try:
+            table = store.table(table)
+            with store.lock:
+                if request.method in ('GET', 'HEAD'):
+                    return respond(shape(select_rows(store, table, request.args)))
+
+                store.conn.execute('BEGIN')
+                try:
+                    if request.method == 'POST':
+                        body = request.get_json()
+                        rows = write_rows(store, table, body if isinstance(body, list) else [body],
+                                          prefer, request.args.get('on_conflict'))
+                        status = 201
+                    else:
+                        where, params = where_sql(store, table, request.args)
+                        if request.method == 'PATCH':
+                            body = {store.column(table, k): to_db(k, v) for k, v in request.get_json().items()}
+                            assignments = ', '.join(f'"{c}" = ?' for c in body)
+                            query = f'UPDATE "{table}" SET {assignments}{where} RETURNING *'
+                            params = list(body.values()) + params
+                        else:
+                            query = f'DELETE FROM "{table}"{where} RETURNING *'
+                        rows = [from_db(r) for r in store.conn.execute(query, params)]
+                        status = 200
+                    store.conn.execute('COMMIT')
+                except Exception:
+                    store.conn.execute('ROLLBACK')
+                    raise
+            if 'return=representation' not in prefer:
+                return Response(status=204 if status == 200 else 201)
+            return respond(shape(rows), status)
+        except QueryError as e:
+            return error(e)
+        except sqlite3.IntegrityError as e:
+            # "UNIQUE constraint failed: users.email" -> users_email_key, like Postgres
+            constraint = str(e).split(': ')[-1].split(',')[0].replace('.', '_') + '_key'
+            return error(QueryError(f'duplicate key value violates unique constraint "{constraint}"', 409, '23505'))
+
+    return app
+
+
+class KeepAliveHandler(WSGIRequestHandler):
+    # HTTP/1.1 so the app's httpx pool reuses connections, as it would with PostgREST
+    protocol_version = 'HTTP/1.1'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True, help='SQLite file (see bench.seed)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Added to every request')
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    run_simple(args.host, args.port, create_app(Store(args.db), args.latency_ms / 1000), threaded=True,
+               request_handler=KeepAliveHandler)
+
+
+if __name__ == '__main__':
+    main()
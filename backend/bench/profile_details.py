@@ -0,0 +1,143 @@
+"""Latency of GET /api/profiles/<id>'s data fetch: three queries against one RPC.
+
+Seeds (or reuses) a --profiles database, starts the PostgREST stand-in once
+per --latency-ms value (the delay it adds to every request, standing in for
+the network round-trip to Supabase) and fetches --requests random approved
+profiles through supabase-py, as the app does, each way:
+
+  three_queries  the profile, its approved experiences with authors and its
+                 rating stats, one request after another (the handler
+                 before get_profile_bundle)
+  bundle         db.get_profile_bundle: all of it from one RPC
+
+The first --check profiles are fetched both ways and compared before timing.
+
+Usage (from backend/):
+    python -m bench.profile_details --profiles 10000 --latency-ms 0,5,20
+    python -m bench.profile_details --requests 500 --json /tmp/profile_details.json
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+
+from bench.postgrest_standin import RATING_KEYS
+from bench.run import BACKEND_DIR, Stack, free_port, percentile
+from bench.seed import seed
+
+os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:9')
+os.environ.setdefault('SUPABASE_KEY', 'bench')
+
+import db_utils  # noqa: E402
+
+
+def three_queries(client, profile_id):
+    # The three sequential calls get_profile_details made before the RPC
+    profile = client.table('female_profiles').select('*').eq('id', profile_id).eq('moderation_status', 'approved').single().execute().data
+    profile['experiences'] = client.table('experiences').select('*, user:users(username)').eq('profile_id', profile_id).eq('moderation_status', 'approved').execute().data
+    stats = client.table('profile_rating_stats').select('*').eq('profile_id', profile_id).execute().data
+
+    avg_ratings = {key: 0 for key in RATING_KEYS}
+    avg_ratings['count'] = 0
+    if stats and stats[0]['rating_count'] > 0:
+        count = avg_ratings['count'] = stats[0]['rating_count']
+        for key in RATING_KEYS:
+            avg_ratings[key] = round(stats[0][f'{key}_sum'] / count, 1)
+    profile['average_ratings'] = avg_ratings
+    return profile
+
+
+def same_details(old, new) -> bool:
+    # The bundle drops the invite token fields and orders experiences by score
+    old = {k: v for k, v in old.items() if not k.startswith('invite_token')}
+    key = lambda exp: exp['id']
+    return ({**old, 'experiences': sorted(old['experiences'], key=key)}
+            == {**new, 'experiences': sorted(new['experiences'], key=key)})
+
+
+def time_fetches(fetch, profile_ids) -> dict:
+    latencies = []
+    started = time.perf_counter()
+    for profile_id in profile_ids:
+        t = time.perf_counter()
+        fetch(profile_id)
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'count': len(latencies),
+        'per_sec': round(len(latencies) / elapsed, 1),
+        **{f'p{pct}_ms': round(percentile(latencies, pct) * 1000, 2) for pct in (50, 95, 99)},
+        'max_ms': round(latencies[-1] * 1000, 2),
+    }
+
+
+def run_latency(db_path, latency_ms, profile_ids, check) -> dict:
+    from supabase import create_client
+
+    port = free_port()
+    standin = subprocess.Popen(
+        [sys.executable, '-m', 'bench.postgrest_standin', '--db', db_path, '--port', str(port),
+         '--latency-ms', str(latency_ms)],
+        cwd=BACKEND_DIR
+    )
+    try:
+        Stack._wait_http(port, '/rest/v1/users?select=id&limit=1')
+        client = create_client(f'http://127.0.0.1:{port}', 'bench')
+        db = db_utils.PostgrestBackend(lambda: client)
+        db.warm_up()
+        for profile_id in profile_ids[:check]:
+            if not same_details(three_queries(client, profile_id), db.get_profile_bundle(profile_id)):
+                raise RuntimeError(f'Profile {profile_id}: the bundle differs from the three queries')
+        return {
+            'three_queries': time_fetches(lambda profile_id: three_queries(client, profile_id), profile_ids),
+            'bundle': time_fetches(db.get_profile_bundle, profile_ids),
+        }
+    finally:
+        standin.terminate()
+        standin.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--profiles', type=int, default=10000)
+    parser.add_argument('--db', help='SQLite file; defaults to /tmp/bro_details_<profiles>.sqlite')
+    parser.add_argument('--requests', type=int, default=1000, help='Profiles fetched each way per latency')
+    parser.add_argument('--latency-ms', default='0,5,20', help='Comma list of round-trip delays to run')
+    parser.add_argument('--check', type=int, default=50, help='Profiles compared both ways first')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    db_path = args.db or f'/tmp/bro_details_{args.profiles}.sqlite'
+    seeded = {'db': db_path}
+    if not os.path.exists(db_path):
+        seeded.update(seed(db_path, profiles=args.profiles, users=1000, ratings=args.profiles * 20,
+                           redeem_rooms=0, bcrypt_rounds=4))
+    with sqlite3.connect(db_path) as conn:
+        approved = [row[0] for row in conn.execute("SELECT id FROM female_profiles WHERE moderation_status = 'approved'")]
+    rng = random.Random(42)
+    profile_ids = [rng.choice(approved) for _ in range(args.requests)]
+
+    results = {}
+    for latency_ms in args.latency_ms.split(','):
+        results[latency_ms] = run_latency(db_path, float(latency_ms), profile_ids, args.check)
+
+    print(f"\nDataset: {seeded}, {len(approved)} approved profiles")
+    print(f"{'latency_ms':<12}{'mode':<15}{'count':>7}{'per_sec':>10}{'p50_ms':>10}{'p95_ms':>10}{'p99_ms':>10}{'max_ms':>10}")
+    for latency_ms, modes in results.items():
+        for mode, r in modes.items():
+            print(f"{latency_ms:<12}{mode:<15}{r['count']:>7}{r['per_sec']:>10}{r['p50_ms']:>10}"
+                  f"{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'dataset': seeded, 'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,602 @@
+"""Load-test the HTTP API and the signaling server against a local Supabase stand-in.
+
+Seeds (or reuses) a SQLite database, starts bench.postgrest_standin and the
+app under gunicorn/eventlet exactly as the Dockerfile does, then runs:
+
+  http       register, login, get_profiles, get_profile_details, post_rating,
+             vote, search, each for --duration seconds with --concurrency
+             client threads
+  signaling  --pairs Socket.IO client pairs doing join_room -> offer/answer ->
+             ICE relay for --rounds rounds, optionally alongside a burst of
+             --login-burst concurrent logins and --abusers authenticated
+             clients flooding offers, ICE, joins and oversized SDP
+
+and reports throughput, p50/p95/p99 latency and the app worker's RSS.
+
+Usage (from backend/, needs bench/requirements.txt):
+    python -m bench.run --profiles 10000 --ratings 1000000
+    python -m bench.run --scenarios signaling --pairs 20 --ice-mode single --login-burst 8
+    python -m bench.run --scenarios signaling --pairs 20 --ice-mode single,batched
+    python -m bench.run --scenarios signaling --pairs 20 --abusers 20
+    python -m bench.run --profiles 100000 --ratings 1000000 --scenarios search
+
+The stand-in approximates search_profiles() with SQLite FTS5; bench.search
+times the real one on Postgres.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from bench.seed import NAMES, SEED_PASSWORD, TAGS, WORDS, seed
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# One of the app's cors_allowed_origins, so Socket.IO accepts the swarm
+BENCH_ORIGIN = 'http://localhost:3000'
+HTTP_SCENARIOS = ['register', 'login', 'get_profiles', 'get_profile_details', 'post_rating', 'vote', 'search']
+# Search mix: a name (a few % of profiles), a tag (a few % of experiences),
+# a common bio word (most profiles) and two common words together
+SEARCH_QUERIES = ([lambda: random.choice(NAMES)] * 4 + [lambda: random.choice(TAGS)] * 3
+                  + [lambda: random.choice(WORDS)] * 2 + [lambda: ' '.join(random.sample(WORDS, 2))])
+
+
+# --- helpers ---
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))]
+
+
+def summarize(name, latencies, outcomes, elapsed) -> dict:
+    latencies = sorted(latencies)
+    return {
+        'scenario': name,
+        'count': len(latencies),
+        'per_sec': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        'outcomes': dict(outcomes),
+    }
+
+
+def read_proc_status(pid) -> dict:
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('VmRSS', 'VmHWM'):
+                    fields[key] = int(value.split()[0]) / 1024  # MB
+    except OSError:
+        pass
+    return fields
+
+
+class RssSampler(threading.Thread):
+    """Samples a process's resident set size until stopped."""
+
+    def __init__(self, pid, interval=0.2):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            rss = read_proc_status(self.pid).get('VmRSS')
+            if rss:
+                self.samples.append(rss)
+            self._done.wait(self.interval)
+
+    def stop(self) -> dict:
+        self._done.set()
+        self.join()
+        status = read_proc_status(self.pid)
+        return {
+            'start_mb': round(self.samples[0], 1) if self.samples else None,
+            'end_mb': round(status.get('VmRSS', 0), 1),
+            'peak_mb': round(status.get('VmHWM', max(self.samples, default=0)), 1),
+        }
+
+
+# --- processes ---
+
+class Stack:
+    """The PostgREST stand-in plus the app under gunicorn, on free local ports.
+
+    `apps` > 1 starts that many separate gunicorn instances (app_ports), e.g.
+    to put two peers of one room on different workers; pass the shared
+    SOCKETIO_MESSAGE_QUEUE in `env`.
+    """
+
+    def __init__(self, db_path, bcrypt_rounds, apps=1, env=None):
+        self.db_path = db_path
+        self.bcrypt_rounds = bcrypt_rounds
+        self.env = env or {}
+        self.standin_port = free_port()
+        self.app_ports = [free_port() for _ in range(apps)]
+        self.app_port = self.app_ports[0]
+        self.procs = []
+
+    def __enter__(self):
+        self.procs.append(subprocess.Popen(
+            [sys.executable, '-m', 'bench.postgrest_standin', '--db', self.db_path, '--port', str(self.standin_port)],
+            cwd=BACKEND_DIR
+        ))
+        self._wait_http(self.standin_port, '/rest/v1/users?select=id&limit=1')
+
+        env = dict(os.environ)
+        env.update({
+            'SUPABASE_URL': f'http://127.0.0.1:{self.standin_port}',
+            'SUPABASE_KEY': 'bench',
+            'JWT_SECRET': 'bench-secret',
+            'BCRYPT_ROUNDS': str(self.bcrypt_rounds),
+        })
+        env.update(self.env)
+        for index, port in enumerate(self.app_ports):
+            # Each instance needs a journal of its own
+            journal = self.db_path + (f'.{index}' if index else '') + '.journal'
+            self.procs.append(subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '--worker-class', 'eventlet', '-w', '1',
+                 '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'app:app'],
+                cwd=BACKEND_DIR, env={**env, 'WRITE_QUEUE_JOURNAL': journal}
+            ))
+        self.app_proc = self.procs[1]
+        for port in self.app_ports:
+            self._wait_http(port, '/')
+        return self
+
+    def __exit__(self, *exc):
+        # App first, and wait: on SIGTERM it drains its write-behind queue into the stand-in
+        for proc in reversed(self.procs):
+            proc.terminate()
+            proc.wait(timeout=60)
+
+    def worker_pid(self) -> int:
+        # gunicorn master -> single eventlet worker; fall back to the master itself
+        try:
+            with open(f'/proc/{self.app_proc.pid}/task/{self.app_proc.pid}/children') as f:
+                children = f.read().split()
+            return int(children[0]) if children else self.app_proc.pid
+        except OSError:
+            return self.app_proc.pid
+
+    @staticmethod
+    def _wait_http(port, path, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+                conn.request('GET', path)
+                if conn.getresponse().status < 500:
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f'Nothing answered on port {port} within {timeout}s')
+
+
+# --- HTTP scenarios ---
+
+class HttpClient:
+    """Keep-alive JSON client, one per load thread."""
+
+    def __init__(self, port, token=None):
+        self.port = port
+        self.token = token
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+
+    def request(self, method, path, body=None):
+        headers = {'Content-Type': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        try:
+            self.conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+            resp = self.conn.getresponse()
+            raw = resp.read()
+        except (http.client.HTTPException, OSError):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+            raise
+        return resp.status, (json.loads(raw) if raw else None)
+
+
+def scenario_register(client, ctx, state):
+    name = f'bench_{uuid.uuid4().hex[:16]}'
+    return client.request('POST', '/auth/register', {'email': f'{name}@example.com', 'username': name, 'password': SEED_PASSWORD})[0]
+
+
+def scenario_login(client, ctx, state):
+    return client.request('POST', '/auth/login', {'username': random.choice(ctx['usernames']), 'password': SEED_PASSWORD})[0]
+
+
+def scenario_get_profiles(client, ctx, state):
+    # Page through the listing like dashboard.js, restarting after a few pages
+    path = '/api/profiles'
+    if state.get('cursor') and state.get('pages', 0) < 5:
+        path += f"?cursor={state['cursor']}"
+        state['pages'] = state.get('pages', 0) + 1
+    else:
+        state['pages'] = 0
+    status, data = client.request('GET', path)
+    state['cursor'] = data.get('next_cursor') if status == 200 else None
+    return status
+
+
+def scenario_get_profile_details(client, ctx, state):
+    return client.request('GET', f"/api/profiles/{random.choice(ctx['profile_ids'])}")[0]
+
+
+def scenario_post_rating(client, ctx, state):
+    rating = {key: random.randint(0, 5) for key in ('honesty', 'communication', 'accountability', 'consistency', 'drama_level')}
+    return client.request('POST', f"/api/profiles/{random.choice(ctx['profile_ids'])}/rating", rating)[0]
+
+
+def scenario_vote(client, ctx, state):
+    # Concentrated on a few hot experiences, like a vote storm
+    return client.request('POST', f"/api/experiences/{random.choice(ctx['hot_experience_ids'])}/vote",
+                          {'vote': random.choice((1, -1))})[0]
+
+
+def scenario_search(client, ctx, state):
+    # A fresh query, sometimes followed by its next page like dashboard.js "Load more"
+    if state.get('cursor') and random.random() < 0.3:
+        params = f"q={state['q']}&cursor={state['cursor']}"
+    else:
+        state['q'] = random.choice(SEARCH_QUERIES)().replace(' ', '+')
+        params = f"q={state['q']}"
+    status, data = client.request('GET', f'/api/search?{params}')
+    state['cursor'] = data.get('next_cursor') if status == 200 else None
+    return status
+
+
+SCENARIO_FUNCS = {
+    'register': scenario_register,
+    'login': scenario_login,
+    'get_profiles': scenario_get_profiles,
+    'get_profile_details': scenario_get_profile_details,
+    'post_rating': scenario_post_rating,
+    'vote': scenario_vote,
+    'search': scenario_search,
+}
+
+
+def run_http_scenario(name, stack, ctx, concurrency, duration) -> dict:
+    fn = SCENARIO_FUNCS[name]
+    latencies, outcomes, lock = [], Counter(), threading.Lock()
+
+    def worker(index):
+        client = HttpClient(stack.app_port, ctx['tokens'][index % len(ctx['tokens'])])
+        state, local_lat, local_out = {}, [], Counter()
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                outcome = fn(client, ctx, state)
+            except Exception as e:
+                outcome = type(e).__name__
+            local_lat.append(time.perf_counter() - started)
+            local_out[outcome] += 1
+        with lock:
+            latencies.extend(local_lat)
+            outcomes.update(local_out)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(name, latencies, outcomes, time.perf_counter() - started)
+
+
+def build_context(stack, db_path, token_users) -> dict:
+    conn = sqlite3.connect(db_path)
+    profile_ids = [r[0] for r in conn.execute(
+        "SELECT id FROM female_profiles WHERE moderation_status = 'approved' ORDER BY random() LIMIT 2000")]
+    usernames = [r[0] for r in conn.execute("SELECT username FROM users WHERE username LIKE 'bench_user_%' ORDER BY random() LIMIT 500")]
+    hot_experience_ids = [r[0] for r in conn.execute(
+        "SELECT id FROM experiences WHERE moderation_status = 'approved' ORDER BY random() LIMIT 5")]
+    # (room_name, session_token): the host connects with the room's redeem token, the guest with a JWT
+    rooms = conn.execute("SELECT room_name, session_token FROM redeem_sessions WHERE is_active = 1 ORDER BY room_name").fetchall()
+    conn.close()
+
+    # Real logins, so the tokens are whatever the app currently issues
+    tokens = []
+    client = HttpClient(stack.app_port)
+    for username in usernames[:token_users]:
+        status, data = client.request('POST', '/auth/login', {'username': username, 'password': SEED_PASSWORD})
+        if status != 200:
+            raise RuntimeError(f'Login for {username} failed: {status} {data}')
+        tokens.append(data['token'])
+    return {'profile_ids': profile_ids, 'usernames': usernames, 'rooms': rooms, 'tokens': tokens,
+            'hot_experience_ids': hot_experience_ids}
+
+
+# --- signaling swarm ---
+
+def scrape_counter(port, name) -> dict:
+    # {'label1/label2': value} for one counter in the app's /metrics
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.request('GET', '/metrics')
+    values = {}
+    for line in conn.getresponse().read().decode().splitlines():
+        if line.startswith(name + '{'):
+            labels, _, value = line[len(name):].rpartition(' ')
+            values['/'.join(re.findall(r'="([^"]*)"', labels))] = float(value)
+    return values
+
+
+def run_abuser(url, token, victims, rate, stop, sent):
+    # An authenticated client doing everything a flooder would: join spam,
+    # offers and ICE at peers it doesn't share a room with, oversized SDP.
+    # When the server disconnects it, it reconnects and carries on.
+    import socketio
+
+    junk = {'type': 'offer', 'sdp': 'v=0' + 'x' * 24000}
+    candidate = {'candidate': 'candidate:0 1 udp 2122260223 10.0.0.1 50000 typ host', 'sdpMid': '0', 'sdpMLineIndex': 0}
+    i = 0
+    while not stop.is_set():
+        client = socketio.Client(reconnection=False, websocket_extra_options={'origin': BENCH_ORIGIN})
+        try:
+            client.connect(url, transports=['websocket'], auth={'token': token}, wait_timeout=10)
+            sent['connects'] += 1
+            while not stop.is_set() and client.connected:
+                target = victims[i % len(victims)] if victims else 'nobody'
+                client.emit('join_room', {'room_name': f'abuse-{i}'})
+                client.emit('webrtc_offer', {'target_sid': target, 'sdp': junk})
+                client.emit('webrtc_ice_candidates', {'target_sid': target, 'candidates': [candidate] * 20})
+                client.emit('webrtc_ice_candidate', {'target_sid': target, 'candidate': candidate})
+                sent['messages'] += 4
+                i += 1
+                time.sleep(4 / rate)  # about `rate` messages per second
+        except socketio.exceptions.SocketIOError:
+            pass  # disconnected mid-emit
+        finally:
+            client.disconnect()
+
+
+def run_signaling(stack, ctx, pairs, rounds, candidates, ice_mode, sdp_bytes, abusers=0, abuse_rate=100) -> list:
+    import socketio
+
+    url = f'http://127.0.0.1:{stack.app_port}'
+    lat = {'join': [], 'offer': [], 'answer': [], 'ice': []}
+    outcomes = Counter()
+    lock = threading.Lock()
+    victims = []  # legitimate sids, for the abusers to aim at
+
+    def record(kind, started):
+        with lock:
+            lat[kind].append(time.perf_counter() - started)
+
+    def run_pair(index):
+        room, session_token = ctx['rooms'][index % len(ctx['rooms'])]
+        host, guest = (socketio.Client(reconnection=False, websocket_extra_options={'origin': BENCH_ORIGIN})
+                       for _ in range(2))
+        joined, answered, ice_done = threading.Event(), threading.Event(), threading.Event()
+        received = Counter()
+        peer = {}
+
+        @host.on('user_joined')
+        def on_user_joined(data):
+            peer['guest'] = data['sid']
+            record('join', peer['join_started'])
+            joined.set()
+
+        @guest.on('webrtc_offer')
+        def on_offer(data):
+            record('offer', data['sdp']['t'])
+            guest.emit('webrtc_answer', {'target_sid': data['sender_sid'],
+                                         'sdp': {'type': 'answer', 'sdp': data['sdp']['sdp'], 't': time.perf_counter()}})
+
+        @host.on('webrtc_answer')
+        def on_answer(data):
+            record('answer', data['sdp']['t'])
+            answered.set()
+
+        def on_candidates(side, batch):
+            now = time.perf_counter()
+            with lock:
+                lat['ice'].extend(now - c['t'] for c in batch)
+                outcomes['ice_messages'] += 1
+                received[side] += len(batch)
+                if received['host'] >= candidates and received['guest'] >= candidates:
+                    ice_done.set()
+
+        for side, client in (('host', host), ('guest', guest)):
+            client.on('webrtc_ice_candidate', lambda data, side=side: on_candidates(side, [data['candidate']]))
+            client.on('webrtc_ice_candidates', lambda data, side=side: on_candidates(side, data['candidates']))
+
+        def send_candidates(client, target):
+            for i in range(candidates):
+                candidate = {'candidate': f'candidate:{i} 1 udp 2122260223 10.0.0.{i % 250} 5{i:04d} typ host',
+                             'sdpMid': '0', 'sdpMLineIndex': 0, 't': time.perf_counter()}
+                if ice_mode == 'single':
+                    client.emit('webrtc_ice_candidate', {'target_sid': target, 'candidate': candidate})
+                else:
+                    client.emit('webrtc_ice_candidates', {'target_sid': target, 'candidates': [candidate],
+                                                          'done': i == candidates - 1})
+
+        try:
+            host.connect(url, transports=['websocket'], auth={'session_token': session_token}, wait_timeout=10)
+            guest.connect(url, transports=['websocket'], auth={'token': ctx['tokens'][index % len(ctx['tokens'])]},
+                          wait_timeout=10)
+            with lock:
+                victims.extend((host.get_sid(), guest.get_sid()))
+            host.call('join_room', {'room_name': room}, timeout=10)  # acked once the host is in
+            peer['join_started'] = time.perf_counter()
+            guest.emit('join_room', {'room_name': room})
+            if not joined.wait(10):
+                outcomes['join_timeout'] += 1
+                return
+            for _ in range(rounds):
+                answered.clear()
+                ice_done.clear()
+                received.clear()
+                host.emit('webrtc_offer', {'target_sid': peer['guest'],
+                                           'sdp': {'type': 'offer', 'sdp': 'v=0' + 'x' * sdp_bytes, 't': time.perf_counter()}})
+                if not answered.wait(10):
+                    outcomes['answer_timeout'] += 1
+                    return
+                senders = [threading.Thread(target=send_candidates, args=(host, peer['guest'])),
+                           threading.Thread(target=send_candidates, args=(guest, host.get_sid()))]
+                for t in senders:
+                    t.start()
+                for t in senders:
+                    t.join()
+                if not ice_done.wait(10):
+                    outcomes['ice_timeout'] += 1
+                    return
+                outcomes['rounds_ok'] += 1
+        except Exception as e:
+            outcomes[type(e).__name__] += 1
+        finally:
+            host.disconnect()
+            guest.disconnect()
+
+    stop, sent = threading.Event(), Counter()
+    flooders = [threading.Thread(target=run_abuser, args=(url, ctx['tokens'][i % len(ctx['tokens'])], victims, abuse_rate, stop, sent))
+                for i in range(abusers)]
+    dropped_before = scrape_counter(stack.app_port, 'signaling_dropped_total')
+    for t in flooders:
+        t.start()
+    threads = [threading.Thread(target=run_pair, args=(i,)) for i in range(pairs)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for t in flooders:
+        t.join()
+
+    results = [summarize(f'signaling_{kind}', values, {}, elapsed) for kind, values in lat.items()]
+    results[-1]['outcomes'] = dict(outcomes)
+    results[-1]['candidates_per_sec'] = round(len(lat['ice']) / elapsed, 1)
+    results[-1]['messages_per_sec'] = round(outcomes['ice_messages'] / elapsed, 1)
+    if abusers:
+        dropped = scrape_counter(stack.app_port, 'signaling_dropped_total')
+        dropped['connects'] = sent['connects']
+        results.append({'scenario': 'signaling_abuse', 'count': sent['messages'],
+                        'per_sec': round(sent['messages'] / elapsed, 1),
+                        'p50_ms': '-', 'p95_ms': '-', 'p99_ms': '-', 'max_ms': '-',
+                        'outcomes': {k: int(v - dropped_before.get(k, 0)) for k, v in dropped.items()
+                                     if v > dropped_before.get(k, 0)}})
+    return results
+
+
+# --- report ---
+
+def print_report(results, rss, seeded):
+    print(f"\nDataset: {seeded}")
+    print(f"{'scenario':<26}{'count':>8}{'per_sec':>10}{'p50_ms':>10}{'p95_ms':>10}{'p99_ms':>10}{'max_ms':>10}  outcomes")
+    for r in results:
+        print(f"{r['scenario']:<26}{r['count']:>8}{r['per_sec']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+              f"{r['p99_ms']:>10}{r['max_ms']:>10}  {r['outcomes']}")
+        if 'messages_per_sec' in r:
+            print(f"{'':<26}ice messages/s {r['messages_per_sec']}, candidates/s {r['candidates_per_sec']}")
+    print(f"\nApp worker RSS: start {rss['start_mb']} MB, end {rss['end_mb']} MB, peak {rss['peak_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--db', help='SQLite file; defaults to /tmp/bro_bench_<profiles>_<ratings>.sqlite')
+    parser.add_argument('--reseed', action='store_true', help='Rebuild the database even if it exists')
+    parser.add_argument('--profiles', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--ratings', type=int, default=1000000)
+    parser.add_argument('--bcrypt-rounds', type=int, default=12)
+    parser.add_argument('--scenarios', default='http,signaling',
+                        help=f"Comma list of: http, signaling, or individual HTTP scenarios ({', '.join(HTTP_SCENARIOS)})")
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per HTTP scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--pairs', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--candidates', type=int, default=20, help='ICE candidates each peer sends per round')
+    parser.add_argument('--ice-mode', default='batched',
+                        help='batched or single (one event per candidate); single,batched runs both in turn')
+    parser.add_argument('--sdp-bytes', type=int, default=3000)
+    parser.add_argument('--login-burst', type=int, default=0, help='Concurrent login threads during the signaling run')
+    parser.add_argument('--abusers', type=int, default=0, help='Flooding Socket.IO clients during the signaling run')
+    parser.add_argument('--abuse-rate', type=float, default=100, help='Messages per second each abuser sends')
+    parser.add_argument('--json', help='Also write the results to this file')
+    parser.add_argument('--metrics-out', help="Save the app's /metrics scrape after the run to this file")
+    args = parser.parse_args()
+
+    db_path = args.db or f'/tmp/bro_bench_{args.profiles}_{args.ratings}.sqlite'
+    seeded = {'db': db_path}
+    if args.reseed or not os.path.exists(db_path):
+        seeded.update(seed(db_path, profiles=args.profiles, users=args.users, ratings=args.ratings,
+                           bcrypt_rounds=args.bcrypt_rounds))
+
+    selected = []
+    for name in args.scenarios.split(','):
+        selected.extend(HTTP_SCENARIOS if name == 'http' else [name])
+
+    results = []
+    with Stack(db_path, args.bcrypt_rounds) as stack:
+        ctx = build_context(stack, db_path, token_users=min(args.concurrency, 8))
+        sampler = RssSampler(stack.worker_pid())
+        sampler.start()
+        for name in selected:
+            if name in SCENARIO_FUNCS:
+                results.append(run_http_scenario(name, stack, ctx, args.concurrency, args.duration))
+            elif name == 'signaling':
+                burst = None
+                if args.login_burst:
+                    burst_result = {}
+                    burst = threading.Thread(target=lambda: burst_result.update(
+                        run_http_scenario('login', stack, ctx, args.login_burst, args.duration)))
+                    burst.start()
+                ice_modes = args.ice_mode.split(',')
+                for ice_mode in ice_modes:
+                    if ice_mode not in ('batched', 'single'):
+                        parser.error(f'Unknown ICE mode {ice_mode}')
+                    for r in run_signaling(stack, ctx, args.pairs, args.rounds, args.candidates,
+                                           ice_mode, args.sdp_bytes, args.abusers, args.abuse_rate):
+                        if len(ice_modes) > 1:
+                            r['scenario'] += f'_{ice_mode}'
+                        results.append(r)
+                if burst:
+                    burst.join()
+                    burst_result['scenario'] = 'login_burst'
+                    results.append(burst_result)
+            else:
+                parser.error(f'Unknown scenario {name}')
+        rss = sampler.stop()
+        if args.metrics_out:
+            conn = http.client.HTTPConnection('127.0.0.1', stack.app_port, timeout=10)
+            conn.request('GET', '/metrics')
+            with open(args.metrics_out, 'wb') as f:
+                f.write(conn.getresponse().read())
+
+    print_report(results, rss, seeded)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'dataset': seeded, 'args': vars(args), 'results': results, 'rss': rss}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
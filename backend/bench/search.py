@@ -0,0 +1,180 @@
+"""search_profiles() at scale, on Postgres with database/schema.sql applied.
+
+Seeds (or reuses) a --profiles database with bench.seed, copies it into a
+local Postgres (pgserver in --pgdata, or --dsn) with bench.postgres, and times
+the real search_profiles() for each kind of query /api/search sees:
+
+  name      a first name (a few % of profiles)
+  tag       an experience tag (a few % of experiences)
+  word      a common bio word (most profiles)
+  two       two common words, both required
+  phrase    two common words in quotes
+  or        "a or b"
+  exclude   a word without another ("calm -late")
+  negated   a word excluded and nothing required ("-late"), answered empty
+
+each as a first page and as the page after it, reporting p50/p95/max in ms
+and how many profiles the kind's first query matches. Every second page is
+checked to follow the first in (rank, id) order. The same queries are timed through the
+stand-in's SQLite version, to show how far bench.run's search numbers are
+from Postgres.
+
+Usage (from backend/; needs psycopg2, and pgserver unless --dsn is given):
+    python -m bench.search --profiles 100000
+    python -m bench.search --profiles 100000 --dsn postgresql://localhost/bro_search --json /tmp/search.json
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import psycopg2
+
+from bench.postgres import apply_schema, load_seeded
+from bench.postgrest_standin import Store, rpc_search_profiles
+from bench.run import percentile
+from bench.seed import NAMES, TAGS, WORDS, seed
+
+QUERIES = {
+    'name': lambda rng: rng.choice(NAMES),
+    'tag': lambda rng: rng.choice(TAGS),
+    'word': lambda rng: rng.choice(WORDS),
+    'two': lambda rng: ' '.join(rng.sample(WORDS, 2)),
+    'phrase': lambda rng: '"{} {}"'.format(*rng.sample(WORDS, 2)),
+    'or': lambda rng: '{} or {}'.format(*rng.sample(NAMES, 2)),
+    'exclude': lambda rng: '{} -{}'.format(*rng.sample(WORDS, 2)),
+    'negated': lambda rng: f'-{rng.choice(WORDS)}',
+}
+PAGE = 20
+
+
+def connect(args):
+    if args.dsn:
+        conn = psycopg2.connect(args.dsn)
+    else:
+        import pgserver
+        server = pgserver.get_server(args.pgdata, cleanup_mode=None)
+        name = f'bro_search_{args.profiles}'
+        admin = psycopg2.connect(server.get_uri())
+        admin.autocommit = True
+        with admin.cursor() as cur:
+            cur.execute('SELECT 1 FROM pg_database WHERE datname = %s', (name,))
+            if cur.fetchone() is None:
+                cur.execute(f'CREATE DATABASE {name}')
+        admin.close()
+        conn = psycopg2.connect(server.get_uri(name))
+    conn.autocommit = True
+    return conn
+
+
+def load(conn, db_path) -> dict:
+    """Loads db_path unless an earlier run already did; returns what was loaded."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('public.female_profiles') IS NOT NULL")
+        if cur.fetchone()[0]:
+            cur.execute('SELECT COUNT(*) FROM public.female_profiles')
+            if cur.fetchone()[0]:
+                return {'reused': True}
+    started = time.perf_counter()
+    # One transaction, so an interrupted load isn't reused next time
+    conn.autocommit = False
+    apply_schema(conn)
+    copied = load_seeded(db_path, conn)
+    conn.commit()
+    conn.autocommit = True
+    return {**copied, 'load_seconds': round(time.perf_counter() - started, 1)}
+
+
+def pg_search(cur, query, after=(None, None)):
+    cur.execute('SELECT id::text, rank FROM public.search_profiles(%s, %s, %s, %s)', (query, PAGE, *after))
+    return [tuple(row) for row in cur.fetchall()]
+
+
+def standin_search(store, query, after=(None, None)):
+    rows = rpc_search_profiles(store, {'p_query': query, 'p_limit': PAGE, 'p_after_rank': after[0], 'p_after_id': after[1]})
+    return [(row['id'], row['rank']) for row in rows]
+
+
+def count_matches(cur, query) -> int:
+    # Rows search_profiles() ranks to pick any one page: what a broad query costs
+    cur.execute('SELECT COUNT(*) FROM public.search_profiles(%s, NULL)', (query,))
+    return cur.fetchone()[0]
+
+
+def time_kind(search, queries) -> dict:
+    first, second, out_of_order = [], [], 0
+    for query in queries:
+        started = time.perf_counter()
+        page = search(query)
+        first.append(time.perf_counter() - started)
+        if len(page) < PAGE:
+            continue
+        started = time.perf_counter()
+        next_page = search(query, page[-1][::-1])
+        second.append(time.perf_counter() - started)
+        if next_page and (next_page[0][1], next_page[0][0]) >= (page[-1][1], page[-1][0]):
+            out_of_order += 1
+    first, second = sorted(first), sorted(second)
+    return {
+        'first_p50_ms': round(percentile(first, 50) * 1000, 1),
+        'first_p95_ms': round(percentile(first, 95) * 1000, 1),
+        'first_max_ms': round(first[-1] * 1000, 1),
+        'next_p50_ms': round(percentile(second, 50) * 1000, 1) if second else None,
+        'next_p95_ms': round(percentile(second, 95) * 1000, 1) if second else None,
+        'out_of_order': out_of_order,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--profiles', type=int, default=100000)
+    parser.add_argument('--experiences-per-profile', type=int, default=5)
+    parser.add_argument('--db', help='SQLite file; defaults to /tmp/bro_search_<profiles>.sqlite')
+    parser.add_argument('--dsn', help='Postgres database to load into (or reuse); defaults to pgserver in --pgdata')
+    parser.add_argument('--pgdata', default='/tmp/bro_search_pgdata')
+    parser.add_argument('--queries', type=int, default=50, help='Queries per kind')
+    parser.add_argument('--kinds', default=','.join(QUERIES))
+    parser.add_argument('--no-standin', action='store_true', help='Skip the SQLite comparison')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    db_path = args.db or f'/tmp/bro_search_{args.profiles}.sqlite'
+    seeded = {'db': db_path}
+    if not os.path.exists(db_path):
+        seeded.update(seed(db_path, profiles=args.profiles, users=200, ratings=args.profiles,
+                           experiences_per_profile=args.experiences_per_profile, votes_per_experience=0,
+                           redeem_rooms=0, bcrypt_rounds=4))
+    conn = connect(args)
+    seeded['postgres'] = load(conn, db_path)
+    cur = conn.cursor()
+    store = None if args.no_standin else Store(db_path)
+
+    results = {}
+    for kind in args.kinds.split(','):
+        rng = random.Random(kind)
+        queries = [QUERIES[kind](rng) for _ in range(args.queries)]
+        pg_search(cur, queries[0])  # Warm the cache and the plan
+        results[kind] = {
+            'example': queries[0],
+            'matches': count_matches(cur, queries[0]),
+            'postgres': time_kind(lambda q, after=(None, None): pg_search(cur, q, after), queries),
+        }
+        if store:
+            results[kind]['standin'] = time_kind(lambda q, after=(None, None): standin_search(store, q, after), queries)
+
+    print(f'\n{seeded}')
+    for kind, result in results.items():
+        print(f"{kind:<9}{result['example']!r:<24} matches {result['matches']:>7}")
+        for side in ('postgres', 'standin'):
+            if side in result:
+                print(f'    {side:<10}{result[side]}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'dataset': seeded, 'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""Seed a SQLite database for bench.postgrest_standin at a configurable scale.
+
+Every seeded user's password is SEED_PASSWORD; ADMIN_USERNAME is an admin. Aggregates
+(profile_rating_stats, experience vote tallies) and the full-text indexes
+are computed once after the bulk load, and the maintenance triggers are installed afterwards, the
+same way rebuild_profile_rating_stats() backfills a real database.
+
+Usage (from backend/):
+    python -m bench.seed --db /tmp/bro_bench.sqlite --profiles 10000 --ratings 1000000
+"""
+import argparse
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from passlib.context import CryptContext
+
+from bench.postgrest_standin import SCHEMA, TRIGGERS, connect
+
+SEED_PASSWORD = 'benchpass'
+ADMIN_USERNAME = 'bench_user_0'
+WORDS = ('calm kind funny honest late loud quiet patient generous moody direct thoughtful '
+         'adventurous reliable chaotic sweet blunt warm distant caring curious').split()
+# Rarer terms, so search benchmarks see selective queries as well as near-full scans
+NAMES = ('Amara Bianca Chloe Dana Elena Farah Grace Hana Imani Jade Keira Lena Maya Nadia Olive '
+         'Priya Quinn Rosa Sofia Tara Uma Vera Wren Ximena Yara Zoe').split()
+TAGS = ('dating ghosting long-distance situationship coworker ex-partner roommate online '
+        'first-date breakup').split()
+
+
+def _timestamps(n, rng, span_days=365):
+    # Distinct, roughly uniform timestamps over the last span_days, ISO like PostgREST returns
+    now = datetime.now(timezone.utc)
+    return [(now - timedelta(seconds=rng.random() * span_days * 86400)).isoformat() for _ in range(n)]
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def seed(path, profiles=10000, users=1000, ratings=1000000, experiences_per_profile=5,
+         votes_per_experience=3, redeem_rooms=500, bcrypt_rounds=12, seed_value=42):
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed_value)
+    conn = connect(path)
+    conn.executescript(SCHEMA)
+    started = time.perf_counter()
+
+    password_hash = CryptContext(schemes=['bcrypt'], bcrypt__rounds=bcrypt_rounds).hash(SEED_PASSWORD)
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    conn.execute('BEGIN')
+    conn.executemany(
+        'INSERT INTO users (id, username, email, password_hash, created_at) VALUES (?, ?, ?, ?, ?)',
+        [(uid, f'bench_user_{i}', f'bench_user_{i}@example.com', password_hash, ts)
+         for i, (uid, ts) in enumerate(zip(user_ids, _timestamps(users, rng)))]
+    )
+    conn.execute('UPDATE users SET is_admin = 1 WHERE username = ?', (ADMIN_USERNAME,))
+
+    profile_ids = [str(uuid.uuid4()) for _ in range(profiles)]
+    conn.executemany(
+        'INSERT INTO female_profiles (id, display_name, bio, photos, moderation_status, created_by_user_id, created_at, updated_at) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        [(pid, f'{rng.choice(NAMES)} {i}', _text(rng, 40),
+          f'["https://example.com/photos/{pid}/1.jpg", "https://example.com/photos/{pid}/2.jpg"]',
+          'approved' if rng.random() < 0.9 else 'pending', rng.choice(user_ids), ts, ts)
+         for i, (pid, ts) in enumerate(zip(profile_ids, _timestamps(profiles, rng)))]
+    )
+
+    per_profile = min(users, max(1, ratings // max(profiles, 1)))
+    for chunk_start in range(0, profiles, 1000):
+        rows = []
+        for pid in profile_ids[chunk_start:chunk_start + 1000]:
+            for uid in rng.sample(user_ids, per_profile):
+                rows.append((str(uuid.uuid4()), pid, uid, *(rng.randint(0, 5) for _ in range(5))))
+        conn.executemany(
+            'INSERT INTO ratings (id, profile_id, user_id, honesty, communication, accountability, consistency, drama_level) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows
+        )
+
+    experience_ids = []
+    rows = []
+    for pid in profile_ids:
+        for ts in _timestamps(experiences_per_profile, rng):
+            eid = str(uuid.uuid4())
+            experience_ids.append(eid)
+            tags = json.dumps(rng.sample(TAGS, rng.randint(1, 2)))
+            rows.append((eid, pid, rng.choice(user_ids), _text(rng, 60), tags,
+                         'approved' if rng.random() < 0.8 else 'pending', ts))
+    conn.executemany(
+        'INSERT INTO experiences (id, profile_id, user_id, experience_text, tags, moderation_status, created_at) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+    )
+
+    votes = min(users, votes_per_experience)
+    conn.executemany(
+        'INSERT INTO experience_votes (id, experience_id, user_id, vote) VALUES (?, ?, ?, ?)',
+        [(str(uuid.uuid4()), eid, uid, rng.choice((1, -1)))
+         for eid in experience_ids for uid in rng.sample(user_ids, votes)]
+    )
+
+    expires = (datetime.now(timezone.utc) + timedelta(days=7)).isoformat()
+    conn.executemany(
+        'INSERT INTO redeem_sessions (id, profile_id, room_name, session_token, expires_at, created_by_user_id, is_active) '
+        'VALUES (?, ?, ?, ?, ?, ?, 1)',
+        [(str(uuid.uuid4()), rng.choice(profile_ids), f'bench-room-{i}', str(uuid.uuid4()), expires, rng.choice(user_ids))
+         for i in range(redeem_rooms)]
+    )
+
+    # Backfill aggregates, then install the triggers that keep them current
+    conn.execute(
+        'INSERT INTO profile_rating_stats (profile_id, rating_count, honesty_sum, communication_sum, '
+        'accountability_sum, consistency_sum, drama_level_sum) '
+        'SELECT profile_id, COUNT(*), SUM(honesty), SUM(communication), SUM(accountability), '
+        'SUM(consistency), SUM(drama_level) FROM ratings GROUP BY profile_id'
+    )
+    conn.execute(
+        'UPDATE experiences SET '
+        'upvotes = (SELECT COUNT(*) FROM experience_votes v WHERE v.experience_id = experiences.id AND v.vote = 1), '
+        'downvotes = (SELECT COUNT(*) FROM experience_votes v WHERE v.experience_id = experiences.id AND v.vote = -1)'
+    )
+    for fts in ('female_profiles_fts', 'experiences_fts'):
+        # Name/tags column weighs more, like setweight(..., 'A') in schema.sql
+        conn.execute(f"INSERT INTO {fts} ({fts}, rank) VALUES ('rank', 'bm25(10.0, 4.0)')")
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+    conn.execute('COMMIT')
+    conn.executescript(TRIGGERS)
+    conn.execute('ANALYZE')
+    conn.close()
+
+    return {
+        'users': users, 'profiles': profiles, 'ratings': profiles * per_profile,
+        'experiences': len(experience_ids), 'votes': len(experience_ids) * votes,
+        'redeem_rooms': redeem_rooms, 'seconds': round(time.perf_counter() - started, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True)
+    parser.add_argument('--profiles', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--ratings', type=int, default=1000000)
+    parser.add_argument('--experiences-per-profile', type=int, default=5)
+    parser.add_argument('--votes-per-experience', type=int, default=3)
+    parser.add_argument('--redeem-rooms', type=int, default=500)
+    parser.add_argument('--bcrypt-rounds', type=int, default=12)
+    args = parser.parse_args()
+
+    print(seed(args.db, args.profiles, args.users, args.ratings, args.experiences_per_profile,
+               args.votes_per_experience, args.redeem_rooms, args.bcrypt_rounds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""Cold-start cost of the app: import-time profile and time to first response.
+
+Models a Fly machine woken by a request: Fly's proxy holds the request until
+the port accepts, so what the user waits for is the time from process start
+until the app is listening plus however long that first request takes.
+
+  imports   runs `python -X importtime -c "import app"` --runs times and
+            reports the median import time and the slowest modules app.py
+            imports (cumulative, including everything they pull in)
+  boot      starts the PostgREST stand-in, then --runs times starts
+            gunicorn exactly as the Dockerfile does and measures, from
+            spawn: the port accepting, the first authenticated
+            /api/profiles response, /ready answering 200, and a login
+            right after (bcrypt's first use)
+
+Every boot run is repeated for each WARM_UP setting in --warm-up.
+
+Usage (from backend/):
+    python -m bench.startup --runs 5
+    python -m bench.startup --runs 5 --warm-up 0,1 --json /tmp/startup.json
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+
+from bench.run import BACKEND_DIR, HttpClient, free_port
+from bench.seed import SEED_PASSWORD, seed
+
+
+def app_env(standin_port) -> dict:
+    env = dict(os.environ)
+    env.update({
+        'SUPABASE_URL': f'http://127.0.0.1:{standin_port}',
+        'SUPABASE_KEY': 'bench',
+        'JWT_SECRET': 'bench-secret',
+        'BCRYPT_ROUNDS': '4',
+        'WRITE_QUEUE_JOURNAL': f'/tmp/bro_startup_{standin_port}.journal',
+        # As the Dockerfile sets them
+        'WEB_CONCURRENCY': '1',
+        'SETUPTOOLS_USE_DISTUTILS': 'stdlib',
+        'EVENTLET_NO_GREENDNS': 'yes',
+    })
+    return env
+
+
+def median(values):
+    return round(statistics.median(values), 1) if values else None
+
+
+# --- imports ---
+
+def profile_imports(env, runs, top) -> dict:
+    totals, last = [], None
+    for _ in range(runs):
+        proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                              cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+        if proc.returncode:
+            raise RuntimeError(f'import app failed:\n{proc.stderr[-2000:]}')
+        rows = []
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            rows.append((depth, name.strip(), int(cumulative) / 1000))
+        # A module's imports are listed (one level deeper) right before it
+        total = sum(ms for depth, _, ms in rows if depth == 0)
+        totals.append(total)
+        last = rows
+
+    app_index = max(i for i, row in enumerate(last) if row[1] == 'app')
+    first_child = app_index
+    while first_child > 0 and last[first_child - 1][0] > 0:
+        first_child -= 1
+    direct = [(name, ms) for depth, name, ms in last[first_child:app_index] if depth == 1]
+    top_level = [(name, ms) for depth, name, ms in last if depth == 0 and name != 'app']
+    slowest = sorted(direct + top_level, key=lambda r: -r[1])[:top]
+    return {
+        'import_ms': median(totals),
+        'slowest_imports_ms': {name: round(ms, 1) for name, ms in slowest},
+    }
+
+
+# --- boot ---
+
+def wait_listening(port, deadline) -> bool:
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.005)
+    return False
+
+
+def get(port, path, token=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.request('GET', path, headers={'Authorization': f'Bearer {token}'} if token else {})
+    resp = conn.getresponse()
+    resp.read()
+    conn.close()
+    return resp.status
+
+
+def spawn_app(env, port):
+    # The Dockerfile's CMD; the worker count comes from WEB_CONCURRENCY
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--worker-class', 'eventlet', '--bind', f'127.0.0.1:{port}',
+         '--log-level', 'warning', 'app:app'],
+        cwd=BACKEND_DIR, env=env
+    )
+
+
+def boot_once(env, token, username, ready_path, timeout=60) -> dict:
+    port = free_port()
+    started = time.monotonic()
+    proc = spawn_app(env, port)
+    elapsed = lambda: (time.monotonic() - started) * 1000  # noqa: E731
+    try:
+        if not wait_listening(port, started + timeout):
+            raise RuntimeError(f'gunicorn did not listen within {timeout}s')
+        result = {'listening_ms': elapsed()}
+
+        status = get(port, '/api/profiles?limit=20', token)
+        if status != 200:
+            raise RuntimeError(f'/api/profiles answered {status}')
+        result['first_response_ms'] = elapsed()
+
+        while get(port, ready_path) != 200:
+            if time.monotonic() > started + timeout:
+                raise RuntimeError(f'{ready_path} not 200 within {timeout}s')
+            time.sleep(0.01)
+        result['ready_ms'] = elapsed()
+
+        login_started = time.monotonic()
+        status, _ = HttpClient(port).request('POST', '/auth/login', {'username': username, 'password': SEED_PASSWORD})
+        if status != 200:
+            raise RuntimeError(f'/auth/login answered {status}')
+        result['first_login_ms'] = (time.monotonic() - login_started) * 1000
+        return result
+    finally:
+        proc.terminate()
+        proc.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument('--db', default='/tmp/bro_startup.sqlite', help='SQLite file (seeded small if missing)')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=12, help='Slowest imports to list')
+    parser.add_argument('--warm-up', default='1', help='Comma list of WARM_UP values to boot with')
+    parser.add_argument('--ready-path', default='/ready')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        seed(args.db, profiles=1000, users=50, ratings=10000, bcrypt_rounds=4)
+
+    standin_port = free_port()
+    standin = subprocess.Popen(
+        [sys.executable, '-m', 'bench.postgrest_standin', '--db', args.db, '--port', str(standin_port)],
+        cwd=BACKEND_DIR
+    )
+    try:
+        env = app_env(standin_port)
+        results = {'imports': profile_imports(env, args.runs, args.top), 'boot': {}}
+
+        # A token from a throwaway boot, so timed runs start from a request that needs no bcrypt
+        with sqlite3.connect(args.db) as conn:
+            username = conn.execute("SELECT username FROM users WHERE username LIKE 'bench_user_%' LIMIT 1").fetchone()[0]
+        port = free_port()
+        proc = spawn_app(env, port)
+        try:
+            wait_listening(port, time.monotonic() + 60)
+            status, data = HttpClient(port).request('POST', '/auth/login', {'username': username, 'password': SEED_PASSWORD})
+            if status != 200:
+                raise RuntimeError(f'Login failed: {status} {data}')
+            token = data['token']
+        finally:
+            proc.terminate()
+            proc.wait(timeout=60)
+
+        for warm_up in args.warm_up.split(','):
+            runs = [boot_once({**env, 'WARM_UP': warm_up}, token, username, args.ready_path) for _ in range(args.runs)]
+            results['boot'][f'WARM_UP={warm_up}'] = {key: median([r[key] for r in runs]) for key in runs[0]}
+    finally:
+        standin.terminate()
+        standin.wait(timeout=30)
+
+    print(f"\nimport app: {results['imports']['import_ms']} ms (median of {args.runs})")
+    for name, ms in results['imports']['slowest_imports_ms'].items():
+        print(f"  {name:<32}{ms:>8} ms")
+    print(f"\n{'boot (median ms)':<18}{'listening':>12}{'1st response':>14}{'ready':>10}{'1st login':>12}")
+    for mode, r in results['boot'].items():
+        print(f"{mode:<18}{r['listening_ms']:>12}{r['first_response_ms']:>14}{r['ready_ms']:>10}{r['first_login_ms']:>12}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import eventlet
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries expire `ttl` seconds after being set.
+
+    Guarded by a threading.Lock, which eventlet.monkey_patch() turns into a
+    green lock, so one instance can be shared by every request greenlet.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] <= now:
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class ResponseCache:
+    """Serialized response bodies with strong ETags, invalidated by version scopes.
+
+    Entries are stored under the request key plus the current version of each
+    scope they depend on, so bump('profiles') makes every dependent entry
+    unreachable at once; stale entries then age out of the underlying TTLCache.
+
+    Versions live in this process. With several workers, attach the caches to
+    a CacheInvalidations so every bump reaches the others too; otherwise the
+    other workers serve their copies until `ttl` runs out.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 300.0):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.publish = None  # set by CacheInvalidations.attach()
+        self._versions = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def key(self, key, scopes) -> tuple:
+        # Take the key *before* reading from the DB: if a write bumps a scope
+        # mid-read, the possibly stale body lands under the old version.
+        with self._lock:
+            return (key, self._generation, tuple(self._versions.get(scope, 0) for scope in scopes))
+
+    def get(self, versioned_key):
+        return self.entries.get(versioned_key)
+
+    def set(self, versioned_key, body: bytes):
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        entry = (body, etag)
+        self.entries.set(versioned_key, entry)
+        return entry
+
+    def bump(self, *scopes):
+        self.bump_local(scopes)
+        if self.publish:
+            self.publish(scopes)
+
+    def bump_local(self, scopes):
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    def clear(self):
+        # A new generation, so bodies read before the clear can't be stored after it
+        with self._lock:
+            self._generation += 1
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        return self.entries.stats()
+
+
+class CacheInvalidations:
+    """Relays ResponseCache.bump() to every worker through Redis pub/sub.
+
+    attach(name, cache) makes the cache's bumps publish {origin, cache,
+    scopes} on `channel`; start() spawns a listener that applies the other
+    workers' bumps here. Pub/sub keeps nothing for a disconnected listener,
+    so every (re)subscription clears the attached caches: after a Redis
+    outage a worker starts cold rather than serving bodies it may have
+    missed invalidations for. A failed publish is logged; the other
+    workers then catch up when their entries' TTL runs out.
+    """
+
+    def __init__(self, redis_client, channel: str, retry_interval: float = 1.0):
+        self.redis = redis_client
+        self.channel = channel
+        self.retry_interval = retry_interval
+        self.origin = uuid.uuid4().hex
+        self.published = 0
+        self.received = 0
+        self.publish_failures = 0
+        self._caches = {}
+        self._started = False
+        self._lock = threading.Lock()
+
+    def attach(self, name: str, cache: ResponseCache):
+        self._caches[name] = cache
+        cache.publish = lambda scopes: self.publish(name, scopes)
+
+    def publish(self, name: str, scopes):
+        message = json.dumps({'origin': self.origin, 'cache': name, 'scopes': list(scopes)})
+        try:
+            self.redis.publish(self.channel, message)
+            self.published += 1
+        except Exception as e:
+            self.publish_failures += 1
+            logger.warning("Could not publish cache invalidation %s %s: %s", name, list(scopes), e)
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        eventlet.spawn(self._run)
+
+    def _run(self):
+        while True:
+            try:
+                self.listen()
+            except Exception as e:
+                logger.warning("Cache invalidation listener lost Redis: %s", e)
+            eventlet.sleep(self.retry_interval)
+
+    def listen(self):
+        pubsub = self.redis.pubsub()
+        try:
+            pubsub.subscribe(self.channel)
+            while True:
+                # Polled rather than listen(): a quiet channel must not trip the socket timeout
+                message = pubsub.get_message(timeout=1.0)
+                if message is None:
+                    continue
+                if message['type'] == 'subscribe':
+                    for cache in self._caches.values():
+                        cache.clear()
+                elif message['type'] == 'message':
+                    self.apply(message['data'])
+        finally:
+            pubsub.close()
+
+    def apply(self, data):
+        message = json.loads(data)
+        cache = self._caches.get(message.get('cache'))
+        if cache is not None and message.get('origin') != self.origin:
+            cache.bump_local(message['scopes'])
+            self.received += 1
+
+    def stats(self) -> dict:
+        return {
+            "channel": self.channel,
+            "caches": list(self._caches),
+            "published": self.published,
+            "received": self.received,
+            "publish_failures": self.publish_failures,
+        }
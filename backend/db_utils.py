@@ -1,7 +1,19 @@
 import os
-from supabase import create_client, Client
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+
+import httpx
 from dotenv import load_dotenv
 
+from metrics_utils import db_error_status, observe_db_call, supabase_event_hooks
+from pagination_utils import keyset_filter
+
 load_dotenv()
 
 url = os.environ.get("SUPABASE_URL")
@@ -10,4 +22,599 @@ key = os.environ.get("SUPABASE_KEY")
 if not url or not key:
     raise EnvironmentError("SUPABASE_URL and SUPABASE_KEY must be set in .env")
 
-supabase: Client = create_client(url, key)
\ No newline at end of file
+# Keep-alive connections shared by every greenlet (httpx's pool locks and
+# sockets are green once eventlet.monkey_patch() has run)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+# Direct Postgres connections opened by warm_up() (or the first query) and kept
+# open while idle; the rest of DB_POOL_SIZE are opened on demand and closed after
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", 1))
+# Default per-call budget in seconds; narrow it for one block with call_timeout()
+DB_TIMEOUT = float(os.environ.get("DB_TIMEOUT", 10))
+DB_CONNECT_TIMEOUT = float(os.environ.get("DB_CONNECT_TIMEOUT", 3))
+# Extra attempts for idempotent (GET/HEAD) PostgREST calls
+DB_READ_RETRIES = int(os.environ.get("DB_READ_RETRIES", 2))
+DB_BREAKER_THRESHOLD = int(os.environ.get("DB_BREAKER_THRESHOLD", 5))
+DB_BREAKER_RESET = float(os.environ.get("DB_BREAKER_RESET", 10))
+# postgresql://... enables the direct Postgres backend for hot queries
+DATABASE_URL = os.environ.get("DATABASE_URL")
+
+
+class DatabaseUnavailable(Exception):
+    """The circuit is open or no connection freed up in time; callers should answer 503."""
+
+
+class UniqueViolation(Exception):
+    """An insert/upsert hit a unique constraint; `constraint` names it (e.g. users_email_key)."""
+
+    def __init__(self, constraint: str):
+        super().__init__(f'duplicate key value violates unique constraint "{constraint}"')
+        self.constraint = constraint
+
+
+# === PER-CALL TIMEOUTS ===
+
+_local = threading.local()  # green-local under eventlet
+
+
+@contextmanager
+def call_timeout(seconds: float):
+    """Cap every DB call made by this greenlet inside the block at `seconds`."""
+    previous = getattr(_local, 'timeout', None)
+    _local.timeout = seconds
+    try:
+        yield
+    finally:
+        _local.timeout = previous
+
+
+def current_timeout() -> float:
+    return getattr(_local, 'timeout', None) or DB_TIMEOUT
+
+
+# === CIRCUIT BREAKER ===
+
+class CircuitBreaker:
+    """Fails fast after `threshold` consecutive failures.
+
+    While open every call raises DatabaseUnavailable. After `reset_timeout`
+    seconds a single probe call is let through (half-open); its outcome
+    closes the circuit or opens it for another `reset_timeout`.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 10.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if self._probing or time.monotonic() - self.opened_at < self.reset_timeout:
+                raise DatabaseUnavailable("Database circuit is open")
+            self._probing = True
+
+    def record(self, ok: bool):
+        with self._lock:
+            self._probing = False
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            if self.opened_at is None:
+                state = 'closed'
+            elif self._probing or time.monotonic() - self.opened_at >= self.reset_timeout:
+                state = 'half-open'
+            else:
+                state = 'open'
+            return {"state": state, "consecutive_failures": self.failures}
+
+
+# === POSTGREST TRANSPORT ===
+
+class ResilientTransport(httpx.HTTPTransport):
+    """httpx transport adding per-call timeouts, jittered retries and a circuit breaker.
+
+    Only idempotent methods are retried. Transport errors (timeouts included)
+    and 502/503/504 count against the breaker; PostgREST's own 4xx/500
+    answers do not. A read running past a call_timeout() narrower than
+    DB_TIMEOUT is not retried, since the caller's budget is already spent.
+    """
+
+    IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+    RETRY_STATUSES = {502, 503, 504}
+
+    def __init__(self, breaker: CircuitBreaker, retries: int = 2, backoff: float = 0.05, **kwargs):
+        super().__init__(**kwargs)
+        self.breaker = breaker
+        self.retries = retries
+        self.backoff = backoff
+
+    def handle_request(self, request):
+        timeout = current_timeout()
+        request.extensions['timeout'] = {
+            'connect': min(DB_CONNECT_TIMEOUT, timeout), 'read': timeout, 'write': timeout, 'pool': timeout
+        }
+        attempts = 1 + (self.retries if request.method in self.IDEMPOTENT_METHODS else 0)
+        for attempt in range(attempts):
+            self.breaker.before_call()
+            try:
+                response = super().handle_request(request)
+            except httpx.TransportError as exc:
+                # Timeouts count too: a database that has stopped answering in time
+                # must open the circuit, or every request keeps waiting out its budget
+                self.breaker.record(False)
+                budget_spent = isinstance(exc, httpx.ReadTimeout) and timeout < DB_TIMEOUT
+                if budget_spent or attempt == attempts - 1:
+                    raise DatabaseUnavailable(f"Database request failed: {exc}") from exc
+            except BaseException:
+                self.breaker.record(False)
+                raise
+            else:
+                failed = response.status_code in self.RETRY_STATUSES
+                self.breaker.record(not failed)
+                if not failed or attempt == attempts - 1:
+                    return response
+                response.close()
+            # Full jitter, so retries from many greenlets don't arrive in lockstep
+            time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
+
+breaker = CircuitBreaker(threshold=DB_BREAKER_THRESHOLD, reset_timeout=DB_BREAKER_RESET)
+
+http_client = httpx.Client(
+    transport=ResilientTransport(
+        breaker,
+        retries=DB_READ_RETRIES,
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=DB_POOL_SIZE,
+            max_keepalive_connections=DB_POOL_SIZE,
+            keepalive_expiry=30
+        )
+    ),
+    timeout=DB_TIMEOUT,
+    follow_redirects=True,
+    event_hooks=supabase_event_hooks()
+)
+
+# postgrest.types.ReturnMethod.minimal is a StrEnum; the plain string keeps postgrest
+# (and pydantic) out of the import path until the first query
+RETURN_MINIMAL = 'minimal'
+
+
+def create_supabase_client():
+    # supabase-py (with postgrest, auth, storage and realtime) is the slowest import
+    # of the app; deferred so a cold worker starts serving without it
+    from supabase import create_client, ClientOptions
+    return create_client(url, key, options=ClientOptions(httpx_client=http_client))
+
+
+# === DATA ACCESS ===
+
+def _first(rows):
+    return rows[0] if rows else None
+
+
+class PostgrestBackend:
+    """Every query the app makes, through supabase-py and the pooled client above.
+
+    Methods return plain dicts/lists (never APIResponse) and raise
+    UniqueViolation / DatabaseUnavailable, so handlers don't depend on the
+    backend behind them. The supabase client is built by `connect()` on
+    first use; warm_up() does that ahead of the first request.
+    """
+
+    name = 'postgrest'
+
+    def __init__(self, connect):
+        self._connect = connect
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._connect()
+        return self._client
+
+    def warm_up(self):
+        """Build the client and open its keep-alive connection with one cheap query."""
+        self._execute(self.client.table('users').select('id').limit(1))
+
+    def _execute(self, query) -> list:
+        from postgrest.exceptions import APIError  # loaded with the client by now
+
+        try:
+            return query.execute().data
+        except APIError as e:
+            if e.code == '23505':
+                match = re.search(r'constraint "([^"]+)"', e.message or '')
+                raise UniqueViolation(match.group(1) if match else 'unknown') from e
+            raise
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "pool_size": DB_POOL_SIZE, "postgrest_breaker": breaker.stats()}
+
+    # --- users ---
+
+    def create_user(self, row: dict) -> dict:
+        return _first(self._execute(self.client.table('users').insert(row)))
+
+    def get_user(self, user_id: str):
+        return _first(self._execute(self.client.table('users').select('id, is_admin, token_version').eq('id', user_id)))
+
+    def get_user_by_username(self, username: str):
+        return _first(self._execute(self.client.table('users').select('*').eq('username', username)))
+
+    def revoke_user_tokens(self, user_id: str) -> int:
+        """Bump the user's token_version; returns the new one. See schema.sql section 11."""
+        return self._execute(self.client.rpc('revoke_user_tokens', {'p_user_id': user_id}))[0]['token_version']
+
+    def list_token_revocations(self, since: str) -> list:
+        """token_revocations rows revoked after `since` (ISO timestamp)."""
+        return self._execute(
+            self.client.table('token_revocations').select('user_id, min_token_version, revoked_at').gt('revoked_at', since)
+        )
+
+    # --- profiles ---
+
+    def list_approved_profiles(self, columns: list, limit: int, cursor=None) -> list:
+        """Newest approved profiles after the (created_at, id) keyset cursor."""
+        query = self.client.table('female_profiles').select(', '.join(columns)).eq('moderation_status', 'approved')
+        if cursor:
+            query = query.or_(keyset_filter('created_at', *cursor))
+        return self._execute(query.order('created_at', desc=True).order('id', desc=True).limit(limit))
+
+    def get_profile_bundle(self, profile_id: str):
+        row = _first(self._execute(self.client.rpc('get_profile_bundle', {'p_profile_id': profile_id})))
+        return row['bundle'] if row else None
+
+    def search_profiles(self, query: str, limit: int, cursor=None) -> list:
+        """Ranked full-text matches after the (rank, id) keyset cursor; see search_profiles() in schema.sql."""
+        after_rank, after_id = cursor or (None, None)
+        return self._execute(self.client.rpc('search_profiles', {
+            'p_query': query, 'p_limit': limit, 'p_after_rank': after_rank, 'p_after_id': after_id
+        }))
+
+    def create_profile(self, row: dict) -> dict:
+        return _first(self._execute(self.client.table('female_profiles').insert(row)))
+
+    def get_profile_by_invite_token(self, token: str, columns: str = '*'):
+        return _first(self._execute(self.client.table('female_profiles').select(columns).eq('invite_token', token)))
+
+    def update_profile(self, profile_id: str, fields: dict):
+        return _first(self._execute(self.client.table('female_profiles').update(fields).eq('id', profile_id)))
+
+    # --- photo pipeline ---
+
+    def finish_profile_photos(self, profile_id: str, photos: list):
+        """Store processed photos and hand the profile to moderation, if it is still 'processing'."""
+        return _first(self._execute(
+            self.client.table('female_profiles')
+            .update({'photos': photos, 'moderation_status': 'pending', 'updated_at': datetime.now(timezone.utc).isoformat()})
+            .eq('id', profile_id).eq('moderation_status', 'processing')
+        ))
+
+    def list_stalled_photo_jobs(self, updated_before: str, limit: int) -> list:
+        """[{id, photos}] of profiles left in 'processing' since before `updated_before`."""
+        return self._execute(
+            self.client.table('female_profiles').select('id, photos')
+            .eq('moderation_status', 'processing').lt('updated_at', updated_before)
+            .order('updated_at').limit(limit)
+        )
+
+    # --- experiences, ratings, votes ---
+
+    def create_experience(self, row: dict) -> dict:
+        return _first(self._execute(self.client.table('experiences').insert(row)))
+
+    def get_experience_profile_ids(self, experience_ids: list) -> dict:
+        """experience_id -> profile_id for the given experiences that exist."""
+        rows = self._execute(self.client.table('experiences').select('id, profile_id').in_('id', list(experience_ids)))
+        return {row['id']: row['profile_id'] for row in rows}
+
+    def get_approved_profile_ids(self, profile_ids: list) -> set:
+        """The given profiles that exist and are approved."""
+        rows = self._execute(
+            self.client.table('female_profiles').select('id')
+            .in_('id', list(profile_ids)).eq('moderation_status', 'approved')
+        )
+        return {row['id'] for row in rows}
+
+    # Bulk writes for the write-behind queue; rows in one call have distinct keys
+
+    def upsert_ratings(self, rows: list):
+        self._execute(self.client.table('ratings').upsert(rows, on_conflict='profile_id, user_id', returning=RETURN_MINIMAL))
+
+    def upsert_votes(self, rows: list):
+        self._execute(self.client.table('experience_votes').upsert(rows, on_conflict='experience_id, user_id', returning=RETURN_MINIMAL))
+
+    def insert_audit_entries(self, rows: list):
+        # entry_id makes a replayed entry a no-op (see WriteBehindQueue's journal)
+        self._execute(self.client.table('audit_log').upsert(rows, on_conflict='entry_id', ignore_duplicates=True,
+                                                            returning=RETURN_MINIMAL))
+
+    # --- moderation ---
+
+    def list_pending_experiences(self, columns: str, limit: int, cursor=None) -> list:
+        """Oldest pending experiences after the (created_at, id) keyset cursor."""
+        query = self.client.table('experiences').select(columns).eq('moderation_status', 'pending')
+        if cursor:
+            query = query.or_(keyset_filter('created_at', *cursor, descending=False))
+        return self._execute(query.order('created_at').order('id').limit(limit))
+
+    def list_pending_profiles(self, columns: str, limit: int, cursor=None) -> list:
+        """Oldest pending profiles whose invite has been completed, after the keyset cursor."""
+        query = (self.client.table('female_profiles').select(columns)
+                 .eq('moderation_status', 'pending').is_('invite_token', 'null'))
+        if cursor:
+            query = query.or_(keyset_filter('created_at', *cursor, descending=False))
+        return self._execute(query.order('created_at').order('id').limit(limit))
+
+    def moderate_experiences(self, ids: list, status: str, moderator_id: str) -> list:
+        """[{id, profile_id}] of the experiences whose status changed; see schema.sql section 9."""
+        return self._execute(self.client.rpc('moderate_experiences', {
+            'p_ids': ids, 'p_status': status, 'p_moderator_id': moderator_id
+        }))
+
+    def moderate_profiles(self, ids: list, status: str, moderator_id: str) -> list:
+        return self._execute(self.client.rpc('moderate_female_profiles', {
+            'p_ids': ids, 'p_status': status, 'p_moderator_id': moderator_id
+        }))
+
+    # --- redeem sessions ---
+
+    def create_redeem_session(self, row: dict) -> dict:
+        return _first(self._execute(self.client.table('redeem_sessions').insert(row)))
+
+    def get_redeem_session(self, session_token: str):
+        return _first(self._execute(self.client.table('redeem_sessions').select('*').eq('session_token', session_token)))
+
+    def get_active_room_expiry(self, room_name: str):
+        """expires_at (ISO string) of the room's active session, or None."""
+        row = _first(self._execute(
+            self.client.table('redeem_sessions').select('expires_at').eq('room_name', room_name).eq('is_active', True)
+        ))
+        return row['expires_at'] if row else None
+
+    # --- expiry reaper (schema.sql section 10); each call handles at most `limit` rows ---
+
+    def deactivate_expired_sessions(self, limit: int) -> list:
+        """room_name of every session deactivated."""
+        rows = self._execute(self.client.rpc('deactivate_expired_sessions', {'p_limit': limit}))
+        return [row['room_name'] for row in rows]
+
+    def purge_redeem_sessions(self, expired_before: str, limit: int) -> int:
+        return self._execute(self.client.rpc('purge_redeem_sessions', {
+            'p_expired_before': expired_before, 'p_limit': limit
+        }))[0]['purged']
+
+    def expire_profile_invites(self, limit: int) -> list:
+        """id of every profile whose invite token was burned."""
+        return [row['id'] for row in self._execute(self.client.rpc('expire_profile_invites', {'p_limit': limit}))]
+
+    # --- export ---
+
+    def export_profiles(self, limit: int, cursor=None) -> list:
+        """One export page, oldest first after the (created_at, id) keyset cursor; see export_profiles() in schema.sql."""
+        after_created_at, after_id = cursor or (None, None)
+        return self._execute(self.client.rpc('export_profiles', {
+            'p_limit': limit, 'p_after_created_at': after_created_at, 'p_after_id': after_id
+        }))
+
+    # --- maintenance RPCs ---
+
+    def profile_rating_stats_drift(self) -> list:
+        return self._execute(self.client.rpc('profile_rating_stats_drift', {}))
+
+    def rebuild_profile_rating_stats(self, profile_id=None) -> int:
+        return self._execute(self.client.rpc('rebuild_profile_rating_stats', {'p_profile_id': profile_id}))[0]['rebuilt']
+
+    def rebuild_experience_vote_tallies(self) -> int:
+        return self._execute(self.client.rpc('rebuild_experience_vote_tallies', {}))[0]['rebuilt']
+
+
+def _jsonable(row: dict) -> dict:
+    # Shape psycopg2 values the way PostgREST would serialize them
+    out = {}
+    for k, v in row.items():
+        if isinstance(v, (datetime, date)):
+            v = v.isoformat()
+        elif isinstance(v, UUID):
+            v = str(v)
+        elif isinstance(v, Decimal):
+            v = float(v)
+        out[k] = v
+    return out
+
+
+class PostgresBackend(PostgrestBackend):
+    """Hot queries straight to Postgres; everything else still goes through PostgREST.
+
+    Uses psycopg2 with psycogreen so libpq waits yield to the eventlet hub,
+    and a BoundedSemaphore in front of the pool so callers queue for up to
+    their call timeout instead of getting PoolError.
+    """
+
+    name = 'postgres'
+
+    def __init__(self, connect, dsn: str, pool_size: int = 10, pool_min: int = 1):
+        super().__init__(connect)
+        import psycopg2
+        import psycopg2.errors
+        import psycopg2.extras
+        import psycopg2.pool
+        import psycopg2.sql
+        from psycogreen.eventlet import patch_psycopg
+
+        patch_psycopg()
+        self._pg = psycopg2
+        self._dsn = dsn
+        self._pool = None  # opened (pool_min connections) by warm_up() or the first query
+        self._pool_lock = threading.Lock()
+        self.pool_min = min(pool_min, pool_size)
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self.pool_size = pool_size
+        self.breaker = CircuitBreaker(threshold=DB_BREAKER_THRESHOLD, reset_timeout=DB_BREAKER_RESET)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats.update({"backend": self.name, "pg_pool_size": self.pool_size, "pg_pool_min": self.pool_min,
+                      "postgres_breaker": self.breaker.stats()})
+        return stats
+
+    def warm_up(self):
+        super().warm_up()
+        self._query("SELECT 1", label=('<root>', 'select'))
+
+    def _open_pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = self._pg.pool.ThreadedConnectionPool(self.pool_min, self.pool_size, self._dsn)
+        return self._pool
+
+    def _query(self, sql, params=(), values=None, *, label: tuple) -> list:
+        # label is (table or function, operation), as supabase_event_hooks() labels
+        # the PostgREST call it replaces; timed from before the wait for a slot
+        started, error = time.perf_counter(), None
+        try:
+            return self._execute(sql, params, values)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            observe_db_call(label[0], label[1], started, error and db_error_status(error))
+
+    def _execute(self, sql, params, values) -> list:
+        timeout = current_timeout()
+        if not self._slots.acquire(timeout=timeout):
+            raise DatabaseUnavailable("No database connection available")
+        try:
+            self.breaker.before_call()
+            conn, broken, timed_out = None, True, False
+            try:
+                conn = self._open_pool().getconn()
+                with conn, conn.cursor(cursor_factory=self._pg.extras.RealDictCursor) as cur:
+                    cur.execute("SET LOCAL statement_timeout = %s", (int(timeout * 1000),))
+                    if values is None:
+                        cur.execute(sql, params)
+                    else:
+                        # Multi-row VALUES %s, sent in pages of 500
+                        self._pg.extras.execute_values(cur, sql, values, page_size=500)
+                    rows = [_jsonable(r) for r in cur.fetchall()] if cur.description else []
+                broken = False
+                return rows
+            except self._pg.errors.UniqueViolation as e:
+                broken = False
+                raise UniqueViolation(e.diag.constraint_name) from e
+            except self._pg.errors.QueryCanceled as e:
+                # statement_timeout: the connection is fine, but the breaker counts it
+                broken, timed_out = False, True
+                raise DatabaseUnavailable(f"Database query timed out: {e}") from e
+            except (self._pg.OperationalError, self._pg.InterfaceError) as e:
+                raise DatabaseUnavailable(f"Database query failed: {e}") from e
+            except self._pg.Error:
+                # The statement was bad, not the connection
+                broken = False
+                raise
+            finally:
+                self.breaker.record(not (broken or timed_out))
+                if conn is not None:
+                    self._pool.putconn(conn, close=broken or bool(conn.closed))
+        finally:
+            self._slots.release()
+
+    def _upsert_many(self, table: str, rows: list, conflict: tuple, update: bool = True):
+        # update=False keeps the existing row (ON CONFLICT DO NOTHING)
+        sql = self._pg.sql
+        cols = list(dict.fromkeys(c for row in rows for c in row))
+        action = sql.SQL("DO UPDATE SET {updates}").format(updates=sql.SQL(', ').join(
+            sql.SQL("{c} = EXCLUDED.{c}").format(c=sql.Identifier(c)) for c in cols if c not in conflict
+        )) if update else sql.SQL("DO NOTHING")
+        statement = sql.SQL(
+            "INSERT INTO {table} ({cols}) VALUES %s ON CONFLICT ({conflict}) {action}"
+        ).format(
+            table=sql.Identifier(table),
+            cols=sql.SQL(', ').join(map(sql.Identifier, cols)),
+            conflict=sql.SQL(', ').join(map(sql.Identifier, conflict)),
+            action=action
+        )
+        adapt = lambda value: self._pg.extras.Json(value) if isinstance(value, dict) else value
+        self._query(statement, values=[[adapt(row.get(c)) for c in cols] for row in rows],
+                    label=(table, 'upsert' if update else 'insert'))
+
+    def get_user(self, user_id: str):
+        return _first(self._query("SELECT id, is_admin, token_version FROM users WHERE id = %s", (user_id,),
+                                  label=('users', 'select')))
+
+    def get_user_by_username(self, username: str):
+        return _first(self._query("SELECT * FROM users WHERE username = %s", (username,), label=('users', 'select')))
+
+    def list_approved_profiles(self, columns: list, limit: int, cursor=None) -> list:
+        sql = self._pg.sql
+        statement = sql.SQL(
+            "SELECT {cols} FROM female_profiles WHERE moderation_status = 'approved' {after} "
+            "ORDER BY created_at DESC, id DESC LIMIT %s"
+        ).format(
+            cols=sql.SQL(', ').join(map(sql.Identifier, columns)),
+            after=sql.SQL("AND (created_at, id) < (%s, %s)") if cursor else sql.SQL('')
+        )
+        return self._query(statement, [*(cursor or ()), limit], label=('female_profiles', 'select'))
+
+    def get_profile_bundle(self, profile_id: str):
+        row = _first(self._query("SELECT bundle FROM get_profile_bundle(%s)", (profile_id,),
+                                 label=('get_profile_bundle', 'rpc')))
+        return row['bundle'] if row else None
+
+    def search_profiles(self, query: str, limit: int, cursor=None) -> list:
+        after_rank, after_id = cursor or (None, None)
+        return self._query("SELECT * FROM search_profiles(%s, %s, %s, %s)", (query, limit, after_rank, after_id),
+                           label=('search_profiles', 'rpc'))
+
+    def get_experience_profile_ids(self, experience_ids: list) -> dict:
+        rows = self._query("SELECT id, profile_id FROM experiences WHERE id = ANY(%s::uuid[])", (list(experience_ids),),
+                           label=('experiences', 'select'))
+        return {row['id']: row['profile_id'] for row in rows}
+
+    def get_approved_profile_ids(self, profile_ids: list) -> set:
+        rows = self._query("SELECT id FROM female_profiles WHERE id = ANY(%s::uuid[]) AND moderation_status = 'approved'",
+                           (list(profile_ids),), label=('female_profiles', 'select'))
+        return {row['id'] for row in rows}
+
+    def upsert_ratings(self, rows: list):
+        self._upsert_many('ratings', rows, ('profile_id', 'user_id'))
+
+    def upsert_votes(self, rows: list):
+        self._upsert_many('experience_votes', rows, ('experience_id', 'user_id'))
+
+    def insert_audit_entries(self, rows: list):
+        self._upsert_many('audit_log', rows, ('entry_id',), update=False)
+
+    def export_profiles(self, limit: int, cursor=None) -> list:
+        after_created_at, after_id = cursor or (None, None)
+        return self._query("SELECT * FROM export_profiles(%s, %s, %s)", (limit, after_created_at, after_id),
+                           label=('export_profiles', 'rpc'))
+
+    def get_active_room_expiry(self, room_name: str):
+        row = _first(self._query(
+            "SELECT expires_at FROM redeem_sessions WHERE room_name = %s AND is_active", (room_name,),
+            label=('redeem_sessions', 'select')
+        ))
+        return row['expires_at'] if row else None
+
+
+db = (PostgresBackend(create_supabase_client, DATABASE_URL, DB_POOL_SIZE, DB_POOL_MIN) if DATABASE_URL
+      else PostgrestBackend(create_supabase_client))
@@ -0,0 +1,61 @@
+import json
+import logging
+import zlib
+
+from db_utils import call_timeout
+from pagination_utils import encode_cursor
+
+try:
+    import orjson
+except ImportError:  # json writes the same lines, several times slower
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def ndjson_line(row: dict) -> bytes:
+    # Compact, UTF-8, newline-terminated
+    if orjson is not None:
+        return orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(row, separators=(',', ':'), ensure_ascii=False).encode() + b'\n'
+
+
+def export_ndjson(fetch_page, cursor=None, page_size: int = 1000, page_timeout: float = 10.0,
+                  gzip_level=None, key=lambda row: (row['created_at'], row['id'])):
+    """Stream every row of a keyset-paged query as NDJSON, holding one page at a time.
+
+    fetch_page(limit, cursor) returns the next `limit` rows after `cursor`
+    (None for the first page); key(row) is the cursor a row ends. Each page
+    is fetched under call_timeout(page_timeout) and followed by a checkpoint
+    line, {"next_cursor": "..."}: passed back as `cursor`, it resumes with
+    the rows after that page. The last line is {"next_cursor": null} once
+    every row has been written, or {"error": "..."} if a page failed.
+
+    With gzip_level the output is a single gzip stream, flushed at every
+    checkpoint so a client can decode everything up to the last checkpoint
+    it received, even if the connection then drops.
+    """
+    compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31) if gzip_level is not None else None
+
+    def emit(chunk: bytes, last: bool = False) -> bytes:
+        if compressor is None:
+            return chunk
+        return compressor.compress(chunk) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+    while True:
+        try:
+            with call_timeout(page_timeout):
+                rows = fetch_page(page_size, cursor)
+        except Exception as e:
+            logger.warning("Export stopped after cursor %s: %s", cursor, e)
+            yield emit(ndjson_line({"error": str(e)}), last=True)
+            return
+
+        done = len(rows) < page_size
+        if rows:
+            cursor = key(rows[-1])
+        page = b''.join(map(ndjson_line, rows))
+        del rows
+        yield emit(page + ndjson_line({"next_cursor": None if done else encode_cursor(*cursor)}), last=done)
+        if done:
+            return
@@ -0,0 +1,11 @@
+# Read by gunicorn from its working directory (the Dockerfile's WORKDIR), so the
+# Dockerfile's CMD and bench/ pick it up without a -c flag.
+
+
+def post_worker_init(worker):
+    # The app is imported and the worker is about to accept: start warming it in
+    # the background, so the request that woke the machine isn't held for it
+    from app import WARM_UP, warm_up
+
+    if WARM_UP:
+        warm_up.start()
@@ -0,0 +1,243 @@
+import bisect
+import functools
+import threading
+import time
+
+from flask import g, has_request_context, request
+
+# Seconds; wide enough for a cache hit and a cold Supabase round-trip alike
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_CALL_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for values, count in items:
+            yield f'{self.name}{_labels(self.labelnames, values)} {count}'
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and three additions."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(values, list(s[0]), s[1], s[2]) for values, s in self._series.items()]
+        for values, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                yield f'{self.name}_bucket{_labels(self.labelnames, values, [le])} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, values)} {total}'
+            yield f'{self.name}_count{_labels(self.labelnames, values)} {count}'
+
+
+class Registry:
+    """Holds the process's metrics and renders them in Prometheus text format.
+
+    Caches are read at scrape time from their own hit/miss counters, so the
+    hot paths pay nothing extra for them.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._caches = {}  # name -> object with .stats()
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_cache(self, name: str, cache):
+        self._caches[name] = cache
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+
+        stats = {name: cache.stats() for name, cache in self._caches.items()}
+        for field, kind, help in (('hits', 'counter', 'Cache lookups that found a live entry.'),
+                                  ('misses', 'counter', 'Cache lookups that found nothing or an expired entry.'),
+                                  ('size', 'gauge', 'Entries currently held.')):
+            name = f'cache_{field}_total' if kind == 'counter' else f'cache_{field}'
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(f'{name}{{cache="{_escape(cache)}"}} {s[field]}' for cache, s in stats.items())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Registry()
+
+http_request_duration = metrics.histogram(
+    'http_request_duration_seconds', 'Flask request latency by route.', ('method', 'route', 'status'))
+http_request_db_calls = metrics.histogram(
+    'http_request_db_calls', 'Supabase (and direct Postgres) round-trips made while serving one request.', ('route',), DB_CALL_BUCKETS)
+supabase_request_duration = metrics.histogram(
+    'supabase_request_duration_seconds',
+    'Supabase HTTP round-trip latency, body included, and direct Postgres query latency (DATABASE_URL).',
+    ('table', 'operation'))
+supabase_errors = metrics.counter(
+    'supabase_errors_total',
+    'Supabase responses with a 4xx/5xx status, and failed Postgres queries (SQLSTATE or error type).',
+    ('table', 'operation', 'status'))
+socketio_event_duration = metrics.histogram(
+    'socketio_event_duration_seconds', 'Socket.IO event handler latency.', ('event',))
+socketio_messages = metrics.counter(
+    'socketio_messages_total', 'Socket.IO events received from clients and emitted by the server.', ('direction', 'event'))
+
+
+# === FLASK ===
+
+def instrument_app(app):
+    """Time every request and count the Supabase calls it makes."""
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+        g.db_calls = 0
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else '<unmatched>'
+            http_request_duration.observe(time.perf_counter() - started, request.method, route, response.status_code)
+            http_request_db_calls.observe(g.pop('db_calls', 0), route)
+        return response
+
+
+# === SOCKET.IO ===
+
+def timed_event(event: str):
+    """Decorator for Socket.IO handlers; goes *under* @socketio.on(event).
+
+    connect/disconnect handlers should accept the optional auth/reason
+    argument: the Socket.IO layers retry without it on TypeError, which would
+    count the event twice.
+    """
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            socketio_messages.inc('in', event)
+            started = time.perf_counter()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                socketio_event_duration.observe(time.perf_counter() - started, event)
+        return wrapper
+    return decorator
+
+
+def instrument_socketio(socketio):
+    """Count outgoing emits. Both flask_socketio.emit and socketio.emit end in server.emit."""
+    server_emit = socketio.server.emit
+
+    @functools.wraps(server_emit)
+    def emit(event, *args, **kwargs):
+        socketio_messages.inc('out', event)
+        return server_emit(event, *args, **kwargs)
+
+    socketio.server.emit = emit
+
+
+# === SUPABASE ===
+
+def _supabase_labels(req):
+    # /rest/v1/<table>, /rest/v1/rpc/<function>, /auth/v1/..., /storage/v1/...
+    parts = req.url.path.strip('/').split('/')
+    if len(parts) >= 3 and parts[0] == 'rest':
+        if parts[2] == 'rpc' and len(parts) >= 4:
+            return parts[3], 'rpc'
+        if req.method == 'POST':
+            return parts[2], 'upsert' if 'resolution=' in req.headers.get('prefer', '') else 'insert'
+        return parts[2], {'GET': 'select', 'HEAD': 'count', 'PATCH': 'update', 'DELETE': 'delete'}.get(req.method, req.method.lower())
+    return parts[0] or '<root>', req.method.lower()
+
+
+def _on_supabase_request(req):
+    req.extensions['metrics_started'] = time.perf_counter()
+
+
+def _on_supabase_response(response):
+    # Read here so the timing includes the body; httpx skips the second read
+    response.read()
+    req = response.request
+    started = req.extensions.get('metrics_started')
+    if started is None:
+        return
+    table, operation = _supabase_labels(req)
+    observe_db_call(table, operation, started, response.status_code if response.status_code >= 400 else None)
+
+
+def observe_db_call(table: str, operation: str, started: float, error_status=None):
+    """Record one database round-trip that began at perf_counter() `started`."""
+    supabase_request_duration.observe(time.perf_counter() - started, table, operation)
+    if error_status is not None:
+        supabase_errors.inc(table, operation, error_status)
+    if has_request_context() and 'db_calls' in g:
+        g.db_calls += 1
+
+
+def db_error_status(exc: BaseException) -> str:
+    # The SQLSTATE when Postgres answered (57014: statement_timeout), else the error type
+    cause = exc.__cause__ if exc.__cause__ is not None else exc
+    return getattr(cause, 'pgcode', None) or type(cause).__name__
+
+
+def supabase_event_hooks() -> dict:
+    """httpx event hooks that time every Supabase call, labeled by table and operation."""
+    return {'request': [_on_supabase_request], 'response': [_on_supabase_response]}
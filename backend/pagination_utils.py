@@ -0,0 +1,40 @@
+import base64
+import json
+
+
+def encode_cursor(*values) -> str:
+    # Opaque, URL-safe cursor holding the sort key of the last row returned
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Decode a cursor made by encode_cursor. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def parse_limit(raw, default: int = 20, maximum: int = 100) -> int:
+    """Parse a ?limit= value, clamped to 1..maximum. Raises ValueError if not an integer."""
+    if raw is None or raw == '':
+        return default
+    return max(1, min(int(raw), maximum))
+
+
+def _quote(value) -> str:
+    # Double-quote a value for a PostgREST logic tree so commas/parens in it are literal
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def keyset_filter(sort_column: str, sort_value, id_value, descending: bool = True) -> str:
+    # PostgREST or= filter for rows strictly after (sort_value, id_value) in DESC (or ASC) order
+    sort_value, id_value = _quote(sort_value), _quote(id_value)
+    op = 'lt' if descending else 'gt'
+    return f'{sort_column}.{op}.{sort_value},and({sort_column}.eq.{sort_value},id.{op}.{id_value})'
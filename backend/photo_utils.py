@@ -0,0 +1,258 @@
+import io
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import eventlet
+from eventlet import tpool
+from eventlet.queue import LightQueue, Full
+from eventlet.semaphore import BoundedSemaphore
+
+from db_utils import call_timeout
+from metrics_utils import metrics
+from storage_utils import ObjectNotFound, ObjectTooLarge
+
+logger = logging.getLogger(__name__)
+
+# What the upload endpoint accepts; anything else is refused before a URL is signed
+UPLOAD_CONTENT_TYPES = {'image/jpeg', 'image/png', 'image/webp', 'image/avif'}
+DECODABLE_FORMATS = {'JPEG', 'PNG', 'WEBP', 'AVIF'}
+# Peak memory per decoded pixel while rendering (measured on Pillow 12): libwebp
+# and libavif hand back a buffer Pillow copies, RGBA PNGs resize in 4 channels
+DECODE_BYTES_PER_PIXEL = {'JPEG': 4, 'PNG': 12, 'WEBP': 16, 'AVIF': 12}
+# Encoder settings per output format
+ENCODERS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'avif': ('AVIF', 'image/avif', {'quality': 55, 'speed': 8}),
+}
+# Variants never change once written (every upload gets a fresh key)
+VARIANT_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+photos_processed = metrics.counter(
+    'photos_processed_total', 'Uploaded photos run through the pipeline, by outcome.', ('result',))
+photo_render_seconds = metrics.histogram(
+    'photo_render_seconds', 'Decode + resize + encode time per uploaded photo.')
+
+
+class PhotoRejected(Exception):
+    """The upload is missing, too large, or not an image we can decode."""
+
+
+def available_formats() -> list:
+    # AVIF only if this Pillow was built with it. Pillow is imported here and in
+    # render_variants() rather than at the top, keeping it off the worker's startup
+    from PIL import features
+    return [fmt for fmt in ENCODERS if features.check(fmt)]
+
+
+def render_variants(data: bytes, widths: list, formats: list, max_pixels: int, max_decode_bytes: int) -> dict:
+    """Decode one upload and encode it at each width in each format.
+
+    EXIF orientation is applied to the pixels and then every piece of metadata
+    (EXIF, GPS, XMP, comments) is left behind; only the ICC profile is kept so
+    colours survive. Widths above the original's are skipped, but there is
+    always at least one variant. JPEGs are decoded in draft mode, letting
+    libjpeg scale down by up to 8x while decoding instead of inflating all
+    12MP of a phone photo first.
+
+    Uploads over `max_pixels` are refused from the header alone, and so is
+    anything whose decode would take more than `max_decode_bytes`: PNG, WebP
+    and AVIF have no draft mode and are always decoded at full size, however
+    few bytes the upload itself is (a flat 40MP PNG compresses to 50KB).
+
+    Returns {'width', 'height', 'variants': [(format, width, height, bytes)]},
+    smallest first within each format; formats this Pillow can't encode are
+    skipped.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        im = Image.open(io.BytesIO(data))
+        if im.format not in DECODABLE_FORMATS:
+            raise PhotoRejected(f"Unsupported image format {im.format}")
+        if im.width * im.height > max_pixels:
+            raise PhotoRejected(f"Image is larger than {max_pixels} pixels")
+        im.draft('RGB', (max(widths), max(widths)))
+        if im.width * im.height * DECODE_BYTES_PER_PIXEL[im.format] > max_decode_bytes:
+            raise PhotoRejected(f"{im.format} image too large to decode ({im.width}x{im.height})")
+        im = ImageOps.exif_transpose(im)
+        im.load()
+    except PhotoRejected:
+        raise
+    except Exception as e:
+        raise PhotoRejected(f"Could not decode image: {e}")
+
+    icc_profile = im.info.get('icc_profile')
+    mode = 'RGBA' if im.mode in ('RGBA', 'LA', 'PA') or 'transparency' in im.info else 'RGB'
+    if im.mode != mode:
+        im = im.convert(mode)
+    im.info = {}
+
+    fitting = sorted(w for w in set(widths) if w < im.width)
+    targets = fitting + [min(im.width, max(widths))]
+    # Largest first, each one resized from the previous: cheaper than resizing
+    # the full-size image every time, and indistinguishable at these ratios
+    resized, source = {}, im
+    for width in sorted(targets, reverse=True):
+        height = max(1, round(im.height * width / im.width))
+        source = source if source.width == width else source.resize((width, height), Image.LANCZOS)
+        resized[width] = source
+
+    variants = []
+    for fmt in (f for f in formats if f in available_formats()):
+        pil_format, _, options = ENCODERS[fmt]
+        for width in sorted(resized):
+            out = io.BytesIO()
+            extra = {'icc_profile': icc_profile} if icc_profile else {}
+            resized[width].save(out, pil_format, **options, **extra)
+            variants.append((fmt, width, resized[width].height, out.getvalue()))
+    return {'width': im.width, 'height': im.height, 'variants': variants}
+
+
+def pick_variant(variants: list, width: int, fmt: str = 'webp'):
+    """The smallest `fmt` variant at least `width` wide, else the widest one (None if there is none)."""
+    candidates = [v for v in variants or () if v['format'] == fmt]
+    fitting = [v for v in candidates if v['width'] >= width]
+    if fitting:
+        return min(fitting, key=lambda v: v['width'])
+    return max(candidates, key=lambda v: v['width']) if candidates else None
+
+
+class PhotoPipeline:
+    """Turns a completed invite's uploads into the profile's `photos`.
+
+    submit(profile_id, keys) queues a job (at most `queue_size`); `workers`
+    green threads take jobs off the queue and, for each upload, read it from
+    `uploads`, render it on eventlet's OS thread pool (Pillow releases the
+    GIL while decoding, resizing and encoding), and write the variants to
+    `photos`. Only `max_renders` renders run at once, however many workers
+    there are: a decoded photo can take 100MB+, so the workers overlap
+    their reads and writes but not their renders. Each photo becomes
+
+        {"width": ..., "height": ..., "variants": [{"format", "width", "height", "url"}, ...]}
+
+    and the profile moves from 'processing' to 'pending' moderation; uploads
+    that are missing, too large or fail to decode are dropped (and counted). Jobs lost to a restart are
+    picked up again by a sweep every `recover_interval` seconds, for profiles
+    left in 'processing' for over `recover_after`.
+    """
+
+    def __init__(self, db, uploads, photos, widths: list, formats: list, workers: int = 2, queue_size: int = 50,
+                 max_upload_bytes: int = 10 * 1024 * 1024, max_pixels: int = 40_000_000,
+                 max_decode_bytes: int = 48 * 1024 * 1024, max_renders: int = 1,
+                 recover_interval: float = 300.0, recover_after: timedelta = timedelta(minutes=10),
+                 db_timeout: float = 10.0):
+        self.db = db
+        self.uploads = uploads
+        self.photos = photos
+        self.widths = sorted(widths)
+        self.formats = formats
+        self.workers = workers
+        self.max_upload_bytes = max_upload_bytes
+        self.max_pixels = max_pixels
+        self.max_decode_bytes = max_decode_bytes
+        self._render_slots = BoundedSemaphore(max_renders)
+        self.recover_interval = recover_interval
+        self.recover_after = recover_after
+        self.db_timeout = db_timeout
+        self._queue = LightQueue(queue_size)
+        self._active = set()  # profile ids queued or in progress here
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.workers):
+            eventlet.spawn(self._work)
+        eventlet.spawn(self._recover_loop)
+
+    def has_room(self) -> bool:
+        return not self._queue.full()
+
+    def submit(self, profile_id: str, keys: list) -> bool:
+        """Queue a job; False if the queue is full or the profile is already queued here."""
+        with self._lock:
+            if profile_id in self._active:
+                return False
+            try:
+                self._queue.put_nowait((profile_id, list(keys)))
+            except Full:
+                return False
+            self._active.add(profile_id)
+            return True
+
+    def _work(self):
+        while True:
+            profile_id, keys = self._queue.get()
+            try:
+                self.process(profile_id, keys)
+            except Exception as e:
+                # Left in 'processing'; the recovery sweep retries it
+                logger.warning("Photo job for profile %s failed: %s", profile_id, e)
+            finally:
+                with self._lock:
+                    self._active.discard(profile_id)
+
+    def process(self, profile_id: str, keys: list) -> list:
+        photos = []
+        for key in keys:
+            started = time.perf_counter()
+            try:
+                data = self.uploads.read(key, self.max_upload_bytes)
+                with self._render_slots:
+                    rendered = tpool.execute(render_variants, data, self.widths, self.formats,
+                                             self.max_pixels, self.max_decode_bytes)
+            except (PhotoRejected, ObjectNotFound, ObjectTooLarge) as e:
+                # Never uploaded, or not a usable image: retrying won't help
+                photos_processed.inc('rejected')
+                logger.info("Dropped upload %s: %s", key, e)
+                continue
+            photo_render_seconds.observe(time.perf_counter() - started)
+
+            photo_id = key.rsplit('/', 1)[-1]
+            variants = []
+            for fmt, width, height, body in rendered['variants']:
+                variant_key = f"{profile_id}/{photo_id}/{width}.{fmt}"
+                self.photos.write(variant_key, body, ENCODERS[fmt][1], VARIANT_CACHE_CONTROL)
+                variants.append({'format': fmt, 'width': width, 'height': height,
+                                 'url': self.photos.public_url(variant_key)})
+            photos.append({'width': rendered['width'], 'height': rendered['height'], 'variants': variants})
+            photos_processed.inc('ok')
+
+        with call_timeout(self.db_timeout):
+            self.db.finish_profile_photos(profile_id, photos)
+        try:
+            self.uploads.delete(keys)
+        except Exception as e:
+            logger.warning("Could not delete uploads of profile %s: %s", profile_id, e)
+        return photos
+
+    def _recover_loop(self):
+        while True:
+            eventlet.sleep(self.recover_interval)
+            try:
+                self.recover()
+            except Exception as e:
+                logger.warning("Photo job recovery failed: %s", e)
+
+    def recover(self) -> int:
+        """Requeue profiles stuck in 'processing'; returns how many were queued."""
+        before = (datetime.now(timezone.utc) - self.recover_after).isoformat()
+        with call_timeout(self.db_timeout):
+            stalled = self.db.list_stalled_photo_jobs(before, self._queue.maxsize)
+        return sum(self.submit(row['id'], [p['upload'] for p in row['photos'] if 'upload' in p]) for row in stalled)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._started,
+                "workers": self.workers,
+                "queued": self._queue.qsize(),
+                "active_profiles": len(self._active),
+                "widths": self.widths,
+                "formats": self.formats,
+            }
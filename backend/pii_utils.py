@@ -0,0 +1,158 @@
+import os
+import re
+from typing import NamedTuple
+
+# Longest text scan() accepts. Every detector below has bounded repetition, so a
+# scan costs O(len(text)) with a constant that does not depend on the input;
+# this cap bounds the constant-times-n as well.
+PII_MAX_TEXT_LENGTH = int(os.environ.get("PII_MAX_TEXT_LENGTH", 20000))
+# Comma-separated detector names to enable (default: all of DEFAULT_DETECTORS)
+PII_DETECTORS = os.environ.get("PII_DETECTORS")
+# Extra terms to block (comma-separated), and/or a file with one term per line
+PII_DENYLIST = os.environ.get("PII_DENYLIST", "")
+PII_DENYLIST_FILE = os.environ.get("PII_DENYLIST_FILE")
+
+_NUMBER_WORD = r'(?:zero|oh|one|two|three|four|five|six|seven|eight|nine|\d)'
+_TLD = r'(?:com|net|org|io|co|me|ly|app|link|gg|tv|us|uk|ca|info|biz|xyz)'
+# Words that follow a number in a sentence but never in a street name
+_NOT_STREET_NAME = (
+    r'(?!(?:(?:second|minute|min|hour|hr|day|night|week|weekend|month|year|yr|time|date|text|call|'
+    r'drink|mile|block|kid|guy|friend|people|person)s?|at|in|on|of|to|for|with|from|by|into|'
+    r'and|or|the|a|an|her|his|my|our|their|your|same|that|this|whole|down|up|we|she|he|they|i)\b)'
+)
+
+# kind -> pattern. Patterns must only use non-capturing groups: they are joined
+# into one alternation of named groups, and the first alternative that matches
+# at a position wins, so more specific detectors come first. They run with
+# re.ASCII against lowercased text, so write letters in lowercase.
+DEFAULT_DETECTORS = {
+    'email': (
+        r'(?<![\w.+-])[\w.+-]{1,64}\s{0,2}(?:@|\(at\)|\[at\]|\sat\s)\s{0,2}'
+        r'[\w-]{1,63}(?:\s{0,2}(?:\.|\(dot\)|\[dot\]|\sdot\s)\s{0,2}[\w-]{1,63}){0,4}'
+        r'\s{0,2}(?:\.|\(dot\)|\[dot\]|\sdot\s)\s{0,2}' + _TLD + r'\b'
+    ),
+    'url': (
+        r'\b(?:https?://|www\.)[^\s<>"]{1,2048}'
+        r'|\b[a-z0-9-]{1,63}(?:\.[a-z0-9-]{1,63}){0,3}\.' + _TLD + r'\b(?:/[^\s<>"]{0,2048})?'
+    ),
+    'social_handle': (
+        r'\b(?:ig|insta(?:gram)?|snap(?:chat)?|tiktok|twitter|telegram|tg|whatsapp|'
+        r'fb|facebook|onlyfans|discord|kik)\s{0,3}[:@-]\s{0,3}@?[\w.]{2,30}'
+        # Short forms that are also words or word endings ("kind of - she..."): only with : or @
+        r'|\b(?:sc|tt|wa|of)\s{0,3}(?::\s{0,3}@?|@)[\w.]{2,30}'
+        r'|(?<![\w@.])@[a-z_][\w.]{1,29}'
+    ),
+    'phone': (
+        # 7-15 digits, optionally grouped by spaces, dots, dashes or parentheses,
+        # but not a year range like "2019-2021"
+        r'(?<![\w])(?!(?:19|20)\d\d\s{0,2}-\s{0,2}(?:19|20)\d\d(?!\d))\+?\(?\d(?:[\s.()-]{0,2}\d){6,14}(?!\w)'
+        # ...or spelled out: "five five five, one two three four..."
+        r'|\b' + _NUMBER_WORD + r'(?:[\s,.-]{1,3}' + _NUMBER_WORD + r'){6,14}\b'
+    ),
+    'street_address': (
+        # House number, 1-4 words of street name, street type. Name words can't be
+        # counted nouns or the little words of a sentence, so "2 nights at her place"
+        # and "3 months in the same lane" aren't addresses
+        r'\b\d{1,6}\s{1,3}(?:' + _NOT_STREET_NAME + r'[a-z0-9.\'-]{1,30}\s{1,3}){1,4}'
+        r'(?:street|st|avenue|ave|road|rd|boulevard|blvd|lane|ln|drive|dr|court|ct|way|'
+        r'place|pl|terrace|ter|circle|cir|highway|hwy|parkway|pkwy)\b\.?'
+    ),
+}
+
+
+class PiiMatch(NamedTuple):
+    kind: str
+    start: int  # offsets are in Unicode code points (Python str indices)
+    end: int
+    text: str
+
+
+class TextTooLong(ValueError):
+    pass
+
+
+def _trie_pattern(terms) -> str:
+    """One regex for many literal terms, factored by common prefix.
+
+    A flat `a|b|c` alternation is retried term by term at every position;
+    the trie form branches on one character at a time, so matching costs at
+    most the length of the longest term per position, however many terms.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[''] = {}  # end of a term
+
+    def build(node):
+        end = '' in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if end else body
+
+    return build(trie)
+
+
+class PiiFilter:
+    """Finds contact details and denylisted terms in one pass over the text.
+
+    `detectors` maps a kind to a regex (see DEFAULT_DETECTORS); `denylist`
+    terms are matched case-insensitively on word boundaries as kind
+    'denylist'. Everything is compiled once into a single alternation, and
+    scan() walks the text once with finditer().
+
+    The text is lowercased up front rather than compiling with IGNORECASE,
+    and detectors use ASCII classes (contact details are ASCII in practice);
+    together that roughly halves the scan time. Denylist terms keep Unicode
+    word boundaries so names with accents match whole.
+    """
+
+    def __init__(self, detectors: dict, denylist=(), max_length: int = PII_MAX_TEXT_LENGTH):
+        self.max_length = max_length
+        self.kinds = list(detectors)
+        alternatives = []
+        for kind, pattern in detectors.items():
+            if re.compile(pattern).groups:
+                raise ValueError(f"Detector {kind!r} must not use capturing groups")
+            alternatives.append(f'(?P<{kind}>{pattern})')
+        terms = sorted({t.strip().lower() for t in denylist if t.strip()})
+        if terms:
+            self.kinds.append('denylist')
+            alternatives.append(rf'(?P<denylist>(?<!(?u:\w)){_trie_pattern(terms)}(?!(?u:\w)))')
+        self._regex = re.compile('|'.join(alternatives), re.ASCII) if alternatives else None
+
+    def scan(self, text: str) -> list:
+        """Every match, leftmost first and non-overlapping. Raises TextTooLong past max_length."""
+        if len(text) > self.max_length:
+            raise TextTooLong(f"Text is longer than {self.max_length} characters")
+        if self._regex is None:
+            return []
+        # U+0130 is the one character whose lowercase is two code points; fold
+        # it by hand so offsets into `folded` are offsets into `text`
+        folded = text.replace('\u0130', 'I').lower()
+        return [PiiMatch(m.lastgroup, m.start(), m.end(), text[m.start():m.end()])
+                for m in self._regex.finditer(folded)]
+
+
+def load_denylist() -> list:
+    terms = [t for t in PII_DENYLIST.split(',') if t.strip()]
+    if PII_DENYLIST_FILE:
+        with open(PII_DENYLIST_FILE) as f:
+            terms.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    return terms
+
+
+def _enabled_detectors() -> dict:
+    if not PII_DETECTORS:
+        return dict(DEFAULT_DETECTORS)
+    names = [n.strip() for n in PII_DETECTORS.split(',') if n.strip()]
+    unknown = set(names) - DEFAULT_DETECTORS.keys()
+    if unknown:
+        raise ValueError(f"Unknown PII detectors: {', '.join(sorted(unknown))}")
+    return {name: DEFAULT_DETECTORS[name] for name in names}
+
+
+pii_filter = PiiFilter(_enabled_detectors(), load_denylist())
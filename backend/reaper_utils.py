@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import eventlet
+
+from db_utils import call_timeout
+from metrics_utils import metrics
+
+logger = logging.getLogger(__name__)
+
+reaper_rows = metrics.counter(
+    'reaper_rows_total', 'Expired rows handled by the expiry reaper.', ('job',))
+reaper_passes = metrics.counter(
+    'reaper_passes_total', 'Expiry reaper passes, by outcome.', ('result',))
+
+
+class ExpiryReaper:
+    """Deactivates and purges expired redeem sessions and invite tokens.
+
+    Each pass (every `interval` seconds once started, or one run_once() call)
+    runs three jobs through the database functions in schema.sql section 10:
+
+      sessions_deactivated  active sessions past expires_at; their rooms are
+                            handed to `on_sessions_expired(room_names)`
+      invites_expired       invite tokens past their expiry are burned
+      sessions_purged       inactive sessions that expired over `retention` ago
+
+    Every call handles at most `batch_size` rows and a job stops after
+    `max_batches` calls, yielding to the hub in between, so a backlog is
+    worked off over several passes instead of in one long statement.
+    """
+
+    JOBS = ('sessions_deactivated', 'invites_expired', 'sessions_purged')
+
+    def __init__(self, db, interval: float = 60.0, batch_size: int = 500, max_batches: int = 20,
+                 retention: timedelta = timedelta(days=7), db_timeout: float = 30.0, on_sessions_expired=None):
+        self.db = db
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.retention = retention
+        self.db_timeout = db_timeout
+        self.on_sessions_expired = on_sessions_expired
+        self._totals = dict.fromkeys(self.JOBS, 0)
+        self._last_pass = None
+        self._last_error = None
+        self._lock = threading.Lock()
+        self._pass_lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        eventlet.spawn(self._run)
+
+    def _run(self):
+        while True:
+            eventlet.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception as e:
+                # Expired rows just wait for the next pass
+                logger.warning("Expiry reaper pass failed: %s", e)
+
+    def run_once(self) -> dict:
+        """One bounded pass over every job. Returns the rows handled per job."""
+        with self._pass_lock:
+            started = time.monotonic()
+            expired_before = (datetime.now(timezone.utc) - self.retention).isoformat()
+            try:
+                done = {
+                    'sessions_deactivated': self._batches('sessions_deactivated', self._deactivate_sessions),
+                    'invites_expired': self._batches(
+                        'invites_expired', lambda: len(self.db.expire_profile_invites(self.batch_size))),
+                    'sessions_purged': self._batches(
+                        'sessions_purged', lambda: self.db.purge_redeem_sessions(expired_before, self.batch_size)),
+                }
+            except Exception as e:
+                reaper_passes.inc('failed')
+                with self._lock:
+                    self._last_error = str(e)
+                raise
+            reaper_passes.inc('ok')
+            with self._lock:
+                for job, count in done.items():
+                    self._totals[job] += count
+                self._last_pass = {
+                    "finished_at": datetime.now(timezone.utc).isoformat(),
+                    "seconds": round(time.monotonic() - started, 3),
+                    **done,
+                }
+                self._last_error = None
+            if any(done.values()):
+                logger.info("Expiry reaper: %s", done)
+            return done
+
+    def _batches(self, job, batch) -> int:
+        total = 0
+        for _ in range(self.max_batches):
+            with call_timeout(self.db_timeout):
+                count = batch()
+            total += count
+            reaper_rows.inc(job, amount=count)
+            if count < self.batch_size:
+                break
+            eventlet.sleep(0)  # let requests in between batches
+        return total
+
+    def _deactivate_sessions(self) -> int:
+        rooms = self.db.deactivate_expired_sessions(self.batch_size)
+        if rooms and self.on_sessions_expired:
+            self.on_sessions_expired(rooms)
+        return len(rooms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._started,
+                "interval": self.interval,
+                "batch_size": self.batch_size,
+                "max_batches": self.max_batches,
+                "retention_seconds": self.retention.total_seconds(),
+                "totals": dict(self._totals),
+                "last_pass": self._last_pass,
+                "last_error": self._last_error,
+            }
@@ -0,0 +1,288 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import eventlet
+
+
+class RoomRegistryUnavailable(Exception):
+    pass
+
+
+class RoomRegistry:
+    """In-memory sid <-> room membership for the signaling server.
+
+    Both directions are kept as dicts of sets, so join, leave and disconnect
+    cleanup are O(1) per membership. Membership is per process, so this is
+    only right for a single worker; with a Socket.IO message queue use
+    RedisRoomRegistry, which every worker shares.
+    """
+
+    def __init__(self, max_participants: int = 2):
+        self.max_participants = max_participants
+        self._rooms = {}  # room -> {sid}
+        self._sids = {}   # sid -> {room}
+        self._lock = threading.Lock()
+
+    def join(self, sid: str, room: str) -> bool:
+        """Add sid to room. Returns False (and changes nothing) if the room is full."""
+        with self._lock:
+            members = self._rooms.setdefault(room, set())
+            if sid not in members and len(members) >= self.max_participants:
+                if not members:
+                    del self._rooms[room]
+                return False
+            members.add(sid)
+            self._sids.setdefault(sid, set()).add(room)
+            return True
+
+    def leave(self, sid: str, room: str) -> bool:
+        with self._lock:
+            return self._discard(sid, room)
+
+    def remove_sid(self, sid: str) -> list:
+        """Drop sid from every room it joined and return those rooms."""
+        with self._lock:
+            rooms = list(self._sids.get(sid, ()))
+            for room in rooms:
+                self._discard(sid, room)
+            return rooms
+
+    def close(self, room: str) -> set:
+        """Drop every sid from room (e.g. its session expired) and return them."""
+        with self._lock:
+            members = set(self._rooms.get(room, ()))
+            for sid in members:
+                self._discard(sid, room)
+            return members
+
+    def shares_room(self, sid: str, other_sid: str) -> bool:
+        """Whether both sids are in at least one common room (relays are only allowed then)."""
+        with self._lock:
+            return any(other_sid in self._rooms.get(room, ()) for room in self._sids.get(sid, ()))
+
+    def peers(self, room: str) -> set:
+        with self._lock:
+            return set(self._rooms.get(room, ()))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "rooms": len(self._rooms),
+                "peers": len(self._sids),
+                "max_participants": self.max_participants,
+            }
+
+    def _discard(self, sid, room) -> bool:
+        members = self._rooms.get(room)
+        if not members or sid not in members:
+            return False
+        members.discard(sid)
+        if not members:
+            del self._rooms[room]
+        rooms = self._sids.get(sid)
+        rooms.discard(room)
+        if not rooms:
+            del self._sids[sid]
+        return True
+
+
+def _text(value) -> str:
+    # Members come back as bytes unless the client was made with decode_responses
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class RedisRoomRegistry:
+    """RoomRegistry kept in Redis, so every worker sees every room.
+
+    Same interface and the same two directions, as Redis sets:
+    <prefix>:room:<room> holds sids and <prefix>:sid:<sid> holds rooms, so
+    shares_room() is one SINTER. join() checks the cap and adds in one
+    WATCH/MULTI transaction: two workers admitting a room's last place at
+    the same moment can't both succeed. Keys expire `ttl` seconds after the last
+    join, which clears sids left behind by a worker that died without
+    running its disconnect handlers. Redis errors are raised as
+    RoomRegistryUnavailable.
+    """
+
+    def __init__(self, client, max_participants: int = 2, ttl: int = 7200, prefix: str = 'signaling'):
+        import redis
+
+        self._redis = client
+        self._errors = redis.RedisError
+        self.max_participants = max_participants
+        self.ttl = ttl
+        self.prefix = prefix
+        self._local_sids = set()  # sids this process added, for stats()
+        self._lock = threading.Lock()
+
+    def _room_key(self, room):
+        return f'{self.prefix}:room:{room}'
+
+    def _sid_key(self, sid):
+        return f'{self.prefix}:sid:{sid}'
+
+    @contextmanager
+    def _unavailable(self):
+        try:
+            yield
+        except self._errors as e:
+            raise RoomRegistryUnavailable(f"Room registry unavailable: {e}") from e
+
+    def join(self, sid: str, room: str) -> bool:
+        """Add sid to room. Returns False (and changes nothing) if the room is full."""
+        room_key, sid_key = self._room_key(room), self._sid_key(sid)
+
+        def attempt(pipe):
+            if not pipe.sismember(room_key, sid) and pipe.scard(room_key) >= self.max_participants:
+                return False
+            pipe.multi()
+            pipe.sadd(room_key, sid)
+            pipe.sadd(sid_key, room)
+            pipe.expire(room_key, self.ttl)
+            pipe.expire(sid_key, self.ttl)
+            return True
+
+        with self._unavailable():
+            # Rerun by redis-py if another join or leave changed the room in between
+            joined = self._redis.transaction(attempt, room_key, value_from_callable=True)
+        if joined:
+            with self._lock:
+                self._local_sids.add(sid)
+        return joined
+
+    def leave(self, sid: str, room: str) -> bool:
+        with self._unavailable():
+            removed, _ = (self._redis.pipeline()
+                          .srem(self._room_key(room), sid)
+                          .srem(self._sid_key(sid), room)
+                          .execute())
+        return bool(removed)
+
+    def remove_sid(self, sid: str) -> list:
+        """Drop sid from every room it joined and return those rooms."""
+        with self._lock:
+            self._local_sids.discard(sid)
+        sid_key = self._sid_key(sid)
+        with self._unavailable():
+            rooms = [_text(r) for r in self._redis.smembers(sid_key)]
+            pipe = self._redis.pipeline()
+            for room in rooms:
+                pipe.srem(self._room_key(room), sid)
+            pipe.delete(sid_key)
+            pipe.execute()
+        return rooms
+
+    def close(self, room: str) -> set:
+        """Drop every sid from room (e.g. its session expired) and return them."""
+        room_key = self._room_key(room)
+        with self._unavailable():
+            members = {_text(m) for m in self._redis.smembers(room_key)}
+            pipe = self._redis.pipeline()
+            for sid in members:
+                pipe.srem(self._sid_key(sid), room)
+            pipe.delete(room_key)
+            pipe.execute()
+        return members
+
+    def shares_room(self, sid: str, other_sid: str) -> bool:
+        """Whether both sids are in at least one common room (relays are only allowed then)."""
+        with self._unavailable():
+            return bool(self._redis.sinter(self._sid_key(sid), self._sid_key(other_sid)))
+
+    def peers(self, room: str) -> set:
+        with self._unavailable():
+            return {_text(m) for m in self._redis.smembers(self._room_key(room))}
+
+    def stats(self) -> dict:
+        # Counting every room would mean a SCAN over Redis; report this process's share
+        with self._lock:
+            local = len(self._local_sids)
+        return {"backend": "redis", "local_peers": local, "max_participants": self.max_participants,
+                "ttl": self.ttl}
+
+
+class TokenBuckets:
+    """Per-sid token buckets, one per limited event.
+
+    `limits` maps an event to (rate, burst): a sid may spend `burst` tokens
+    at once and regains `rate` per second. Buckets are refilled lazily from
+    the clock when checked, so allow() is O(1) and nothing runs in the
+    background; forget() drops a sid's buckets on disconnect.
+    """
+
+    def __init__(self, limits: dict):
+        self.limits = limits
+        self._buckets = {}  # sid -> {event: [tokens, last_checked]}
+        self._lock = threading.Lock()
+
+    def allow(self, sid: str, event: str, cost: float = 1) -> bool:
+        limit = self.limits.get(event)
+        if limit is None:
+            return True
+        rate, burst = limit
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._buckets.get(sid)
+            if buckets is None:
+                buckets = self._buckets[sid] = {}
+            bucket = buckets.get(event)
+            if bucket is None:
+                bucket = buckets[event] = [burst, now]
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens < cost:
+                bucket[0] = tokens
+                return False
+            bucket[0] = tokens - cost
+            return True
+
+    def forget(self, sid: str):
+        with self._lock:
+            self._buckets.pop(sid, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tracked_sids": len(self._buckets),
+                "limits": {event: {"rate": rate, "burst": burst} for event, (rate, burst) in self.limits.items()},
+            }
+
+
+class IceCandidateBatcher:
+    """Coalesces ICE candidates per (sender, target) before relaying them.
+
+    The first candidate for a pair opens a `window`-second batch; everything
+    that arrives for the pair until then is relayed as one message through
+    `relay(sender_sid, target_sid, candidates, done)`. End-of-candidates
+    flushes the batch immediately and is always relayed, even with no
+    candidates left to send, so the peer learns gathering has finished.
+    """
+
+    def __init__(self, relay, window: float = 0.005):
+        self.relay = relay
+        self.window = window
+        self._pending = {}  # (sender_sid, target_sid) -> [candidate]
+        self._lock = threading.Lock()
+
+    def add(self, sender_sid: str, target_sid: str, candidates: list, done: bool = False):
+        key = (sender_sid, target_sid)
+        with self._lock:
+            batch = self._pending.get(key)
+            opened = batch is None
+            if opened:
+                batch = self._pending[key] = []
+            batch.extend(candidates)
+
+        if done:
+            self.flush(key, done=True)
+        elif opened:
+            eventlet.spawn_after(self.window, self.flush, key)
+
+    def flush(self, key, done: bool = False):
+        with self._lock:
+            batch = self._pending.pop(key, None) or []
+        if batch or done:
+            self.relay(key[0], key[1], batch, done)
+
@@ -0,0 +1,74 @@
+import logging
+import threading
+import time
+
+import eventlet
+
+from db_utils import call_timeout
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUp:
+    """One-off startup work, done in the background instead of by the first requests.
+
+    `steps` is a list of (name, fn). start() runs them in order on a green
+    thread, each under call_timeout(timeout). A failed step is logged and
+    left for the next start() to retry, so whatever polls readiness also
+    drives the retries; `ready` is True once every step has succeeded.
+    """
+
+    def __init__(self, steps: list, timeout: float = 10.0):
+        self.steps = steps
+        self.timeout = timeout
+        self._took = {}    # step -> seconds, once it succeeded
+        self._errors = {}  # step -> last error, while it keeps failing
+        self._runs = 0
+        self._running = False
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return len(self._took) == len(self.steps)
+
+    def start(self) -> bool:
+        """Run the steps not done yet; False if already running or ready."""
+        with self._lock:
+            if self._running or self.ready:
+                return False
+            self._running = True
+            self._runs += 1
+        eventlet.spawn(self._run)
+        return True
+
+    def _run(self):
+        try:
+            for name, fn in self.steps:
+                if name in self._took:
+                    continue
+                started = time.perf_counter()
+                try:
+                    with call_timeout(self.timeout):
+                        fn()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    logger.warning("Warm-up step %s failed: %s", name, e)
+                    continue
+                self._took[name] = time.perf_counter() - started
+                self._errors.pop(name, None)
+        finally:
+            with self._lock:
+                self._running = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "running": self._running,
+                "runs": self._runs,
+                "steps": {
+                    name: {"ms": round(self._took[name] * 1000, 1)} if name in self._took
+                    else {"error": self._errors.get(name)}
+                    for name, _ in self.steps
+                },
+            }
@@ -0,0 +1,159 @@
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from urllib.parse import quote, urlencode
+
+import httpx
+
+# 'supabase' (Supabase Storage) or 'local' (a directory, served by app.py; for
+# development and benchmarks)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "supabase")
+STORAGE_TIMEOUT = float(os.environ.get("STORAGE_TIMEOUT", 30))
+
+
+class StorageError(Exception):
+    pass
+
+
+class ObjectNotFound(StorageError):
+    pass
+
+
+class ObjectTooLarge(StorageError):
+    pass
+
+
+class SupabaseStorage:
+    """One Supabase Storage bucket, through its REST API with the service key.
+
+    Supabase fixes signed upload URLs at two hours, whatever is asked for;
+    app.py keeps the window short by only accepting uploads for a live
+    invite token and processing them as soon as the invite is completed.
+    """
+
+    def __init__(self, url: str, key: str, bucket: str, client: httpx.Client = None):
+        self.base = f"{url.rstrip('/')}/storage/v1"
+        self.bucket = bucket
+        self.client = client or httpx.Client(
+            headers={'Authorization': f'Bearer {key}', 'apikey': key}, timeout=STORAGE_TIMEOUT
+        )
+
+    def create_upload_url(self, key: str, expires_in: int) -> str:
+        """URL the browser can PUT one file to without credentials."""
+        resp = self.client.post(f"{self.base}/object/upload/sign/{self.bucket}/{quote(key)}")
+        self._check(resp, key)
+        return self.base + resp.json()['url']
+
+    def read(self, key: str, max_bytes: int) -> bytes:
+        with self.client.stream('GET', f"{self.base}/object/{self.bucket}/{quote(key)}") as resp:
+            if resp.status_code >= 400:
+                resp.read()
+            self._check(resp, key)
+            data = bytearray()
+            for chunk in resp.iter_bytes():
+                data += chunk
+                if len(data) > max_bytes:
+                    raise ObjectTooLarge(f"{key} is larger than {max_bytes} bytes")
+            return bytes(data)
+
+    def write(self, key: str, data: bytes, content_type: str, cache_control: str = 'max-age=3600'):
+        resp = self.client.post(f"{self.base}/object/{self.bucket}/{quote(key)}", content=data, headers={
+            'Content-Type': content_type, 'Cache-Control': cache_control, 'x-upsert': 'true'
+        })
+        self._check(resp, key)
+
+    def delete(self, keys: list):
+        resp = self.client.request('DELETE', f"{self.base}/object/{self.bucket}", json={'prefixes': list(keys)})
+        self._check(resp, ', '.join(keys))
+
+    def public_url(self, key: str) -> str:
+        return f"{self.base}/object/public/{self.bucket}/{quote(key)}"
+
+    @staticmethod
+    def _check(resp, key):
+        # Storage answers a missing object with 400 {"error": "not_found"} as well as 404
+        if resp.status_code == 404 or (resp.status_code == 400 and 'not_found' in resp.text):
+            raise ObjectNotFound(f"{key} does not exist")
+        if resp.status_code >= 400:
+            raise StorageError(f"Storage request for {key} failed: {resp.status_code} {resp.text[:200]}")
+
+
+class LocalStorage:
+    """A bucket in a local directory, standing in for Supabase Storage.
+
+    Upload URLs point at app.py's /storage/v1/upload route and carry an
+    HMAC of the key and expiry, so they are short-lived and only good for
+    that key. Files are served back from /storage/v1/public.
+    """
+
+    def __init__(self, root: str, base_url: str, bucket: str, secret: str):
+        self.root = os.path.join(root, bucket)
+        self.base = f"{base_url.rstrip('/')}/storage/v1"
+        self.bucket = bucket
+        self._secret = secret.encode()
+
+    def create_upload_url(self, key: str, expires_in: int) -> str:
+        expires = int(time.time()) + expires_in
+        query = urlencode({'expires': expires, 'signature': self._sign(key, expires)})
+        return f"{self.base}/upload/{self.bucket}/{quote(key)}?{query}"
+
+    def verify_upload(self, key: str, expires: str, signature: str) -> bool:
+        try:
+            expires = int(expires)
+        except (TypeError, ValueError):
+            return False
+        return expires >= time.time() and hmac.compare_digest(self._sign(key, expires), signature or '')
+
+    def read(self, key: str, max_bytes: int) -> bytes:
+        try:
+            with open(self.path(key), 'rb') as f:
+                data = f.read(max_bytes + 1)
+        except FileNotFoundError:
+            raise ObjectNotFound(f"{key} does not exist")
+        if len(data) > max_bytes:
+            raise ObjectTooLarge(f"{key} is larger than {max_bytes} bytes")
+        return data
+
+    def write(self, key: str, data: bytes, content_type: str = None, cache_control: str = None):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so a reader never sees half a file
+        tmp = f"{path}.{secrets.token_hex(4)}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def delete(self, keys: list):
+        for key in keys:
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+
+    def public_url(self, key: str) -> str:
+        return f"{self.base}/public/{self.bucket}/{quote(key)}"
+
+    def path(self, key: str) -> str:
+        path = os.path.realpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.realpath(self.root) + os.sep):
+            raise StorageError(f"Invalid key {key!r}")
+        return path
+
+    def _sign(self, key, expires) -> str:
+        return hmac.new(self._secret, f"{self.bucket}/{key}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+
+def storage_from_env(bucket: str):
+    if STORAGE_BACKEND == 'local':
+        return LocalStorage(
+            root=os.environ.get("STORAGE_LOCAL_ROOT", "/tmp/bro-storage"),
+            base_url=os.environ.get("STORAGE_LOCAL_URL", "http://localhost:5000"),
+            bucket=bucket,
+            # Set it when several workers share the directory, or their URLs won't verify
+            secret=os.environ.get("STORAGE_LOCAL_SECRET") or secrets.token_hex(32)
+        )
+    if STORAGE_BACKEND == 'supabase':
+        return SupabaseStorage(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"], bucket)
+    raise EnvironmentError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}")
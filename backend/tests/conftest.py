@@ -0,0 +1,99 @@
+"""Shared fixtures. Run from backend/: python -m pytest tests
+
+Database tests use TEST_DATABASE_URL (a role allowed to CREATE DATABASE) or,
+without it, a throwaway server from pgserver; they are skipped if neither is
+available. Each test gets a fresh database with database/schema.sql applied,
+minus the sections that need Supabase (extensions, storage, RLS roles).
+"""
+import os
+import shutil
+import socket
+import subprocess
+import threading
+import time
+import uuid
+
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+
+from bench.postgres import apply_schema  # noqa: E402
+
+# db_utils refuses to import without these; nothing here talks to Supabase
+os.environ.setdefault('SUPABASE_URL', 'http://127.0.0.1:9')
+os.environ.setdefault('SUPABASE_KEY', 'test')
+
+
+@pytest.fixture(scope='session')
+def postgres_admin(tmp_path_factory):
+    """Connection kwargs for a role that may create databases."""
+    url = os.environ.get('TEST_DATABASE_URL')
+    if url:
+        yield {'dsn': url}
+        return
+    pgserver = pytest.importorskip('pgserver')
+    datadir = tmp_path_factory.mktemp('pgdata')
+    server = pgserver.get_server(str(datadir), cleanup_mode='stop')
+    try:
+        yield {'dbname': 'postgres', 'user': 'postgres', 'host': str(datadir)}
+    finally:
+        server.cleanup()
+
+
+@pytest.fixture
+def empty_db(postgres_admin):
+    """Autocommit connection to a new, empty database; dropped afterwards."""
+    name = f'bro_test_{uuid.uuid4().hex[:12]}'
+    admin = psycopg2.connect(**postgres_admin)
+    admin.autocommit = True
+    admin.cursor().execute(f'CREATE DATABASE {name}')
+    conn = psycopg2.connect(**{**postgres_admin, 'dbname': name})
+    conn.autocommit = True
+    try:
+        yield conn
+    finally:
+        conn.close()
+        admin.cursor().execute(f'DROP DATABASE IF EXISTS {name}')
+        admin.close()
+
+
+@pytest.fixture
+def db(empty_db):
+    apply_schema(empty_db)
+    return empty_db
+
+
+@pytest.fixture(scope='session')
+def redis_url():
+    """A Redis several app processes can share: redis-server from PATH if there
+    is one, else fakeredis's TCP server in a thread; skipped without either."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    url = f'redis://127.0.0.1:{port}/0'
+    if shutil.which('redis-server'):
+        proc = subprocess.Popen(['redis-server', '--port', str(port), '--save', '', '--appendonly', 'no'],
+                                stdout=subprocess.DEVNULL)
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        try:
+            yield url
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+        return
+    fakeredis = pytest.importorskip('fakeredis')
+    if not hasattr(fakeredis, 'TcpFakeServer'):
+        pytest.skip('needs redis-server or fakeredis >= 2.26')
+    server = fakeredis.TcpFakeServer(('127.0.0.1', port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield url
+    finally:
+        server.shutdown()
+        server.server_close()
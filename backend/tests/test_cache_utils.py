@@ -0,0 +1,119 @@
+"""TTLCache expiry and LRU order, ResponseCache versions and ETags, and the
+Redis relay that carries bumps between workers."""
+import json
+
+import pytest
+
+import cache_utils
+from cache_utils import CacheInvalidations, ResponseCache, TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_utils.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set('a', 1)
+    clock[0] += 59
+    assert cache.get('a') == 1
+    clock[0] += 1
+    assert cache.get('a', 'gone') == 'gone'
+    assert cache.stats() == {'size': 0, 'maxsize': 10, 'ttl': 60, 'hits': 1, 'misses': 1}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')  # 'b' is now the oldest
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+
+
+def test_setting_again_renews_the_expiry(clock):
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set('a', 1)
+    clock[0] += 50
+    cache.set('a', 2)
+    clock[0] += 50
+    assert cache.get('a') == 2
+
+
+def test_bump_makes_dependent_entries_unreachable():
+    cache = ResponseCache()
+    listing = cache.key('listing', ['profiles'])
+    detail = cache.key('detail', ['profile:1'])
+    cache.set(listing, b'[]')
+    cache.set(detail, b'{}')
+
+    cache.bump('profile:1')
+    assert cache.get(cache.key('listing', ['profiles'])) is not None
+    assert cache.get(cache.key('detail', ['profile:1'])) is None
+    # A read that took its key before the bump can't overwrite the fresh entry
+    assert cache.key('detail', ['profile:1']) != detail
+
+
+def test_etag_is_derived_from_the_body():
+    first, second = ResponseCache(), ResponseCache()
+    body, etag = first.set(first.key('a', []), b'{"x":1}')
+    # Same body on another worker: same ETag, so If-None-Match holds across workers
+    assert second.set(second.key('a', []), b'{"x":1}')[1] == etag
+    assert first.set(first.key('a', []), b'{"x":2}')[1] != etag
+
+
+def test_clear_drops_entries_and_reads_in_flight():
+    cache = ResponseCache()
+    key = cache.key('a', ['profiles'])
+    cache.set(key, b'{}')
+    cache.clear()
+    assert cache.get(key) is None
+    assert cache.key('a', ['profiles']) != key
+
+
+def test_bumps_are_relayed_to_other_workers(redis_url):
+    redis = pytest.importorskip('redis')
+    client = redis.Redis.from_url(redis_url)
+    channel = 'test-cache-invalidations'
+    workers = []
+    for _ in range(2):
+        relay = CacheInvalidations(client, channel)
+        cache = ResponseCache()
+        relay.attach('response', cache)
+        workers.append((relay, cache))
+    (relay_a, cache_a), (relay_b, cache_b) = workers
+
+    subscriber = client.pubsub()
+    subscriber.subscribe(channel)
+    assert subscriber.get_message(timeout=5)['type'] == 'subscribe'
+    before_a, before_b = cache_a.key('d', ['profile:1']), cache_b.key('d', ['profile:1'])
+
+    cache_a.bump('profile:1')
+    message = subscriber.get_message(timeout=5)
+    assert json.loads(message['data'])['scopes'] == ['profile:1']
+    relay_a.apply(message['data'])  # its own bump comes back too, and is ignored
+    relay_b.apply(message['data'])
+
+    assert cache_a.key('d', ['profile:1']) == cache_b.key('d', ['profile:1'])
+    assert cache_a.key('d', ['profile:1']) != before_a
+    assert cache_b.key('d', ['profile:1']) != before_b
+    assert (relay_a.stats()['published'], relay_b.stats()['received']) == (1, 1)
+    subscriber.close()
+
+
+def test_failed_publish_is_counted_not_raised():
+    class Down:
+        def publish(self, channel, message):
+            raise ConnectionError('down')
+
+    relay = CacheInvalidations(Down(), 'c')
+    cache = ResponseCache()
+    relay.attach('response', cache)
+    key = cache.key('d', ['profile:1'])
+    cache.bump('profile:1')
+    assert cache.key('d', ['profile:1']) != key
+    assert relay.stats()['publish_failures'] == 1
@@ -0,0 +1,76 @@
+"""The response cache across processes: two app instances sharing one Redis,
+a write on one and the cached read on the other."""
+import http.client
+import json
+import sqlite3
+import time
+import uuid
+
+import pytest
+
+from bench.run import HttpClient, Stack
+from bench.seed import SEED_PASSWORD, seed
+
+
+@pytest.fixture
+def stack(tmp_path, redis_url):
+    db_path = str(tmp_path / 'bro.sqlite')
+    seed(db_path, profiles=5, users=4, ratings=5, experiences_per_profile=1, votes_per_experience=0,
+         redeem_rooms=0, bcrypt_rounds=4)
+    env = {'SOCKETIO_MESSAGE_QUEUE': redis_url, 'SOCKETIO_CHANNEL': f'test-{uuid.uuid4().hex}',
+           'WRITE_QUEUE_FLUSH_MS': '50'}
+    with Stack(db_path, 4, apps=2, env=env) as stack:
+        stack.db_path = db_path
+        yield stack
+
+
+def get(port, path, token, etag=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    headers = {'Authorization': f'Bearer {token}'}
+    if etag:
+        headers['If-None-Match'] = etag
+    conn.request('GET', path, headers=headers)
+    resp = conn.getresponse()
+    body = resp.read()
+    conn.close()
+    return resp.status, resp.getheader('ETag'), body
+
+
+def register(port):
+    name = f'cache_{uuid.uuid4().hex[:12]}'
+    client = HttpClient(port)
+    status, _ = client.request('POST', '/auth/register',
+                               {'email': f'{name}@example.com', 'username': name, 'password': SEED_PASSWORD})
+    assert status == 201
+    status, login = client.request('POST', '/auth/login', {'username': name, 'password': SEED_PASSWORD})
+    assert status == 200, login
+    return login['token']
+
+
+def test_a_write_on_one_worker_invalidates_the_others(stack):
+    with sqlite3.connect(stack.db_path) as conn:
+        profile_id = conn.execute(
+            "SELECT id FROM female_profiles WHERE moderation_status = 'approved' ORDER BY id").fetchone()[0]
+    reader, writer = stack.app_ports[1], stack.app_ports[0]
+    token = register(reader)
+    path = f'/api/profiles/{profile_id}'
+
+    status, etag, body = get(reader, path, token)
+    assert status == 200 and etag
+    assert get(reader, path, token, etag)[0] == 304
+    count = json.loads(body)['average_ratings']['count']
+
+    status, _ = HttpClient(writer, token).request('POST', f'{path}/rating', {
+        'honesty': 5, 'communication': 4, 'accountability': 3, 'consistency': 2, 'drama_level': 1})
+    assert status == 202
+
+    # Flushed on the writer, then published; the reader's copy must go well before its TTL
+    deadline = time.monotonic() + 10
+    while True:
+        status, new_etag, body = get(reader, path, token, etag)
+        if status == 200:
+            break
+        assert time.monotonic() < deadline, 'the reader kept serving its cached profile'
+        time.sleep(0.1)
+    assert new_etag != etag
+    assert json.loads(body)['average_ratings']['count'] == count + 1
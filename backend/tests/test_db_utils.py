@@ -0,0 +1,64 @@
+"""Circuit breaker accounting in the PostgREST transport."""
+import httpx
+import psycopg2.errors
+import pytest
+
+import db_utils
+from db_utils import CircuitBreaker, DatabaseUnavailable, ResilientTransport, call_timeout
+
+
+def failing_transport(monkeypatch, exc):
+    calls = []
+
+    def handle_request(self, request):
+        calls.append(request)
+        raise exc
+
+    monkeypatch.setattr(httpx.HTTPTransport, 'handle_request', handle_request)
+    monkeypatch.setattr(db_utils.time, 'sleep', lambda seconds: None)
+    return calls
+
+
+@pytest.mark.parametrize('narrowed', [False, True])
+def test_read_timeouts_count_as_failures(monkeypatch, narrowed):
+    calls = failing_transport(monkeypatch, httpx.ReadTimeout('timed out'))
+    breaker = CircuitBreaker(threshold=3, reset_timeout=60)
+    transport = ResilientTransport(breaker, retries=2)
+    request = httpx.Request('GET', 'http://db.invalid/rest/v1/users')
+
+    for _ in range(3 if narrowed else 1):
+        with pytest.raises(DatabaseUnavailable), call_timeout(db_utils.DB_TIMEOUT / 2 if narrowed else db_utils.DB_TIMEOUT):
+            transport.handle_request(request)
+
+    # A narrowed budget is not retried once spent; either way the circuit opens
+    assert len(calls) == 3
+    assert breaker.stats()['state'] == 'open'
+    with pytest.raises(DatabaseUnavailable, match='circuit is open'):
+        transport.handle_request(request)
+
+
+def series_count(histogram, *labels):
+    series = histogram._series.get(labels)
+    return series[2] if series else 0
+
+
+def test_postgres_queries_are_timed_and_counted(db):
+    from flask import Flask, g
+    from metrics_utils import supabase_errors, supabase_request_duration
+
+    backend = db_utils.PostgresBackend(lambda: None, db.dsn, pool_size=2)
+    before = series_count(supabase_request_duration, 'users', 'select')
+    try:
+        with Flask(__name__).test_request_context():
+            g.db_calls = 0
+            assert backend.get_user_by_username('nobody') is None
+            assert backend.get_profile_bundle('00000000-0000-0000-0000-000000000000') is None
+            with pytest.raises(psycopg2.errors.InvalidTextRepresentation):
+                backend.get_user('not-a-uuid')
+            assert g.db_calls == 3
+    finally:
+        backend._pool.closeall()
+
+    assert series_count(supabase_request_duration, 'users', 'select') == before + 2
+    assert series_count(supabase_request_duration, 'get_profile_bundle', 'rpc') >= 1
+    assert supabase_errors._values[('users', 'select', '22P02')] >= 1
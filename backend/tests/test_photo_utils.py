@@ -0,0 +1,98 @@
+import io
+import threading
+import time
+
+import eventlet
+import pytest
+
+PIL = pytest.importorskip('PIL')
+from PIL import Image  # noqa: E402
+
+import photo_utils  # noqa: E402
+from photo_utils import PhotoPipeline, PhotoRejected, render_variants  # noqa: E402
+
+
+class Uploads:
+    def __init__(self, objects):
+        self.objects = objects
+        self.deleted = []
+
+    def read(self, key, max_bytes):
+        return self.objects[key]
+
+    def delete(self, keys):
+        self.deleted.extend(keys)
+
+
+class Photos:
+    def __init__(self):
+        self.written = {}
+
+    def write(self, key, body, content_type, cache_control):
+        self.written[key] = body
+
+    def public_url(self, key):
+        return f'https://photos.test/{key}'
+
+
+class Db:
+    def __init__(self):
+        self.finished = {}
+
+    def finish_profile_photos(self, profile_id, photos):
+        self.finished[profile_id] = photos
+
+
+def encode(fmt, size, mode='L'):
+    out = io.BytesIO()
+    Image.new(mode, size, 128).save(out, fmt)
+    return out.getvalue()
+
+
+def pipeline(objects, **kwargs):
+    return PhotoPipeline(Db(), Uploads(objects), Photos(), widths=[320, 640, 1280], formats=['webp'], **kwargs)
+
+
+def test_flat_oversized_png_is_dropped_before_decoding():
+    # A few KB on the wire, 40MP once decoded: under both the upload and the pixel limit
+    data = encode('PNG', (6300, 6300))
+    assert len(data) < 200 * 1024
+    photos = pipeline({'up/p1/a': data})
+    assert photos.process('p1', ['up/p1/a']) == []
+    assert photos.photos.written == {}
+    assert photos.db.finished == {'p1': []}
+
+
+def test_jpeg_of_the_same_size_is_decoded_in_draft_mode():
+    data = encode('JPEG', (6300, 6300))
+    rendered = render_variants(data, [320, 1280], ['webp'], 40_000_000, 48 * 1024 * 1024)
+    assert [(fmt, width) for fmt, width, _, _ in rendered['variants']] == [('webp', 320), ('webp', 1280)]
+
+
+def test_decode_budget_depends_on_format():
+    size = (2000, 2000)  # 4MP: 48MB as a PNG, 64MB as a WebP
+    render_variants(encode('PNG', size), [320], ['webp'], 40_000_000, 48 * 1024 * 1024)
+    with pytest.raises(PhotoRejected):
+        render_variants(encode('WEBP', size, 'RGB'), [320], ['webp'], 40_000_000, 48 * 1024 * 1024)
+
+
+def test_one_render_at_a_time(monkeypatch):
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def slow_render(*args):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return {'width': 1, 'height': 1, 'variants': []}
+
+    monkeypatch.setattr(photo_utils, 'render_variants', slow_render)
+    photos = pipeline({f'up/p{i}/a': b'' for i in range(4)})
+    pool = eventlet.GreenPool()
+    for i in range(4):
+        pool.spawn(photos.process, f'p{i}', [f'up/p{i}/a'])
+    pool.waitall()
+    assert len(photos.db.finished) == 4
+    assert peak[0] == 1
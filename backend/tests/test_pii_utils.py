@@ -0,0 +1,39 @@
+"""Detectors in pii_utils.DEFAULT_DETECTORS: what they flag and what they leave alone."""
+import pytest
+
+from pii_utils import DEFAULT_DETECTORS, PiiFilter
+
+pii_filter = PiiFilter(DEFAULT_DETECTORS)
+
+
+@pytest.mark.parametrize('text, kind, found', [
+    ('text her at (555) 301-1234', 'phone', '(555) 301-1234'),
+    ('five five five one two three four five six seven', 'phone', 'five five five one two three four five six seven'),
+    ('her email is jane12@gmail.com', 'email', 'jane12@gmail.com'),
+    ('her page is https://example.com/u/1', 'url', 'https://example.com/u/1'),
+    ('find her on ig: jane_1', 'social_handle', 'ig: jane_1'),
+    ('snap - jane.doe', 'social_handle', 'snap - jane.doe'),
+    ('her OF: jane', 'social_handle', 'OF: jane'),
+    ('wa @jane', 'social_handle', 'wa @jane'),
+    ('ask @jane_doe', 'social_handle', '@jane_doe'),
+    ('she lives at 12 North Maple Street', 'street_address', '12 North Maple Street'),
+    ('Met at 221 Baker St', 'street_address', '221 Baker St'),
+    ('1600 Pennsylvania Ave NW', 'street_address', '1600 Pennsylvania Ave'),
+    ('350 5th Avenue', 'street_address', '350 5th Avenue'),
+])
+def test_flags(text, kind, found):
+    assert [(m.kind, m.text) for m in pii_filter.scan(text)] == [(kind, found)]
+
+
+@pytest.mark.parametrize('text', [
+    'We spent 2 nights at her place',
+    'After 3 months in the same lane',
+    'kind of - she ghosted me',
+    'We waited 2 hours on the drive',
+    'She was 20 minutes late to our 3 dates at the same place',
+    'of course - she ghosted',
+    'In 2019-2021 we were together',
+    'sc - whatever, tt-later',
+])
+def test_leaves_benign_text_alone(text):
+    assert pii_filter.scan(text) == []
@@ -0,0 +1,93 @@
+"""profile_rating_stats (section 6) against a full recompute over ratings."""
+import random
+
+RATING_KEYS = ('honesty', 'communication', 'accountability', 'consistency', 'drama_level')
+
+UPSERT_RATING = """
+    INSERT INTO public.ratings (profile_id, user_id, honesty, communication, accountability, consistency, drama_level)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (profile_id, user_id) DO UPDATE SET
+        honesty = EXCLUDED.honesty, communication = EXCLUDED.communication,
+        accountability = EXCLUDED.accountability, consistency = EXCLUDED.consistency,
+        drama_level = EXCLUDED.drama_level, updated_at = NOW()
+"""
+
+STORED = """
+    SELECT profile_id::text, rating_count,
+           honesty_sum::numeric / rating_count, communication_sum::numeric / rating_count,
+           accountability_sum::numeric / rating_count, consistency_sum::numeric / rating_count,
+           drama_level_sum::numeric / rating_count
+    FROM public.profile_rating_stats
+    WHERE rating_count > 0
+"""
+
+RECOMPUTED = """
+    SELECT profile_id::text, COUNT(*), AVG(honesty), AVG(communication),
+           AVG(accountability), AVG(consistency), AVG(drama_level)
+    FROM public.ratings
+    GROUP BY profile_id
+"""
+
+
+def seed_people(cur, users=12, profiles=6):
+    cur.execute("""INSERT INTO public.users (username, email, password_hash)
+                   SELECT 'u' || n, 'u' || n || '@example.com', 'x' FROM generate_series(1, %s) n
+                   RETURNING id::text""", (users,))
+    user_ids = [r[0] for r in cur.fetchall()]
+    cur.execute("""INSERT INTO public.female_profiles (display_name, moderation_status)
+                   SELECT 'p' || n, 'approved' FROM generate_series(1, %s) n
+                   RETURNING id::text""", (profiles,))
+    return user_ids, [r[0] for r in cur.fetchall()]
+
+
+def aggregates(cur, query):
+    cur.execute(query)
+    return {row[0]: (row[1], *(round(v, 6) for v in row[2:])) for row in cur.fetchall()}
+
+
+def test_stats_match_recompute_after_mixed_writes(db):
+    rng = random.Random(1)
+    cur = db.cursor()
+    user_ids, profile_ids = seed_people(cur)
+
+    for _ in range(400):
+        profile_id, user_id = rng.choice(profile_ids), rng.choice(user_ids)
+        op = rng.random()
+        if op < 0.55:
+            # New rating or, for a pair that already rated, the app's upsert
+            cur.execute(UPSERT_RATING, (profile_id, user_id, *(rng.randint(0, 5) for _ in RATING_KEYS)))
+        elif op < 0.8:
+            column = rng.choice(RATING_KEYS)
+            cur.execute(f"UPDATE public.ratings SET {column} = %s WHERE profile_id = %s AND user_id = %s",
+                        (rng.randint(0, 5), profile_id, user_id))
+        elif op < 0.9:
+            # Moves a rating to another profile: both profiles' stats change
+            cur.execute("""UPDATE public.ratings SET profile_id = %s
+                           WHERE profile_id = %s AND user_id = %s
+                             AND NOT EXISTS (SELECT 1 FROM public.ratings WHERE profile_id = %s AND user_id = %s)""",
+                        (rng.choice(profile_ids), profile_id, user_id, profile_id, user_id))
+        else:
+            cur.execute("DELETE FROM public.ratings WHERE profile_id = %s AND user_id = %s", (profile_id, user_id))
+
+    # Deleting a user cascades to their ratings, one trigger call per row
+    cur.execute("DELETE FROM public.users WHERE id = %s", (user_ids[0],))
+
+    recomputed = aggregates(cur, RECOMPUTED)
+    assert recomputed, "the mix should leave some ratings behind"
+    assert aggregates(cur, STORED) == recomputed
+    cur.execute("SELECT * FROM public.profile_rating_stats_drift()")
+    assert cur.fetchall() == []
+
+
+def test_rebuild_repairs_drift(db):
+    cur = db.cursor()
+    user_ids, profile_ids = seed_people(cur, users=3, profiles=2)
+    for user_id in user_ids:
+        cur.execute(UPSERT_RATING, (profile_ids[0], user_id, 5, 4, 3, 2, 1))
+    cur.execute("UPDATE public.profile_rating_stats SET rating_count = 99, honesty_sum = 0")
+
+    cur.execute("SELECT profile_id::text FROM public.profile_rating_stats_drift()")
+    assert cur.fetchall() == [(profile_ids[0],)]
+    cur.execute("SELECT rebuilt FROM public.rebuild_profile_rating_stats()")
+    assert cur.fetchall() == [(1,)]
+    assert aggregates(cur, STORED) == aggregates(cur, RECOMPUTED)
@@ -0,0 +1,21 @@
+"""Section 7 read functions."""
+
+
+def test_profile_bundle_omits_internal_columns(db):
+    cur = db.cursor()
+    cur.execute("INSERT INTO public.users (username, email, password_hash) VALUES ('u', 'u@example.com', 'x') RETURNING id")
+    user_id = cur.fetchone()[0]
+    cur.execute("""INSERT INTO public.female_profiles (display_name, bio, moderation_status, invite_token)
+                   VALUES ('Jo', 'Calm and kind', 'approved', 'secret') RETURNING id""")
+    profile_id = cur.fetchone()[0]
+    cur.execute("""INSERT INTO public.experiences (profile_id, user_id, experience_text, moderation_status)
+                   VALUES (%s, %s, 'Honest the whole way through', 'approved')""", (profile_id, user_id))
+
+    cur.execute("SELECT bundle FROM public.get_profile_bundle(%s)", (profile_id,))
+    bundle = cur.fetchone()[0]
+
+    assert bundle['display_name'] == 'Jo'
+    assert not {'search_vector', 'invite_token', 'invite_token_expires_at'} & bundle.keys()
+    [experience] = bundle['experiences']
+    assert experience['user'] == {'username': 'u'}
+    assert 'search_vector' not in experience
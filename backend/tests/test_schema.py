@@ -0,0 +1,62 @@
+"""database/schema.sql applied over itself and over older databases."""
+import json
+from pathlib import Path
+
+from conftest import apply_schema
+
+# database/schema.sql as first released, before any ALTER-only upgrades existed
+INITIAL_SCHEMA = Path(__file__).parent / 'fixtures' / 'schema_initial.sql'
+
+PHOTOS = [{'width': 1200, 'height': 1600, 'variants': [{'format': 'webp', 'width': 320, 'url': 'https://cdn/a-320.webp'}]}]
+
+
+def columns(cur, table):
+    cur.execute("""SELECT column_name FROM information_schema.columns
+                   WHERE table_schema = 'public' AND table_name = %s""", (table,))
+    return {row[0] for row in cur.fetchall()}
+
+
+def test_reapplying_is_a_no_op(db):
+    apply_schema(db)
+
+
+def test_upgrades_initial_schema(empty_db):
+    cur = empty_db.cursor()
+    apply_schema(empty_db, INITIAL_SCHEMA)
+    cur.execute("INSERT INTO public.users (username, email, password_hash) VALUES ('u', 'u@example.com', 'x') RETURNING id")
+    user_id = cur.fetchone()[0]
+    cur.execute("""INSERT INTO public.female_profiles (display_name, bio, photos, moderation_status)
+                   VALUES ('Jo', 'Calm and kind', %s, 'approved') RETURNING id""", (json.dumps(['https://cdn/legacy.jpg']),))
+    profile_id = cur.fetchone()[0]
+    cur.execute("""INSERT INTO public.experiences (profile_id, user_id, experience_text, moderation_status)
+                   VALUES (%s, %s, 'Honest throughout', 'approved') RETURNING id""", (profile_id, user_id))
+    experience_id = cur.fetchone()[0]
+    cur.execute("INSERT INTO public.experience_votes (experience_id, user_id, vote) VALUES (%s, %s, 1)",
+                (experience_id, user_id))
+
+    apply_schema(empty_db)
+
+    assert {'is_admin', 'token_version'} <= columns(cur, 'users')
+    assert {'cover_photo', 'cover_variants', 'bio_snippet', 'search_vector'} <= columns(cur, 'female_profiles')
+    assert {'upvotes', 'downvotes', 'score', 'search_vector'} <= columns(cur, 'experiences')
+    cur.execute("SELECT cover_photo, bio_snippet FROM public.female_profiles WHERE id = %s", (profile_id,))
+    assert cur.fetchone() == ('https://cdn/legacy.jpg', 'Calm and kind')
+    cur.execute("SELECT id FROM public.search_profiles('honest')")
+    assert cur.fetchall() == [(profile_id,)]
+    cur.execute("SELECT * FROM public.rebuild_experience_vote_tallies()")
+    cur.execute("SELECT upvotes, downvotes, score FROM public.experiences WHERE id = %s", (experience_id,))
+    assert cur.fetchone() == (1, 0, 1)
+
+
+def test_replaces_cover_photo_from_before_variants(empty_db):
+    cur = empty_db.cursor()
+    apply_schema(empty_db, INITIAL_SCHEMA)
+    cur.execute("ALTER TABLE public.female_profiles ADD COLUMN cover_photo TEXT GENERATED ALWAYS AS (photos->>0) STORED")
+    cur.execute("INSERT INTO public.female_profiles (display_name, photos) VALUES ('Jo', %s) RETURNING id",
+                (json.dumps(PHOTOS),))
+    profile_id = cur.fetchone()[0]
+
+    apply_schema(empty_db)
+
+    cur.execute("SELECT cover_photo, cover_variants FROM public.female_profiles WHERE id = %s", (profile_id,))
+    assert cur.fetchone() == ('https://cdn/a-320.webp', PHOTOS[0]['variants'])
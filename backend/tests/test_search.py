@@ -0,0 +1,93 @@
+"""Section 8 search_profiles(): what matches, how it ranks and how pages follow on."""
+import json
+
+import pytest
+
+
+@pytest.fixture
+def cur(db):
+    cur = db.cursor()
+    cur.execute("INSERT INTO public.users (username, email, password_hash) VALUES ('u', 'u@example.com', 'x') ")
+    return cur
+
+
+def profile(cur, name, bio='', status='approved'):
+    cur.execute("INSERT INTO public.female_profiles (display_name, bio, moderation_status) VALUES (%s, %s, %s) RETURNING id",
+                (name, bio, status))
+    return cur.fetchone()[0]
+
+
+def experience(cur, profile_id, text, tags=(), status='approved'):
+    cur.execute("""INSERT INTO public.experiences (profile_id, user_id, experience_text, tags, moderation_status)
+                   VALUES (%s, (SELECT id FROM public.users), %s, %s, %s)""", (profile_id, text, json.dumps(list(tags)), status))
+
+
+def search(cur, query, limit=20, after=(None, None)):
+    cur.execute("SELECT id, rank, matching_experiences FROM public.search_profiles(%s, %s, %s, %s)",
+                (query, limit, *after))
+    return cur.fetchall()
+
+
+def test_only_approved_rows_match(cur):
+    approved = profile(cur, 'Maya', 'patient')
+    profile(cur, 'Maya', 'patient', status='pending')
+    via_pending = profile(cur, 'Zoe')
+    experience(cur, via_pending, 'patient', status='pending')
+    assert [row[0] for row in search(cur, 'patient')] == [approved]
+
+
+def test_ranking(cur):
+    by_name = profile(cur, 'Honest Maya', 'Likes long walks')
+    by_bio = profile(cur, 'Zoe', 'Honest and likes long walks')
+    by_experiences = profile(cur, 'Wren')
+    for _ in range(7):
+        experience(cur, by_experiences, 'Honest from the first date')
+    by_tag = profile(cur, 'Vera')
+    experience(cur, by_tag, 'Nothing to report', tags=['honest'])
+
+    ranked = search(cur, 'honest')
+    # A name (weight A) outranks the same word in a bio (weight B); experiences count 0.2 each, up to 5
+    assert [row[0] for row in ranked] == [by_name, by_experiences, by_bio, by_tag]
+    ranks = {row[0]: row for row in ranked}
+    assert ranks[by_experiences][1:] == (1.0, 7)
+    assert ranks[by_tag][1:] == (0.2, 1)
+
+    # Both: own rank plus the experience bonus
+    experience(cur, by_bio, 'Honest, if late')
+    both = {row[0]: row for row in search(cur, 'honest')}[by_bio]
+    assert both[1] == pytest.approx(ranks[by_bio][1] + 0.2, abs=1e-6)
+    assert both[2] == 1
+
+
+def test_websearch_operators(cur):
+    calm = profile(cur, 'Ada', 'Calm and kind')
+    calm_late = profile(cur, 'Bea', 'Calm but always late')
+    kind = profile(cur, 'Cy', 'Kind to strangers')
+
+    assert {row[0] for row in search(cur, 'calm')} == {calm, calm_late}
+    assert {row[0] for row in search(cur, 'calm -late')} == {calm}
+    assert {row[0] for row in search(cur, 'calm or kind')} == {calm, calm_late, kind}
+    assert {row[0] for row in search(cur, '"calm and kind"')} == {calm}
+    assert search(cur, '-calm') == []
+
+
+def test_pages_follow_the_rank_id_keyset(cur):
+    # Ties on rank (same text) as well as distinct ranks, so the id tiebreak is exercised
+    for i in range(23):
+        profile_id = profile(cur, f'Tara {i}', 'Warm' if i % 3 else 'Warm, warm and warm')
+        for _ in range(i % 4):
+            experience(cur, profile_id, 'Warm welcome')
+    everything = search(cur, 'warm', limit=100)
+    assert len(everything) == 23
+    assert everything == sorted(everything, key=lambda row: (row[1], str(row[0])), reverse=True)
+    assert len({row[1] for row in everything}) < 23
+
+    pages, after = [], (None, None)
+    while True:
+        page = search(cur, 'warm', limit=5, after=after)
+        if not page:
+            break
+        pages.append(page)
+        after = (page[-1][1], page[-1][0])
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+    assert [row for page in pages for row in page] == everything
@@ -0,0 +1,112 @@
+"""Room registries: the in-process one and the Redis one shared by workers."""
+import pytest
+
+from signaling_utils import IceCandidateBatcher, RedisRoomRegistry, RoomRegistry, RoomRegistryUnavailable
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def workers():
+    """Two registries on one Redis, as two gunicorn workers would have."""
+    server = fakeredis.FakeServer()
+    return [RedisRoomRegistry(fakeredis.FakeRedis(server=server), max_participants=2, ttl=60, prefix='t')
+            for _ in range(2)]
+
+
+def test_memory_registry_membership():
+    registry = RoomRegistry(max_participants=2)
+    assert registry.join('a', 'r') and registry.join('b', 'r')
+    assert not registry.join('c', 'r')
+    assert registry.shares_room('a', 'b') and not registry.shares_room('a', 'c')
+    assert registry.remove_sid('a') == ['r']
+    assert registry.peers('r') == {'b'}
+
+
+def test_membership_is_shared_across_workers(workers):
+    one, two = workers
+    assert one.join('a', 'room')
+    assert two.join('b', 'room')
+    # A relay from b (on worker two) to a (on worker one) is allowed on either worker
+    assert one.shares_room('b', 'a') and two.shares_room('a', 'b')
+    assert not two.shares_room('a', 'stranger')
+    assert one.peers('room') == two.peers('room') == {'a', 'b'}
+
+    assert two.leave('b', 'room')
+    assert not one.shares_room('a', 'b')
+    assert not two.leave('b', 'room')
+
+
+def test_disconnect_and_close_clear_both_directions(workers):
+    one, two = workers
+    one.join('a', 'r1')
+    one.join('a', 'r2')
+    two.join('b', 'r1')
+    assert sorted(one.remove_sid('a')) == ['r1', 'r2']
+    assert two.peers('r1') == {'b'} and two.peers('r2') == set()
+    assert one.close('r1') == {'b'}
+    assert two.remove_sid('b') == []
+
+
+def test_joins_refresh_the_expiry(workers):
+    one, _ = workers
+    one.join('a', 'room')
+    assert 0 < one._redis.ttl('t:room:room') <= 60
+    assert 0 < one._redis.ttl('t:sid:a') <= 60
+
+
+def test_redis_errors_surface_as_unavailable():
+    broken = fakeredis.FakeServer()
+    broken.connected = False
+    registry = RedisRoomRegistry(fakeredis.FakeRedis(server=broken))
+    with pytest.raises(RoomRegistryUnavailable):
+        registry.shares_room('a', 'b')
+    with pytest.raises(RoomRegistryUnavailable):
+        registry.join('a', 'room')
+
+
+def test_cap_holds_across_workers(workers):
+    one, two = workers
+    assert one.join('a', 'room')
+    assert two.join('b', 'room')
+    assert not one.join('c', 'room') and not two.join('d', 'room')
+    # Rejoining is not a new place
+    assert two.join('a', 'room')
+    assert one.peers('room') == {'a', 'b'}
+
+
+def test_concurrent_joins_for_the_last_place(workers, monkeypatch):
+    one, two = workers
+    one.join('a', 'room')
+    original = one._redis.transaction
+    raced = []
+
+    def transaction(func, *watches, **kwargs):
+        def attempt(pipe):
+            if not raced:
+                # Worker one has checked the cap; worker two takes the last place
+                # before worker one writes
+                raced.append(True)
+                multi = pipe.multi
+
+                def multi_after_race():
+                    assert two.join('b', 'room')
+                    multi()
+
+                pipe.multi = multi_after_race
+            return func(pipe)
+
+        return original(attempt, *watches, **kwargs)
+
+    monkeypatch.setattr(one._redis, 'transaction', transaction)
+    assert not one.join('c', 'room')
+    assert raced and one.peers('room') == {'a', 'b'}
+
+
+def test_end_of_candidates_is_relayed_without_a_batch():
+    relayed = []
+    batcher = IceCandidateBatcher(lambda *args: relayed.append(args), window=60)
+    batcher.add('a', 'b', [{'candidate': 'c1'}])
+    batcher.add('a', 'b', [], done=True)
+    batcher.add('a', 'b', [], done=True)
+    assert relayed == [('a', 'b', [{'candidate': 'c1'}], True), ('a', 'b', [], True)]
@@ -0,0 +1,92 @@
+"""Signaling across processes: two app instances sharing one Redis message queue,
+with the two peers of a room connected to different instances."""
+import sqlite3
+import threading
+import uuid
+
+import pytest
+
+from bench.run import BENCH_ORIGIN, HttpClient, Stack, scrape_counter
+from bench.seed import ADMIN_USERNAME, SEED_PASSWORD, seed
+
+socketio = pytest.importorskip('socketio')
+pytest.importorskip('websocket')
+
+
+class Peer:
+    """A Socket.IO client that records what it receives."""
+
+    def __init__(self, port, auth):
+        self.client = socketio.Client(reconnection=False, websocket_extra_options={'origin': BENCH_ORIGIN})
+        self.events = {}
+        self._arrived = threading.Condition()
+        for event in ('user_joined', 'user_left', 'join_error', 'webrtc_offer', 'webrtc_answer', 'webrtc_ice_candidates'):
+            self.client.on(event, lambda data, event=event: self._record(event, data))
+        self.client.connect(f'http://127.0.0.1:{port}', transports=['websocket'], auth=auth, wait_timeout=10)
+        self.sid = self.client.get_sid()
+
+    def _record(self, event, data):
+        with self._arrived:
+            self.events.setdefault(event, []).append(data)
+            self._arrived.notify_all()
+
+    def wait_for(self, event, timeout=10):
+        with self._arrived:
+            if not self._arrived.wait_for(lambda: self.events.get(event), timeout):
+                raise AssertionError(f'{event} did not arrive within {timeout}s; got {list(self.events)}')
+            return self.events[event].pop(0)
+
+
+@pytest.fixture
+def stack(tmp_path, redis_url):
+    db_path = str(tmp_path / 'bro.sqlite')
+    seed(db_path, profiles=5, users=4, ratings=5, experiences_per_profile=1, votes_per_experience=0,
+         redeem_rooms=2, bcrypt_rounds=4)
+    env = {'SOCKETIO_MESSAGE_QUEUE': redis_url, 'SOCKETIO_CHANNEL': f'test-{uuid.uuid4().hex}'}
+    with Stack(db_path, 4, apps=2, env=env) as stack:
+        stack.db_path = db_path
+        yield stack
+
+
+def test_offer_answer_and_ice_between_workers(stack):
+    with sqlite3.connect(stack.db_path) as conn:
+        room, session_token = conn.execute(
+            "SELECT room_name, session_token FROM redeem_sessions WHERE is_active = 1 ORDER BY room_name").fetchone()
+    status, login = HttpClient(stack.app_ports[1]).request(
+        'POST', '/auth/login', {'username': ADMIN_USERNAME, 'password': SEED_PASSWORD})
+    assert status == 200, login
+
+    # The redeem link holder on the first instance, the user on the second
+    host = Peer(stack.app_ports[0], {'session_token': session_token})
+    guest = Peer(stack.app_ports[1], {'token': login['token']})
+    peers = [host, guest]
+    try:
+        host.client.call('join_room', {'room_name': room}, timeout=10)
+        guest.client.emit('join_room', {'room_name': room})
+        assert host.wait_for('user_joined') == {'sid': guest.sid}
+
+        host.client.emit('webrtc_offer', {'target_sid': guest.sid, 'sdp': {'type': 'offer', 'sdp': 'v=0 host'}})
+        assert guest.wait_for('webrtc_offer') == {'sdp': {'type': 'offer', 'sdp': 'v=0 host'}, 'sender_sid': host.sid}
+        guest.client.emit('webrtc_answer', {'target_sid': host.sid, 'sdp': {'type': 'answer', 'sdp': 'v=0 guest'}})
+        assert host.wait_for('webrtc_answer') == {'sdp': {'type': 'answer', 'sdp': 'v=0 guest'}, 'sender_sid': guest.sid}
+
+        candidate = {'candidate': 'candidate:0 1 udp 2122260223 10.0.0.1 50000 typ host', 'sdpMid': '0', 'sdpMLineIndex': 0}
+        guest.client.emit('webrtc_ice_candidates', {'target_sid': host.sid, 'candidates': [candidate], 'done': True})
+        relayed = host.wait_for('webrtc_ice_candidates')
+        assert relayed['candidates'] == [candidate] and relayed['done'] is True
+
+        # The room's cap counts the peers on both instances
+        third = Peer(stack.app_ports[1], {'token': login['token']})
+        peers.append(third)
+        third.client.emit('join_room', {'room_name': room})
+        assert third.wait_for('join_error') == {'error': 'Room is full'}
+
+        guest.client.disconnect()
+        assert host.wait_for('user_left') == {'sid': guest.sid}
+    finally:
+        for peer in peers:
+            peer.client.disconnect()
+
+    for port in stack.app_ports:
+        dropped = scrape_counter(port, 'signaling_dropped_total')
+        assert not any(key.endswith('/not_in_room') for key in dropped), dropped
@@ -0,0 +1,214 @@
+"""bench.postgrest_standin against database/schema.sql: the same seeded rows
+loaded into both, every RPC called on each side, and the aggregate triggers
+driven by the same writes. A change to schema.sql that the stand-in doesn't
+follow fails here, not as benchmark numbers that quietly stop meaning much."""
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import psycopg2.extras
+import pytest
+
+from bench.postgres import load_seeded
+from bench.postgrest_standin import RPC_FUNCTIONS, Store, from_db
+from bench.seed import NAMES, TAGS, WORDS, seed
+
+TIMESTAMP = re.compile(r'^\d{4}-\d\d-\d\dT\d\d:\d\d')
+# Columns set to NOW() on the Postgres side, or only Postgres has
+VOLATILE = {'updated_at', 'timestamp', 'revoked_at', 'id'}
+
+
+def plain(value):
+    """Either side's values in one form: UUIDs as str, numerics as float, timestamps as datetimes."""
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(item) for item in value]
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, str) and TIMESTAMP.match(value):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def stable(rows):
+    return sorted(({k: v for k, v in row.items() if k not in VOLATILE} for row in rows), key=repr)
+
+
+def assert_same(both, statement, args=()):
+    standin, real = both.query(statement, args)
+    assert stable(standin) == stable(real)
+    return real
+
+
+class Both:
+    def __init__(self, store, cur):
+        self.store, self.cur = store, cur
+
+    def rpc(self, name, **params):
+        standin = RPC_FUNCTIONS[name](self.store, dict(params))
+        args = ', '.join(f'{key} := %({key})s' for key in params)
+        # Lists are uuid[] parameters
+        self.cur.execute(f'SELECT * FROM public.{name}({args})',
+                         {k: [uuid.UUID(i) for i in v] if isinstance(v, list) else v for k, v in params.items()})
+        return plain(standin), plain([dict(row) for row in self.cur.fetchall()])
+
+    def execute(self, statement, args=()):
+        self.store.conn.execute(statement.replace('%s', '?'), args)
+        self.cur.execute(statement, args)
+
+    def query(self, statement, args=()):
+        standin = [from_db(row) for row in self.store.conn.execute(statement.replace('%s', '?'), args)]
+        self.cur.execute(statement, args)
+        return plain(standin), plain([dict(row) for row in self.cur.fetchall()])
+
+    def ids(self, statement, args=()):
+        return [row['id'] for row in self.store.conn.execute(statement.replace('%s', '?'), args)]
+
+
+@pytest.fixture
+def both(db, tmp_path):
+    path = str(tmp_path / 'bro.sqlite')
+    seed(path, profiles=40, users=12, ratings=240, experiences_per_profile=3, votes_per_experience=2,
+         redeem_rooms=10, bcrypt_rounds=4)
+    load_seeded(path, db)
+    psycopg2.extras.register_uuid(conn_or_curs=db)
+    return Both(Store(path), db.cursor(cursor_factory=psycopg2.extras.RealDictCursor))
+
+
+def test_profile_bundle(both):
+    for profile_id in both.ids('SELECT id FROM female_profiles') + [str(uuid.uuid4())]:
+        standin, real = both.rpc('get_profile_bundle', p_profile_id=profile_id)
+        assert standin == real, profile_id
+
+
+def test_averages_round_like_numeric(both):
+    # 1.25 and 2.75, where round() on a float and ROUND() on a numeric part ways
+    profile_id = both.ids("SELECT id FROM female_profiles WHERE moderation_status = 'approved' ORDER BY id")[0]
+    both.execute('DELETE FROM ratings WHERE profile_id = %s', (profile_id,))
+    for user_id, honesty, drama_level in zip(both.ids('SELECT id FROM users ORDER BY id'), (2, 1, 1, 1), (3, 3, 3, 2)):
+        both.execute('INSERT INTO ratings (id, profile_id, user_id, honesty, communication, accountability, consistency, '
+                     'drama_level) VALUES (%s, %s, %s, %s, 0, 0, 0, %s)',
+                     (str(uuid.uuid4()), profile_id, user_id, honesty, drama_level))
+    standin, real = both.rpc('get_profile_bundle', p_profile_id=profile_id)
+    assert standin == real
+    assert real[0]['bundle']['average_ratings'] == {'honesty': 1.3, 'communication': 0, 'accountability': 0,
+                                                    'consistency': 0, 'drama_level': 2.8, 'count': 4}
+
+
+@pytest.mark.parametrize('query', [NAMES[0], TAGS[0], 'long-distance', WORDS[0], f'{WORDS[1]} {WORDS[2]}',
+                                   f'"{WORDS[3]} {WORDS[4]}"', f'{NAMES[1]} or {NAMES[2]}',
+                                   f'{WORDS[5]} -{WORDS[6]}', f'-{WORDS[7]}'])
+def test_search_matches_the_same_profiles(both, query):
+    # Same matches and experience counts; ranks differ (bm25 against ts_rank)
+    standin, real = both.rpc('search_profiles', p_query=query, p_limit=1000)
+    assert {r['id']: r['matching_experiences'] for r in standin} == {r['id']: r['matching_experiences'] for r in real}
+
+
+def test_moderation(both):
+    pending = both.ids("SELECT id FROM experiences WHERE moderation_status = 'pending' ORDER BY id")[:3]
+    approved = both.ids("SELECT id FROM experiences WHERE moderation_status = 'approved' ORDER BY id")[:2]
+    moderator = both.ids('SELECT id FROM users ORDER BY id')[0]
+    standin, real = both.rpc('moderate_experiences', p_ids=pending + approved, p_status='approved',
+                             p_moderator_id=moderator)
+    assert stable(standin) == stable(real) and len(real) == 3
+
+    profiles = both.ids('SELECT id FROM female_profiles ORDER BY id')[:4]
+    both.execute("UPDATE female_profiles SET invite_token = 'tok' WHERE id = %s", (profiles[0],))
+    both.execute("UPDATE female_profiles SET moderation_status = 'processing' WHERE id = %s", (profiles[1],))
+    standin, real = both.rpc('moderate_female_profiles', p_ids=profiles, p_status='rejected', p_moderator_id=moderator)
+    assert stable(standin) == stable(real) and len(real) == 2
+    standin, real = both.rpc('moderate_female_profiles', p_ids=profiles, p_status='bogus', p_moderator_id=moderator)
+    assert standin == real == []
+
+    assert len(assert_same(both, 'SELECT user_id, action, target_table, target_id, details FROM audit_log')) == 5
+    for table in ('experiences', 'female_profiles'):
+        assert_same(both, f'SELECT id, moderation_status FROM {table}')
+
+
+def test_reapers(both):
+    now = datetime.now(timezone.utc)
+    past, future = (now - timedelta(hours=1)).isoformat(), (now + timedelta(hours=1)).isoformat()
+    rooms = both.ids('SELECT id FROM redeem_sessions ORDER BY id')[:4]
+    both.execute(f"UPDATE redeem_sessions SET expires_at = %s WHERE id IN ({', '.join(['%s'] * 4)})", (past, *rooms))
+    standin, real = both.rpc('deactivate_expired_sessions', p_limit=3)
+    assert len(real) == 3 and stable(standin) == stable(real)
+    standin, real = both.rpc('deactivate_expired_sessions', p_limit=3)
+    assert stable(standin) == stable(real) and len(real) == 1
+
+    assert both.rpc('purge_redeem_sessions', p_expired_before=now.isoformat(), p_limit=3) == ([{'purged': 3}], [{'purged': 3}])
+    assert both.rpc('purge_redeem_sessions', p_expired_before=now.isoformat()) == ([{'purged': 1}], [{'purged': 1}])
+
+    invited = both.ids('SELECT id FROM female_profiles ORDER BY id')[:3]
+    for i, profile_id in enumerate(invited):
+        both.execute('UPDATE female_profiles SET invite_token = %s, invite_token_expires_at = %s WHERE id = %s',
+                     (f'tok-{i}', past if i < 2 else future, profile_id))
+    standin, real = both.rpc('expire_profile_invites')
+    assert stable(standin) == stable(real) and len(real) == 2
+    assert_same(both, 'SELECT id, invite_token, moderation_status FROM female_profiles')
+    assert_same(both, 'SELECT user_id, action, target_table, target_id, details FROM audit_log')
+
+
+def test_revoke_user_tokens(both):
+    user_id = both.ids('SELECT id FROM users ORDER BY id')[0]
+    assert both.rpc('revoke_user_tokens', p_user_id=user_id) == ([{'token_version': 1}], [{'token_version': 1}])
+    assert both.rpc('revoke_user_tokens', p_user_id=str(uuid.uuid4())) == ([], [])
+    standin, real = both.query('SELECT user_id, min_token_version FROM token_revocations')
+    assert standin == real == [{'user_id': user_id, 'min_token_version': 1}]
+
+
+def test_aggregate_triggers_and_rebuilds(both):
+    profile_id, other_profile, untouched = both.ids('SELECT id FROM female_profiles ORDER BY id')[:3]
+    users = both.ids('SELECT id FROM users ORDER BY id')
+    rated = {row['user_id'] for row in both.store.conn.execute('SELECT user_id FROM ratings WHERE profile_id = ?', [profile_id])}
+    newcomer = next(u for u in users if u not in rated)
+    upsert = ('INSERT INTO ratings (id, profile_id, user_id, honesty, communication, accountability, consistency, drama_level) '
+              'VALUES (%s, %s, %s, %s, 1, 2, 3, 4) ON CONFLICT (profile_id, user_id) DO UPDATE SET honesty = excluded.honesty')
+    both.execute(upsert, (str(uuid.uuid4()), profile_id, newcomer, 5))
+    both.execute(upsert, (str(uuid.uuid4()), profile_id, newcomer, 0))
+    both.execute('DELETE FROM ratings WHERE profile_id = %s AND user_id <> %s', (other_profile, newcomer))
+    stats = 'SELECT * FROM profile_rating_stats'
+    assert_same(both, stats)
+
+    experience_id = both.ids('SELECT id FROM experiences ORDER BY id')[0]
+    voted = {row['user_id'] for row in both.store.conn.execute(
+        'SELECT user_id FROM experience_votes WHERE experience_id = ?', [experience_id])}
+    voter = next(u for u in users if u not in voted)
+    both.execute('INSERT INTO experience_votes (id, experience_id, user_id, vote) VALUES (%s, %s, %s, 1)',
+                 (str(uuid.uuid4()), experience_id, voter))
+    both.execute('UPDATE experience_votes SET vote = -vote WHERE experience_id = %s', (experience_id,))
+    both.execute('DELETE FROM experience_votes WHERE experience_id = %s AND user_id <> %s', (experience_id, voter))
+    tallies = 'SELECT id, upvotes, downvotes, score FROM experiences'
+    assert_same(both, tallies)
+
+    assert both.rpc('profile_rating_stats_drift') == ([], [])
+    both.execute('UPDATE profile_rating_stats SET honesty_sum = honesty_sum + 1 WHERE profile_id = %s', (profile_id,))
+    both.execute('UPDATE profile_rating_stats SET rating_count = rating_count + 1 WHERE profile_id = %s', (other_profile,))
+    both.execute('DELETE FROM profile_rating_stats WHERE profile_id = %s', (untouched,))
+    standin, real = both.rpc('profile_rating_stats_drift')
+    assert stable(standin) == stable(real) and len(real) == 3
+    assert both.rpc('rebuild_profile_rating_stats', p_profile_id=profile_id) == ([{'rebuilt': 1}], [{'rebuilt': 1}])
+    standin, real = both.rpc('rebuild_profile_rating_stats')
+    assert standin == real
+    assert_same(both, stats)
+
+    both.execute('UPDATE experiences SET upvotes = upvotes + 3 WHERE id = %s', (experience_id,))
+    assert both.rpc('rebuild_experience_vote_tallies') == ([{'rebuilt': 1}], [{'rebuilt': 1}])
+    assert_same(both, tallies)
+
+
+def test_export_pages(both):
+    after = {}
+    pages = 0
+    while True:
+        standin, real = both.rpc('export_profiles', p_limit=7, **after)
+        assert standin == real
+        if not real:
+            break
+        pages += 1
+        after = {'p_after_created_at': real[-1]['created_at'].astimezone(timezone.utc).isoformat(),
+                 'p_after_id': real[-1]['id']}
+    assert pages >= 4
@@ -0,0 +1,132 @@
+"""Signing with kid, verifying across a key rotation, and the revocation list."""
+import time
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import pytest
+
+import token_utils
+from token_utils import JwtKeyring, RevocationList
+
+
+def claims(**extra):
+    return {'sub': 'user-1', 'exp': datetime.now(timezone.utc) + timedelta(hours=1), **extra}
+
+
+def iso(seconds_ago):
+    return (datetime.now(timezone.utc) - timedelta(seconds=seconds_ago)).isoformat()
+
+
+# --- JwtKeyring ---
+
+def test_sign_names_the_active_key():
+    ring = JwtKeyring({'2025-01': 'old-secret', '2025-07': 'new-secret'}, '2025-07')
+    token = ring.sign(claims())
+    assert jwt.get_unverified_header(token)['kid'] == '2025-07'
+    assert ring.verify(token)['sub'] == 'user-1'
+
+
+def test_rotation_keeps_both_generations_valid():
+    before = JwtKeyring({'2025-01': 'old-secret'}, '2025-01')
+    during = JwtKeyring({'2025-01': 'old-secret', '2025-07': 'new-secret'}, '2025-07')
+    after = JwtKeyring({'2025-07': 'new-secret'}, '2025-07')
+    old_token, new_token = before.sign(claims()), during.sign(claims())
+
+    assert during.verify(old_token)['sub'] == 'user-1'
+    assert after.verify(new_token)['sub'] == 'user-1'
+    # Machines not yet given the new key reject its tokens; dropping the old key retires its tokens
+    with pytest.raises(jwt.InvalidTokenError):
+        before.verify(new_token)
+    with pytest.raises(jwt.InvalidTokenError):
+        after.verify(old_token)
+
+
+def test_tokens_without_kid_use_the_legacy_key():
+    legacy = jwt.encode(claims(), 'jwt-secret', algorithm='HS256')
+    ring = JwtKeyring({token_utils.LEGACY_KID: 'jwt-secret', '2025-07': 'new-secret'}, '2025-07')
+    assert ring.verify(legacy)['sub'] == 'user-1'
+
+
+def test_verify_rejects_wrong_secrets_and_missing_claims():
+    ring = JwtKeyring({'a': 'secret'}, 'a')
+    forged = jwt.encode(claims(), 'not-the-secret', algorithm='HS256', headers={'kid': 'a'})
+    with pytest.raises(jwt.InvalidSignatureError):
+        ring.verify(forged)
+    with pytest.raises(jwt.MissingRequiredClaimError):
+        ring.verify(ring.sign({'sub': 'user-1'}))
+    expired = ring.sign(claims(exp=datetime.now(timezone.utc) - timedelta(seconds=1)))
+    with pytest.raises(jwt.ExpiredSignatureError):
+        ring.verify(expired)
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv('JWT_KEYS', '2025-01:old-secret, 2025-07:new-secret')
+    monkeypatch.setenv('JWT_SECRET', 'jwt-secret')
+    monkeypatch.setenv('JWT_ACTIVE_KID', '2025-07')
+    ring = JwtKeyring.from_env()
+    assert ring.kids == ['2025-01', '2025-07', token_utils.LEGACY_KID]
+    assert ring.active_kid == '2025-07'
+
+    monkeypatch.setenv('JWT_ACTIVE_KID', '2026-01')
+    with pytest.raises(ValueError):
+        JwtKeyring.from_env()
+    monkeypatch.setenv('JWT_KEYS', '2025-01')
+    with pytest.raises(ValueError):
+        JwtKeyring.from_env()
+
+
+# --- RevocationList ---
+
+def test_revocations_reject_older_token_versions():
+    revoked = RevocationList(fetch=None, token_ttl=3600)
+    revoked.apply([{'user_id': 'u1', 'min_token_version': 3, 'revoked_at': iso(10)}])
+    assert revoked.is_revoked('u1', 2)
+    assert not revoked.is_revoked('u1', 3)
+    assert not revoked.is_revoked('u2', 0)
+
+    # A replayed older row never lowers the bar
+    revoked.apply([{'user_id': 'u1', 'min_token_version': 1, 'revoked_at': iso(5)}])
+    assert revoked.is_revoked('u1', 2)
+    revoked.add('u1', 5)
+    assert revoked.is_revoked('u1', 4)
+
+
+def test_entries_older_than_a_token_lifetime_are_pruned():
+    revoked = RevocationList(fetch=None, token_ttl=60)
+    revoked.apply([{'user_id': 'old', 'min_token_version': 2, 'revoked_at': iso(120)},
+                   {'user_id': 'new', 'min_token_version': 2, 'revoked_at': iso(10)}])
+    assert not revoked.is_revoked('old', 1)
+    assert revoked.is_revoked('new', 1)
+    assert revoked.stats()['entries'] == 1
+
+
+def test_refresh_pulls_since_the_last_sync_with_overlap():
+    pulls = []
+    revoked = RevocationList(fetch=lambda since: pulls.append(since) or [], token_ttl=3600, overlap=5)
+    started = time.time()
+    revoked.refresh()
+    revoked.refresh()
+    first, second = (datetime.fromisoformat(since).timestamp() for since in pulls)
+    assert first == pytest.approx(started - 3600, abs=2)
+    assert second == pytest.approx(started - 5, abs=2)
+
+
+def test_staleness(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(token_utils.time, 'monotonic', lambda: now[0])
+    revoked = RevocationList(fetch=lambda since: [], token_ttl=3600, max_staleness=60)
+    assert not revoked.fresh()  # never synced
+
+    revoked.refresh()
+    assert revoked.fresh()
+    now[0] += 61
+    assert not revoked.fresh()
+    assert revoked.stats()['seconds_since_refresh'] == 61.0
+
+    def unreachable(since):
+        raise ConnectionError('down')
+
+    revoked.fetch = unreachable
+    with pytest.raises(ConnectionError):
+        revoked.refresh()
+    assert not revoked.fresh()
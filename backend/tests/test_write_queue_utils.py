@@ -0,0 +1,172 @@
+"""WriteBehindQueue: coalescing, retries, rejected rows, the journal and drain."""
+import os
+import uuid
+
+import pytest
+
+import write_queue_utils
+from db_utils import DatabaseUnavailable
+from write_queue_utils import WriteBehindQueue, WriteQueueFull
+
+
+class Writer:
+    """Records every chunk; raises `fail` for chunks containing a row in `bad`."""
+
+    def __init__(self):
+        self.chunks = []
+        self.fail = None
+        self.bad = ()
+
+    def __call__(self, rows):
+        if self.fail and (not self.bad or any(row['id'] in self.bad for row in rows)):
+            raise self.fail
+        self.chunks.append(list(rows))
+
+    @property
+    def rows(self):
+        return [row for chunk in self.chunks for row in chunk]
+
+
+@pytest.fixture(autouse=True)
+def no_flush_loop(monkeypatch):
+    # Flushes are driven by the tests; the background loop would block on a plain threading.Event
+    monkeypatch.setattr(write_queue_utils.eventlet, 'spawn', lambda *args, **kwargs: None)
+
+
+def make_queue(journal=None, **kwargs):
+    ratings, audit = Writer(), Writer()
+    queue = WriteBehindQueue({'rating': (('profile_id', 'user_id'), ratings), 'audit': (None, audit)},
+                             journal_path=journal, **kwargs)
+    queue.start()
+    return queue, ratings, audit
+
+
+def rating(profile_id, user_id, value, **extra):
+    return {'id': f'{profile_id}/{user_id}', 'profile_id': profile_id, 'user_id': user_id, 'honesty': value, **extra}
+
+
+def crash(queue):
+    # What a killed process leaves: the journal as last written, its lock released
+    queue._journal.close()
+    queue._lock_file.close()
+
+
+def test_writes_to_one_key_coalesce():
+    queue, ratings, _ = make_queue()
+    queue.enqueue('rating', rating('p1', 'u1', 1))
+    queue.enqueue('rating', rating('p1', 'u1', 4))
+    queue.enqueue('rating', rating('p2', 'u1', 2))
+    assert queue.stats()['pending'] == {'rating': 2, 'audit': 0}
+
+    assert queue.flush() == 2
+    assert sorted((r['profile_id'], r['honesty']) for r in ratings.rows) == [('p1', 4), ('p2', 2)]
+    assert queue.flush() == 0
+
+
+def test_unavailable_database_requeues_and_newer_writes_win():
+    queue, ratings, _ = make_queue()
+    queue.enqueue('rating', rating('p1', 'u1', 1))
+    queue.enqueue('rating', rating('p2', 'u1', 1))
+    ratings.fail = DatabaseUnavailable('down')
+    assert queue.flush() == 0
+    assert queue.stats()['pending']['rating'] == 2
+    assert queue.stats()['consecutive_failures'] == 1
+
+    queue.enqueue('rating', rating('p1', 'u1', 5))
+    ratings.fail = None
+    assert queue.flush() == 2
+    assert sorted((r['profile_id'], r['honesty']) for r in ratings.rows) == [('p1', 5), ('p2', 1)]
+    assert queue.stats()['consecutive_failures'] == 0
+
+
+def test_a_rejected_row_is_dropped_and_the_rest_written():
+    queue, ratings, _ = make_queue()
+    for profile_id in ('p1', 'p2', 'p3'):
+        queue.enqueue('rating', rating(profile_id, 'u1', 3))
+    ratings.fail, ratings.bad = ValueError('violates foreign key constraint'), {'p2/u1'}
+    assert queue.flush() == 2
+    assert sorted(r['profile_id'] for r in ratings.rows) == ['p1', 'p3']
+    assert queue.stats()['pending'] == {'rating': 0, 'audit': 0}
+
+
+def test_full_queue_refuses_new_keys_but_not_rewrites():
+    queue, _, _ = make_queue(max_pending=1)
+    queue.enqueue('rating', rating('p1', 'u1', 1))
+    queue.enqueue('rating', rating('p1', 'u1', 2))
+    with pytest.raises(WriteQueueFull):
+        queue.enqueue('rating', rating('p2', 'u1', 1))
+
+
+def test_journal_is_replayed_after_a_crash(tmp_path):
+    journal = str(tmp_path / 'write_queue.journal')
+    first, _, _ = make_queue(journal)
+    first.enqueue('rating', rating('p1', 'u1', 4), audit={'entry_id': 'e1', 'action': 'rating_submitted'})
+    crash(first)
+
+    second, ratings, audit = make_queue(journal)
+    assert second.stats()['journal'] == journal
+    assert second.flush() == 2
+    assert [r['honesty'] for r in ratings.rows] == [4]
+    assert [r['entry_id'] for r in audit.rows] == ['e1']
+    # Compacted: nothing left to replay
+    assert os.path.getsize(journal) == 0
+
+
+def test_drain_flushes_and_stops_accepting(tmp_path):
+    queue, ratings, _ = make_queue(str(tmp_path / 'write_queue.journal'))
+    queue.enqueue('rating', rating('p1', 'u1', 2))
+    queue.drain(timeout=5)
+    assert len(ratings.rows) == 1
+    assert queue.stats()['closed']
+    with pytest.raises(WriteQueueFull):
+        queue.enqueue('rating', rating('p2', 'u1', 2))
+
+
+def test_each_worker_gets_its_own_journal_and_orphans_are_adopted(tmp_path):
+    journal = str(tmp_path / 'write_queue.journal')
+    alive, _, _ = make_queue(journal)
+    gone_1, _, _ = make_queue(journal)
+    gone_2, _, _ = make_queue(journal)
+    assert [q.stats()['journal'] for q in (alive, gone_1, gone_2)] == [journal, journal + '.1', journal + '.2']
+
+    gone_1.enqueue('rating', rating('p1', 'u1', 1))
+    gone_2.enqueue('rating', rating('p2', 'u1', 2))
+    crash(gone_1)
+    crash(gone_2)
+
+    # A replacement takes the first free slot and also picks up the one nobody took
+    replacement, ratings, _ = make_queue(journal)
+    assert replacement.stats()['journal'] == journal + '.1'
+    assert not os.path.exists(journal + '.2')
+    assert replacement.flush() == 2
+    assert sorted(r['profile_id'] for r in ratings.rows) == ['p1', 'p2']
+
+
+def test_replayed_audit_entries_are_inserted_once(db, tmp_path):
+    import db_utils
+
+    backend = db_utils.PostgresBackend(lambda: None, db.dsn, pool_size=1)
+    journal = str(tmp_path / 'write_queue.journal')
+    entry = {'entry_id': str(uuid.uuid4()), 'user_id': None, 'action': 'rating_submitted',
+             'target_table': 'female_profiles', 'target_id': str(uuid.uuid4()), 'details': {'source': 'test'},
+             'timestamp': '2026-01-01T00:00:00+00:00'}
+    try:
+        first = WriteBehindQueue({'audit': (None, backend.insert_audit_entries)}, journal_path=journal)
+        first.start()
+        first.enqueue('audit', entry)
+        with open(journal) as f:
+            before_compaction = f.read()
+        assert first.flush() == 1
+        # Crash after the insert but before the compaction had emptied the journal
+        crash(first)
+        with open(journal, 'w') as f:
+            f.write(before_compaction)
+
+        second = WriteBehindQueue({'audit': (None, backend.insert_audit_entries)}, journal_path=journal)
+        second.start()
+        assert second.flush() == 1
+        rows = backend._query("SELECT entry_id::text, details FROM audit_log", label=('audit_log', 'select'))
+        assert rows == [{'entry_id': entry['entry_id'], 'details': {'source': 'test'}}]
+    finally:
+        if backend._pool:
+            backend._pool.closeall()
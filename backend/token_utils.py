@@ -0,0 +1,158 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import eventlet
+import jwt
+
+logger = logging.getLogger(__name__)
+
+JWT_ALGORITHM = "HS256"
+# kid assumed for tokens signed before tokens carried one (always JWT_SECRET)
+LEGACY_KID = "default"
+
+
+class JwtKeyring:
+    """HS256 keys by kid: the active key signs, every key in the ring verifies.
+
+    Rotating without logging anyone out:
+      1. add the new key to JWT_KEYS on every machine (it only verifies for now);
+      2. once all of them have it, point JWT_ACTIVE_KID at it;
+      3. once JWT_TTL_HOURS have passed, drop the old key.
+    """
+
+    def __init__(self, keys: dict, active_kid: str):
+        if not keys:
+            raise ValueError("At least one JWT key is required")
+        if active_kid not in keys:
+            raise ValueError(f"Active JWT key {active_kid!r} is not in the keyring")
+        self._keys = dict(keys)
+        self.active_kid = active_kid
+
+    @classmethod
+    def from_env(cls) -> 'JwtKeyring':
+        # JWT_KEYS="2025-01:<secret>,2025-07:<secret>"; JWT_SECRET on its own is kid 'default'
+        keys = {}
+        for entry in os.environ.get("JWT_KEYS", "").split(','):
+            if entry.strip():
+                kid, _, secret = entry.strip().partition(':')
+                if not secret:
+                    raise ValueError(f"JWT_KEYS entry {kid!r} must be <kid>:<secret>")
+                keys[kid] = secret
+        if os.environ.get("JWT_SECRET"):
+            keys.setdefault(LEGACY_KID, os.environ["JWT_SECRET"])
+        if not keys:
+            raise EnvironmentError("JWT_KEYS or JWT_SECRET must be set in .env")
+        return cls(keys, os.environ.get("JWT_ACTIVE_KID") or list(keys)[0])
+
+    @property
+    def kids(self) -> list:
+        return list(self._keys)
+
+    def sign(self, claims: dict) -> str:
+        return jwt.encode(claims, self._keys[self.active_kid], algorithm=JWT_ALGORITHM,
+                          headers={'kid': self.active_kid})
+
+    def verify(self, token: str) -> dict:
+        """Claims of a token signed by any key in the ring. Raises jwt.InvalidTokenError subclasses."""
+        kid = jwt.get_unverified_header(token).get('kid', LEGACY_KID)
+        key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key {kid!r}")
+        return jwt.decode(token, key, algorithms=[JWT_ALGORITHM], options={'require': ['exp', 'sub']})
+
+
+class RevocationList:
+    """user_id -> lowest token version still accepted, mirrored from token_revocations.
+
+    Every `refresh_interval` seconds, refresh() pulls the rows revoked since
+    the last pull (minus `overlap` seconds, for transactions that committed
+    late) through `fetch(since_iso)`, and forgets entries older than
+    `token_ttl`: every token they could reject has expired by then. So the
+    list holds one entry per user revoked within one token lifetime, and a
+    revocation reaches every worker within about one refresh_interval.
+
+    Lookups are a single dict probe. A Bloom filter in front of it would not
+    pay off here: in CPython, hashing for the filter costs more than the probe.
+
+    fresh() turns False when no refresh has succeeded for `max_staleness`
+    seconds; callers should then check token versions against the database.
+    """
+
+    def __init__(self, fetch, token_ttl: float, refresh_interval: float = 10.0,
+                 max_staleness: float = 60.0, overlap: float = 5.0):
+        self.fetch = fetch
+        self.token_ttl = token_ttl
+        self.refresh_interval = refresh_interval
+        self.max_staleness = max_staleness
+        self.overlap = overlap
+        self._entries = {}  # user_id -> (min_version, revoked_at epoch seconds)
+        self._synced_through = None  # wall clock the last successful pull covered
+        self._synced_at = None       # monotonic time of the last successful pull
+        self._failures = 0
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        eventlet.spawn(self._run)
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                self._failures += 1
+                logger.warning("Token revocation refresh failed: %s", e)
+            eventlet.sleep(self.refresh_interval)
+
+    def refresh(self):
+        started = time.time()
+        since = (self._synced_through - self.overlap) if self._synced_through else started - self.token_ttl
+        rows = self.fetch(datetime.fromtimestamp(since, timezone.utc).isoformat())
+        self.apply(rows)
+        with self._lock:
+            self._synced_through = started
+            self._synced_at = time.monotonic()
+            self._failures = 0
+
+    def apply(self, rows):
+        """Merge token_revocations rows ({user_id, min_token_version, revoked_at}) and prune old entries."""
+        cutoff = time.time() - self.token_ttl
+        with self._lock:
+            for row in rows:
+                revoked_at = datetime.fromisoformat(row['revoked_at']).timestamp()
+                current = self._entries.get(row['user_id'])
+                if current is None or row['min_token_version'] >= current[0]:
+                    self._entries[row['user_id']] = (row['min_token_version'], max(revoked_at, current[1] if current else 0))
+            for user_id in [u for u, (_, at) in self._entries.items() if at < cutoff]:
+                del self._entries[user_id]
+
+    def add(self, user_id: str, min_version: int):
+        # This process revoked them itself: no need to wait for the next refresh
+        self.apply([{'user_id': user_id, 'min_token_version': min_version,
+                     'revoked_at': datetime.now(timezone.utc).isoformat()}])
+
+    def is_revoked(self, user_id: str, version: int) -> bool:
+        entry = self._entries.get(user_id)
+        return entry is not None and version < entry[0]
+
+    def fresh(self) -> bool:
+        synced_at = self._synced_at
+        return synced_at is not None and time.monotonic() - synced_at <= self.max_staleness
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "fresh": self.fresh(),
+                "seconds_since_refresh": round(time.monotonic() - self._synced_at, 1) if self._synced_at else None,
+                "refresh_interval": self.refresh_interval,
+                "max_staleness": self.max_staleness,
+                "consecutive_failures": self._failures,
+            }
@@ -0,0 +1,294 @@
+import fcntl
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+import eventlet
+
+from db_utils import DatabaseUnavailable
+from metrics_utils import metrics
+
+logger = logging.getLogger(__name__)
+
+write_queue_rows = metrics.counter(
+    'write_queue_rows_total', 'Rows written to the database by the write-behind queue.', ('kind',))
+write_queue_coalesced = metrics.counter(
+    'write_queue_coalesced_total', 'Queued writes replaced by a newer write to the same key before a flush.', ('kind',))
+write_queue_failures = metrics.counter(
+    'write_queue_failures_total', 'Rows that could not be written (requeued or rejected).', ('kind', 'reason'))
+
+
+class WriteQueueFull(Exception):
+    pass
+
+
+class WriteBehindQueue:
+    """Acknowledge-now, write-later buffer for upserts and appends.
+
+    `writers` maps a kind to (key_columns, write_fn). Rows of a kind with key
+    columns are coalesced: a second write to the same key before the next
+    flush replaces the first. Kinds without key columns (audit entries) are
+    appended as-is. Every `window` seconds, or as soon as `batch_size` rows
+    are pending, each kind is handed to its write_fn in chunks of
+    `batch_size`, in the order of `writers`.
+
+    Each accepted row is first appended to a JSON-lines journal, which is
+    compacted to the still-pending rows after every flush and replayed on
+    start, so a crash loses nothing that was acknowledged. A crash between
+    a write and the compaction replays rows the database already has, so
+    writers must be idempotent: upserts on the key columns, and appends
+    carrying an id of their own (audit entries' entry_id).
+
+    Each process holds one journal, locked: the first free of `journal_path`,
+    `journal_path.1`, ... `journal_path.<journal_slots - 1>`, so several
+    workers sharing a path each get their own. On start a process also
+    takes over any unlocked journal left by a worker that is gone (e.g.
+    after WEB_CONCURRENCY was lowered). At most `max_pending` distinct rows
+    are held; past that enqueue() raises WriteQueueFull and callers should
+    answer 503.
+    """
+
+    def __init__(self, writers: dict, journal_path=None, window: float = 0.5, batch_size: int = 500,
+                 max_pending: int = 5000, on_flush=None, fsync: bool = False, journal_slots: int = 16):
+        self.writers = writers
+        self.journal_path = journal_path
+        self.journal_slots = journal_slots
+        self.window = window
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.on_flush = on_flush
+        self.fsync = fsync
+        self._pending = {kind: {} for kind in writers}  # kind -> {key: row}
+        self._size = 0
+        self._seq = itertools.count()
+        self._journal = None
+        self._journal_file = None  # the slot of journal_path this process holds
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._started = False
+        self._closed = False
+        self._failures = 0
+
+    # --- producer side ---
+
+    def enqueue(self, kind: str, row: dict, audit: dict = None):
+        """Queue `row` (and optionally an audit_log entry for it) for the next flush."""
+        entries = [(kind, row)] + ([('audit', audit)] if audit else [])
+        with self._lock:
+            if self._closed:
+                raise WriteQueueFull("Write queue is shutting down")
+            new = sum(1 for k, r in entries if self._key(k, r) not in self._pending[k])
+            if self._size + new > self.max_pending:
+                raise WriteQueueFull("Too many writes pending")
+            for k, r in entries:
+                self._put(k, r)
+                self._journal_append(k, r)
+            if self._journal and self.fsync:
+                os.fsync(self._journal.fileno())
+            if self._size >= self.batch_size:
+                self._wake.set()
+
+    def _key(self, kind, row):
+        key_columns = self.writers[kind][0]
+        return tuple(row[c] for c in key_columns) if key_columns else ('seq', next(self._seq))
+
+    def _put(self, kind, row):
+        bucket = self._pending[kind]
+        key = self._key(kind, row)
+        if key in bucket:
+            write_queue_coalesced.inc(kind)
+        else:
+            self._size += 1
+        bucket[key] = row
+
+    # --- journal ---
+
+    def _journal_append(self, kind, row):
+        if self._journal:
+            self._journal.write(json.dumps([kind, row]) + '\n')
+            self._journal.flush()
+
+    def _slot_path(self, slot):
+        return self.journal_path if slot == 0 else f'{self.journal_path}.{slot}'
+
+    @staticmethod
+    def _try_lock(path):
+        lock_file = open(path + '.lock', 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _replay(self, path) -> int:
+        replayed = 0
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        kind, row = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash mid-append
+                    if kind in self.writers:
+                        self._put(kind, row)
+                        replayed += 1
+        if replayed:
+            logger.info("Replayed %d journaled writes from %s", replayed, path)
+        return replayed
+
+    def _open_journal(self):
+        for slot in range(self.journal_slots):
+            path = self._slot_path(slot)
+            lock_file = self._try_lock(path)
+            if lock_file:
+                self._lock_file, self._journal_file = lock_file, path
+                self._replay(path)
+                self._journal = open(path, 'a')
+                break
+        else:
+            logger.warning("All %d write queue journals at %s are held by other processes; running without one",
+                           self.journal_slots, self.journal_path)
+            return
+
+        # Orphaned journals: unlocked, so their worker is gone. Their rows move to ours
+        for slot in range(self.journal_slots):
+            path = self._slot_path(slot)
+            if path == self._journal_file or not os.path.exists(path):
+                continue
+            lock_file = self._try_lock(path)
+            if lock_file:
+                try:
+                    if self._replay(path):
+                        self._compact_journal()
+                    os.remove(path)
+                finally:
+                    lock_file.close()
+
+    def _compact_journal(self):
+        # Called with self._lock held: rewrite the journal as exactly what is still pending
+        if not self._journal:
+            return
+        tmp_path = self._journal_file + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for kind, bucket in self._pending.items():
+                for row in bucket.values():
+                    f.write(json.dumps([kind, row]) + '\n')
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self._journal.close()
+        os.replace(tmp_path, self._journal_file)
+        self._journal = open(self._journal_file, 'a')
+
+    # --- consumer side ---
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            if self.journal_path:
+                self._open_journal()
+        eventlet.spawn(self._run)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.window)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Write queue flush failed")
+            if self._failures:
+                # Database is struggling: back off instead of hammering it every window.
+                # The exponent is capped so a long outage can't overflow the float
+                eventlet.sleep(min(self.window * 2 ** min(self._failures, 10), 30))
+
+    def flush(self) -> int:
+        """Write everything pending now. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending
+                self._pending = {kind: {} for kind in self.writers}
+                self._size = 0
+            if not any(batch.values()):
+                return 0
+
+            written, requeue = {}, []
+            for kind, (_, write) in self.writers.items():
+                rows = list(batch[kind].values())
+                for start in range(0, len(rows), self.batch_size):
+                    chunk = rows[start:start + self.batch_size]
+                    ok, retry = self._write_chunk(kind, write, chunk)
+                    written.setdefault(kind, []).extend(ok)
+                    requeue.extend((kind, row) for row in retry)
+
+            with self._lock:
+                for kind, row in requeue:
+                    # A newer write to the same key wins over the failed one
+                    if self._key(kind, row) not in self._pending[kind]:
+                        self._put(kind, row)
+                self._compact_journal()
+            self._failures = self._failures + 1 if requeue else 0
+
+            count = sum(len(rows) for rows in written.values())
+            if count and self.on_flush:
+                self.on_flush(written)
+            return count
+
+    def _write_chunk(self, kind, write, chunk):
+        """Returns (rows written, rows to retry later)."""
+        try:
+            write(chunk)
+            write_queue_rows.inc(kind, amount=len(chunk))
+            return chunk, []
+        except DatabaseUnavailable:
+            write_queue_failures.inc(kind, 'unavailable', amount=len(chunk))
+            return [], chunk
+        except Exception:
+            if len(chunk) == 1:
+                logger.exception("Dropping %s write rejected by the database: %r", kind, chunk[0])
+                write_queue_failures.inc(kind, 'rejected')
+                return [], []
+        # One bad row (e.g. a foreign key to a deleted profile) fails the whole
+        # statement; write the rest one at a time and drop only the bad ones
+        ok, retry = [], []
+        for row in chunk:
+            row_ok, row_retry = self._write_chunk(kind, write, [row])
+            ok.extend(row_ok)
+            retry.extend(row_retry)
+        return ok, retry
+
+    def drain(self, timeout: float = 20.0):
+        """Stop accepting writes and flush until empty or `timeout` runs out."""
+        with self._lock:
+            if not self._started or self._closed:
+                return
+            self._closed = True
+        deadline = time.monotonic() + timeout
+        while self._size and time.monotonic() < deadline:
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Write queue flush failed during drain")
+            if self._size:
+                time.sleep(min(0.5, max(0.0, deadline - time.monotonic())))
+        if self._size:
+            logger.error("Write queue drain timed out; %d writes left in %s", self._size, self._journal_file)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": {kind: len(bucket) for kind, bucket in self._pending.items()},
+                "max_pending": self.max_pending,
+                "window": self.window,
+                "batch_size": self.batch_size,
+                "journal": self._journal_file,
+                "consecutive_failures": self._failures,
+                "closed": self._closed,
+            }
@@ -11,24 +11,58 @@ CREATE TABLE IF NOT EXISTS public.users (
     username TEXT NOT NULL UNIQUE,
     email TEXT NOT NULL UNIQUE,
     password_hash TEXT NOT NULL,
+    is_admin BOOLEAN NOT NULL DEFAULT FALSE, -- Moderators; granted by hand in the Supabase UI
+    token_version INTEGER NOT NULL DEFAULT 0, -- JWTs carry it as `ver`; bumping it revokes older ones (section 11)
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 COMMENT ON TABLE public.users IS 'Stores male user accounts.';
+-- For databases created before these columns (CREATE TABLE IF NOT EXISTS skips them)
+ALTER TABLE public.users
+    ADD COLUMN IF NOT EXISTS is_admin BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0;
 
 -- Female profiles
 CREATE TABLE IF NOT EXISTS public.female_profiles (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     display_name TEXT NOT NULL,
     bio TEXT,
-    photos JSONB DEFAULT '[]'::jsonb, -- Stores URLs from Supabase Storage
-    moderation_status TEXT NOT NULL DEFAULT 'pending', -- 'pending', 'approved', 'rejected'
-    invite_token TEXT UNIQUE,
+    -- [{width, height, variants: [{format, width, height, url}]}], written by the app's photo
+    -- pipeline; [{upload: key}] while 'processing'. Older profiles hold plain URL strings.
+    photos JSONB DEFAULT '[]'::jsonb,
+    -- First photo, for listing cards: its smallest variant, or the legacy URL
+    cover_photo TEXT GENERATED ALWAYS AS (COALESCE(photos->0->'variants'->0->>'url', photos->>0)) STORED,
+    cover_variants JSONB GENERATED ALWAYS AS (photos->0->'variants') STORED, -- The app picks one per card width
+    bio_snippet TEXT GENERATED ALWAYS AS (LEFT(bio, 100)) STORED, -- Card-sized bio, for listing cards
+    search_vector TSVECTOR, -- display_name (A) + bio (B); maintained by trg_female_profiles_search_vector
+    moderation_status TEXT NOT NULL DEFAULT 'pending', -- 'processing' (photos being rendered), 'pending', 'approved', 'rejected', 'expired' (invite never completed)
+    invite_token TEXT, -- Unique while set; see idx_profiles_invite_token
     invite_token_expires_at TIMESTAMPTZ,
     created_by_user_id UUID REFERENCES public.users(id) ON DELETE SET NULL,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 COMMENT ON TABLE public.female_profiles IS 'Consented female profiles. Not visible until moderation_status = ''approved''.';
+-- CREATE TABLE IF NOT EXISTS leaves an existing table as it is; add the columns
+-- introduced since to databases created before them. cover_photo was first
+-- photos->>0 alone; a generated column's expression can't be altered before
+-- Postgres 17, so an old one is dropped and re-added below.
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM pg_attribute a
+        JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+        WHERE a.attrelid = 'public.female_profiles'::regclass AND a.attname = 'cover_photo'
+          AND pg_get_expr(d.adbin, d.adrelid) NOT LIKE '%variants%'
+    ) THEN
+        ALTER TABLE public.female_profiles DROP COLUMN cover_photo;
+    END IF;
+END $$;
+ALTER TABLE public.female_profiles
+    ADD COLUMN IF NOT EXISTS cover_photo TEXT GENERATED ALWAYS AS (COALESCE(photos->0->'variants'->0->>'url', photos->>0)) STORED,
+    ADD COLUMN IF NOT EXISTS cover_variants JSONB GENERATED ALWAYS AS (photos->0->'variants') STORED,
+    ADD COLUMN IF NOT EXISTS bio_snippet TEXT GENERATED ALWAYS AS (LEFT(bio, 100)) STORED,
+    ADD COLUMN IF NOT EXISTS search_vector TSVECTOR; -- Backfilled in section 8
 
 -- Experience writeups
 CREATE TABLE IF NOT EXISTS public.experiences (
@@ -38,9 +72,20 @@ CREATE TABLE IF NOT EXISTS public.experiences (
     experience_text TEXT NOT NULL,
     tags JSONB DEFAULT '[]'::jsonb,
     moderation_status TEXT NOT NULL DEFAULT 'pending', -- 'pending', 'approved', 'rejected'
+    upvotes INTEGER NOT NULL DEFAULT 0,   -- Maintained by trg_experience_votes_tally
+    downvotes INTEGER NOT NULL DEFAULT 0, -- Maintained by trg_experience_votes_tally
+    score INTEGER GENERATED ALWAYS AS (upvotes - downvotes) STORED,
+    search_vector TSVECTOR, -- tags (A) + experience_text (B); maintained by trg_experiences_search_vector
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 COMMENT ON TABLE public.experiences IS 'User-submitted writeups. Not visible until moderation_status = ''approved''.';
+-- Tallies start at 0 on databases that predate them; fill them in with
+-- flask --app app rebuild-vote-tallies (section 6) once the triggers exist
+ALTER TABLE public.experiences
+    ADD COLUMN IF NOT EXISTS upvotes INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS downvotes INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS score INTEGER GENERATED ALWAYS AS (upvotes - downvotes) STORED,
+    ADD COLUMN IF NOT EXISTS search_vector TSVECTOR; -- Backfilled in section 8
 
 -- Behavior ratings
 CREATE TABLE IF NOT EXISTS public.ratings (
@@ -92,28 +137,80 @@ CREATE TABLE IF NOT EXISTS public.audit_log (
     target_table TEXT,
     target_id UUID,
     details JSONB,
-    timestamp TIMESTAMPTZ DEFAULT NOW()
+    timestamp TIMESTAMPTZ DEFAULT NOW(),
+    entry_id UUID -- Set by the app's write-behind queue, so a replayed entry is inserted once
 );
 COMMENT ON TABLE public.audit_log IS 'Tracks significant actions for safety and moderation.';
+ALTER TABLE public.audit_log ADD COLUMN IF NOT EXISTS entry_id UUID;
+
+-- Per-profile rating aggregates (maintained by trigger, see section 6)
+CREATE TABLE IF NOT EXISTS public.profile_rating_stats (
+    profile_id UUID PRIMARY KEY REFERENCES public.female_profiles(id) ON DELETE CASCADE,
+    rating_count INTEGER NOT NULL DEFAULT 0,
+    honesty_sum BIGINT NOT NULL DEFAULT 0,
+    communication_sum BIGINT NOT NULL DEFAULT 0,
+    accountability_sum BIGINT NOT NULL DEFAULT 0,
+    consistency_sum BIGINT NOT NULL DEFAULT 0,
+    drama_level_sum BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+-- Users whose older tokens must be rejected (see section 11)
+CREATE TABLE IF NOT EXISTS public.token_revocations (
+    user_id UUID PRIMARY KEY, -- No foreign key: outlives deleted users
+    min_token_version INTEGER NOT NULL, -- Tokens with a lower `ver` are rejected
+    revoked_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+COMMENT ON TABLE public.token_revocations IS 'Latest token revocation per user. The app mirrors rows from the last token lifetime in memory.';
+
+COMMENT ON TABLE public.profile_rating_stats IS 'Running sums and count of ratings per profile. Averages are sum / rating_count.';
 
 
 -- ### 3. INDEXES ###
 CREATE INDEX IF NOT EXISTS idx_profiles_status ON public.female_profiles (moderation_status);
+-- Keyset pagination for /api/profiles: WHERE moderation_status = ? ORDER BY created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_profiles_status_created ON public.female_profiles (moderation_status, created_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_experiences_profile_id ON public.experiences (profile_id);
 CREATE INDEX IF NOT EXISTS idx_experiences_user_id ON public.experiences (user_id);
 CREATE INDEX IF NOT EXISTS idx_experiences_status ON public.experiences (moderation_status);
+-- Moderation queue: WHERE moderation_status = 'pending' ORDER BY created_at, id (profiles use idx_profiles_status_created)
+CREATE INDEX IF NOT EXISTS idx_experiences_status_created ON public.experiences (moderation_status, created_at, id);
+-- "Top experiences" for a profile: WHERE profile_id = ? AND moderation_status = ? ORDER BY score DESC
+CREATE INDEX IF NOT EXISTS idx_experiences_profile_score ON public.experiences (profile_id, moderation_status, score DESC, created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_ratings_profile_id ON public.ratings (profile_id);
 CREATE INDEX IF NOT EXISTS idx_ratings_user_id ON public.ratings (user_id);
-CREATE INDEX IF NOT EXISTS idx_sessions_token ON public.redeem_sessions (session_token);
-CREATE INDEX IF NOT EXISTS idx_sessions_room_name ON public.redeem_sessions (room_name);
+-- session_token and room_name lookups use their UNIQUE constraints' indexes
+DROP INDEX IF EXISTS public.idx_sessions_token;
+DROP INDEX IF EXISTS public.idx_sessions_room_name;
+-- Room joins and the expiry reaper (section 10) only look at live rows. Partial
+-- indexes stay the size of the live set however many dead rows pile up.
+CREATE INDEX IF NOT EXISTS idx_sessions_active_room ON public.redeem_sessions (room_name) INCLUDE (expires_at) WHERE is_active;
+CREATE INDEX IF NOT EXISTS idx_sessions_active_expires ON public.redeem_sessions (expires_at) WHERE is_active;
+CREATE INDEX IF NOT EXISTS idx_sessions_inactive_expires ON public.redeem_sessions (expires_at) WHERE NOT is_active;
+-- invite_token is NULL once an invite is completed or expires; only index live tokens
+ALTER TABLE public.female_profiles DROP CONSTRAINT IF EXISTS female_profiles_invite_token_key;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_profiles_invite_token ON public.female_profiles (invite_token) WHERE invite_token IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_profiles_invite_expires ON public.female_profiles (invite_token_expires_at) WHERE invite_token IS NOT NULL;
+-- Photo pipeline recovery: WHERE moderation_status = 'processing' AND updated_at < ?
+CREATE INDEX IF NOT EXISTS idx_profiles_processing ON public.female_profiles (updated_at) WHERE moderation_status = 'processing';
+-- Revocation list refresh: WHERE revoked_at > ? (section 11)
+CREATE INDEX IF NOT EXISTS idx_token_revocations_revoked_at ON public.token_revocations (revoked_at);
+-- Write-behind audit entries: INSERT ... ON CONFLICT (entry_id) DO NOTHING (NULLs never conflict)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_audit_log_entry_id ON public.audit_log (entry_id);
+-- Full-text search (/api/search): search_vector @@ websearch_to_tsquery(...)
+CREATE INDEX IF NOT EXISTS idx_profiles_search ON public.female_profiles USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_experiences_search ON public.experiences USING GIN (search_vector);
 
 
 -- ### 4. SUPABASE STORAGE ###
 -- This must be done in the Supabase UI:
--- 1. Go to Storage -> Create a new bucket.
--- 2. Name the bucket: 'profile_photos'
--- 3. Set it as a Public bucket.
--- 4. Set up storage policies (see section 5).
+-- 1. Go to Storage -> Create a new bucket named 'photo_uploads' (PHOTO_UPLOAD_BUCKET).
+--    Keep it private: the approve page PUTs originals to it through signed upload
+--    URLs from /public/approve/uploads, and only the backend reads them. Set its file
+--    size limit to PHOTO_MAX_UPLOAD_BYTES (10MB) and its allowed MIME types to
+--    image/jpeg, image/png, image/webp, image/avif.
+-- 2. Create a bucket named 'profile_photos' (PHOTO_BUCKET) and set it as Public.
+--    The backend writes the resized WebP/AVIF variants there with the service key.
+-- 3. Neither bucket needs anon or authenticated policies (see section 5).
 
 
 -- ### 5. ROW LEVEL SECURITY (RLS) ###
@@ -125,6 +222,8 @@ ALTER TABLE public.ratings ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.experience_votes ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.redeem_sessions ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.audit_log ENABLE ROW LEVEL SECURITY; -- Admins only
+ALTER TABLE public.profile_rating_stats ENABLE ROW LEVEL SECURITY; -- Backend only (service role)
+ALTER TABLE public.token_revocations ENABLE ROW LEVEL SECURITY; -- Backend only (service role)
 
 -- Get user ID from JWT
 CREATE OR REPLACE FUNCTION public.get_user_id_from_jwt()
@@ -203,16 +302,495 @@ TO authenticated
 WITH CHECK (user_id = public.get_user_id_from_jwt());
 
 
--- === Storage Policy for 'profile_photos' (Set in Supabase UI) ===
--- Go to Storage -> Policies -> 'profile_photos' bucket
--- POLICY: "Allow anonymous uploads"
--- OPERATION: INSERT
--- TARGET ROLE: anon
--- USING: (true) -- This is a security risk, but required for the "approve link" flow
--- A better way: Backend generates a signed upload URL.
--- For this build, we'll use the anon key on the frontend to upload.
+-- === Storage Policies ===
+-- None. Uploads to 'photo_uploads' go through signed upload URLs, which carry their
+-- own authorization, so the old "Allow anonymous uploads" INSERT policy for anon must
+-- be dropped (Storage -> Policies). 'profile_photos' is public, so reads need no policy.
+
+
+-- ### 6. AGGREGATE MAINTENANCE ###
+
+-- === profile_rating_stats ===
+-- Applies each ratings row change as a delta so reads never scan public.ratings.
+-- An upsert that updates an existing rating subtracts the OLD values and adds the NEW ones.
+CREATE OR REPLACE FUNCTION public.apply_rating_delta()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE public.profile_rating_stats SET
+            rating_count = rating_count - 1,
+            honesty_sum = honesty_sum - OLD.honesty,
+            communication_sum = communication_sum - OLD.communication,
+            accountability_sum = accountability_sum - OLD.accountability,
+            consistency_sum = consistency_sum - OLD.consistency,
+            drama_level_sum = drama_level_sum - OLD.drama_level,
+            updated_at = NOW()
+        WHERE profile_id = OLD.profile_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO public.profile_rating_stats AS s (
+            profile_id, rating_count, honesty_sum, communication_sum,
+            accountability_sum, consistency_sum, drama_level_sum
+        )
+        VALUES (
+            NEW.profile_id, 1, NEW.honesty, NEW.communication,
+            NEW.accountability, NEW.consistency, NEW.drama_level
+        )
+        ON CONFLICT (profile_id) DO UPDATE SET
+            rating_count = s.rating_count + 1,
+            honesty_sum = s.honesty_sum + EXCLUDED.honesty_sum,
+            communication_sum = s.communication_sum + EXCLUDED.communication_sum,
+            accountability_sum = s.accountability_sum + EXCLUDED.accountability_sum,
+            consistency_sum = s.consistency_sum + EXCLUDED.consistency_sum,
+            drama_level_sum = s.drama_level_sum + EXCLUDED.drama_level_sum,
+            updated_at = NOW();
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_ratings_stats ON public.ratings;
+CREATE TRIGGER trg_ratings_stats
+AFTER INSERT OR UPDATE OR DELETE ON public.ratings
+FOR EACH ROW EXECUTE FUNCTION public.apply_rating_delta();
+
+-- Backfill / rebuild from public.ratings (all profiles, or just one).
+-- Blocks rating writes while it runs so no delta is lost in between.
+-- Run via: flask --app app rebuild-rating-stats
+-- Returns a one-row table (not a scalar) so supabase-py sees a list: [{"rebuilt": n}].
+CREATE OR REPLACE FUNCTION public.rebuild_profile_rating_stats(p_profile_id UUID DEFAULT NULL)
+RETURNS TABLE (rebuilt INTEGER) AS $$
+BEGIN
+    LOCK TABLE public.ratings IN SHARE MODE;
+
+    DELETE FROM public.profile_rating_stats
+    WHERE p_profile_id IS NULL OR profile_id = p_profile_id;
+
+    INSERT INTO public.profile_rating_stats (
+        profile_id, rating_count, honesty_sum, communication_sum,
+        accountability_sum, consistency_sum, drama_level_sum
+    )
+    SELECT profile_id, COUNT(*), SUM(honesty), SUM(communication),
+           SUM(accountability), SUM(consistency), SUM(drama_level)
+    FROM public.ratings
+    WHERE p_profile_id IS NULL OR profile_id = p_profile_id
+    GROUP BY profile_id;
+
+    GET DIAGNOSTICS rebuilt = ROW_COUNT;
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Lists profiles whose stored stats differ from a full recompute (empty = in sync).
+-- Run via: flask --app app rebuild-rating-stats --verify
+CREATE OR REPLACE FUNCTION public.profile_rating_stats_drift()
+RETURNS TABLE (profile_id UUID, stored_count INTEGER, actual_count INTEGER) AS $$
+    WITH actual AS (
+        SELECT profile_id, COUNT(*)::INTEGER AS rating_count,
+               SUM(honesty) AS honesty_sum, SUM(communication) AS communication_sum,
+               SUM(accountability) AS accountability_sum, SUM(consistency) AS consistency_sum,
+               SUM(drama_level) AS drama_level_sum
+        FROM public.ratings
+        GROUP BY profile_id
+    )
+    SELECT COALESCE(s.profile_id, a.profile_id), COALESCE(s.rating_count, 0), COALESCE(a.rating_count, 0)
+    FROM public.profile_rating_stats s
+    FULL OUTER JOIN actual a ON a.profile_id = s.profile_id
+    WHERE (COALESCE(s.rating_count, 0), COALESCE(s.honesty_sum, 0), COALESCE(s.communication_sum, 0),
+           COALESCE(s.accountability_sum, 0), COALESCE(s.consistency_sum, 0), COALESCE(s.drama_level_sum, 0))
+          IS DISTINCT FROM
+          (COALESCE(a.rating_count, 0), COALESCE(a.honesty_sum, 0), COALESCE(a.communication_sum, 0),
+           COALESCE(a.accountability_sum, 0), COALESCE(a.consistency_sum, 0), COALESCE(a.drama_level_sum, 0));
+$$ LANGUAGE sql STABLE;
+
+
+-- === experiences.upvotes / downvotes ===
+-- Applies each vote change as a delta; flipping a vote moves it from one column to the other.
+CREATE OR REPLACE FUNCTION public.apply_vote_delta()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE public.experiences SET
+            upvotes = upvotes - (OLD.vote = 1)::INTEGER,
+            downvotes = downvotes - (OLD.vote = -1)::INTEGER
+        WHERE id = OLD.experience_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE public.experiences SET
+            upvotes = upvotes + (NEW.vote = 1)::INTEGER,
+            downvotes = downvotes + (NEW.vote = -1)::INTEGER
+        WHERE id = NEW.experience_id;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_experience_votes_tally ON public.experience_votes;
+CREATE TRIGGER trg_experience_votes_tally
+AFTER INSERT OR UPDATE OR DELETE ON public.experience_votes
+FOR EACH ROW EXECUTE FUNCTION public.apply_vote_delta();
+
+-- Backfill / rebuild vote tallies from public.experience_votes.
+-- Run via: flask --app app rebuild-vote-tallies
+CREATE OR REPLACE FUNCTION public.rebuild_experience_vote_tallies()
+RETURNS TABLE (rebuilt INTEGER) AS $$
+BEGIN
+    LOCK TABLE public.experience_votes IN SHARE MODE;
+
+    UPDATE public.experiences e SET
+        upvotes = COALESCE(v.upvotes, 0),
+        downvotes = COALESCE(v.downvotes, 0)
+    FROM public.experiences x
+    LEFT JOIN (
+        SELECT experience_id,
+               COUNT(*) FILTER (WHERE vote = 1) AS upvotes,
+               COUNT(*) FILTER (WHERE vote = -1) AS downvotes
+        FROM public.experience_votes
+        GROUP BY experience_id
+    ) v ON v.experience_id = x.id
+    WHERE e.id = x.id
+      AND (e.upvotes, e.downvotes) IS DISTINCT FROM (COALESCE(v.upvotes, 0), COALESCE(v.downvotes, 0));
+
+    GET DIAGNOSTICS rebuilt = ROW_COUNT;
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ### 7. READ FUNCTIONS (RPC) ###
+
+-- Everything profile.html needs in one round-trip: the approved profile (minus invite
+-- fields and search_vector), its approved experiences with author username and vote tallies (best score
+-- first, read off idx_experiences_profile_score), and average ratings.
+-- Returns [{"bundle": {...}}], or no rows if the profile does not exist or is not approved.
+-- Called via: supabase.rpc('get_profile_bundle', {'p_profile_id': ...})
+CREATE OR REPLACE FUNCTION public.get_profile_bundle(p_profile_id UUID)
+RETURNS TABLE (bundle JSONB) AS $$
+    SELECT (to_jsonb(p) - 'invite_token' - 'invite_token_expires_at' - 'search_vector')
+        || jsonb_build_object(
+            'experiences', COALESCE((
+                SELECT jsonb_agg(
+                    (to_jsonb(e) - 'search_vector') || jsonb_build_object('user', jsonb_build_object('username', u.username))
+                    ORDER BY e.score DESC, e.created_at DESC
+                )
+                FROM public.experiences e
+                JOIN public.users u ON u.id = e.user_id
+                WHERE e.profile_id = p.id AND e.moderation_status = 'approved'
+            ), '[]'::jsonb),
+            'average_ratings', jsonb_build_object(
+                'honesty', COALESCE(ROUND(s.honesty_sum::NUMERIC / NULLIF(s.rating_count, 0), 1), 0),
+                'communication', COALESCE(ROUND(s.communication_sum::NUMERIC / NULLIF(s.rating_count, 0), 1), 0),
+                'accountability', COALESCE(ROUND(s.accountability_sum::NUMERIC / NULLIF(s.rating_count, 0), 1), 0),
+                'consistency', COALESCE(ROUND(s.consistency_sum::NUMERIC / NULLIF(s.rating_count, 0), 1), 0),
+                'drama_level', COALESCE(ROUND(s.drama_level_sum::NUMERIC / NULLIF(s.rating_count, 0), 1), 0),
+                'count', COALESCE(s.rating_count, 0)
+            )
+        )
+    FROM public.female_profiles p
+    LEFT JOIN public.profile_rating_stats s ON s.profile_id = p.id
+    WHERE p.id = p_profile_id AND p.moderation_status = 'approved';
+$$ LANGUAGE sql STABLE;
+
+
+-- ### 8. FULL-TEXT SEARCH ###
+
+-- === search_vector maintenance ===
+-- Recomputed only when a searchable column is written, so vote tally updates on
+-- experiences don't re-parse the text. Names and tags weigh more than free text.
+CREATE OR REPLACE FUNCTION public.female_profiles_search_vector()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', COALESCE(NEW.display_name, '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(NEW.bio, '')), 'B');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_female_profiles_search_vector ON public.female_profiles;
+CREATE TRIGGER trg_female_profiles_search_vector
+BEFORE INSERT OR UPDATE OF display_name, bio ON public.female_profiles
+FOR EACH ROW EXECUTE FUNCTION public.female_profiles_search_vector();
+
+CREATE OR REPLACE FUNCTION public.experiences_search_vector()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', COALESCE((
+            SELECT string_agg(tag, ' ')
+            FROM jsonb_array_elements_text(CASE WHEN jsonb_typeof(NEW.tags) = 'array' THEN NEW.tags ELSE '[]'::jsonb END) AS tag
+        ), '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(NEW.experience_text, '')), 'B');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_experiences_search_vector ON public.experiences;
+CREATE TRIGGER trg_experiences_search_vector
+BEFORE INSERT OR UPDATE OF experience_text, tags ON public.experiences
+FOR EACH ROW EXECUTE FUNCTION public.experiences_search_vector();
+
+-- Backfill rows written before the triggers existed (a no-op on later runs)
+UPDATE public.female_profiles SET display_name = display_name WHERE search_vector IS NULL;
+UPDATE public.experiences SET experience_text = experience_text WHERE search_vector IS NULL;
+
+-- === search_profiles ===
+-- Approved profiles matching a web-style query (calm -late, "long distance", honest or kind)
+-- against their own name/bio or the text/tags of their approved experiences.
+-- rank = 2 x the profile's own ts_rank + 0.2 per matching experience (up to 5). Experiences
+-- are counted, not ts_rank'ed, so a common word costs an index scan rather than a rank
+-- per matching row. Rounded so the (rank, id) keyset stays stable across pages; pass
+-- the last row's rank and id as p_after_rank / p_after_id for the next page.
+-- Called via: supabase.rpc('search_profiles', {'p_query': ..., 'p_limit': ..., ...})
+DROP FUNCTION IF EXISTS public.search_profiles(TEXT, INTEGER, DOUBLE PRECISION, UUID); -- Return type changed
+CREATE OR REPLACE FUNCTION public.search_profiles(
+    p_query TEXT,
+    p_limit INTEGER DEFAULT 20,
+    p_after_rank DOUBLE PRECISION DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID, display_name TEXT, cover_photo TEXT, cover_variants JSONB, bio_snippet TEXT, created_at TIMESTAMPTZ,
+    rank DOUBLE PRECISION, matching_experiences INTEGER
+) AS $$
+    WITH q AS (
+        -- Nothing to look up in the index ("-late" alone) would rank every profile without the word
+        SELECT query FROM websearch_to_tsquery('english', p_query) AS query
+        WHERE querytree(query) <> 'T'
+    ),
+    profile_hits AS (
+        SELECT p.id, ts_rank(p.search_vector, q.query) AS rank
+        FROM public.female_profiles p, q
+        WHERE p.search_vector @@ q.query AND p.moderation_status = 'approved'
+    ),
+    experience_hits AS (
+        SELECT e.profile_id AS id, COUNT(*)::INTEGER AS matches
+        FROM public.experiences e, q
+        WHERE e.search_vector @@ q.query AND e.moderation_status = 'approved'
+        GROUP BY e.profile_id
+    ),
+    ranked AS (
+        SELECT COALESCE(ph.id, eh.id) AS id,
+               ROUND((2 * COALESCE(ph.rank, 0) + LEAST(COALESCE(eh.matches, 0), 5) * 0.2)::NUMERIC, 6)::DOUBLE PRECISION AS rank,
+               COALESCE(eh.matches, 0) AS matching_experiences
+        FROM profile_hits ph
+        FULL OUTER JOIN experience_hits eh ON eh.id = ph.id
+    )
+    SELECT p.id, p.display_name, p.cover_photo, p.cover_variants, p.bio_snippet, p.created_at, r.rank, r.matching_experiences
+    FROM ranked r
+    JOIN public.female_profiles p ON p.id = r.id AND p.moderation_status = 'approved'
+    WHERE p_after_rank IS NULL OR (r.rank, r.id) < (p_after_rank, p_after_id)
+    ORDER BY r.rank DESC, r.id DESC
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
+
+
+-- ### 9. MODERATION ###
+
+-- Set-based approve/reject for the admin moderation API: one UPDATE over up to
+-- hundreds of ids plus one audit_log row per changed row, in a single statement.
+-- Rows already in p_status are skipped. Returns the rows that changed, with the
+-- profile they belong to, so the app can invalidate its caches in one pass.
+-- Rating and vote aggregates don't depend on moderation status, so nothing to rebuild.
+-- Called via: supabase.rpc('moderate_experiences', {'p_ids': [...], 'p_status': 'approved', 'p_moderator_id': ...})
+CREATE OR REPLACE FUNCTION public.moderate_experiences(p_ids UUID[], p_status TEXT, p_moderator_id UUID)
+RETURNS TABLE (id UUID, profile_id UUID) AS $$
+    WITH changed AS (
+        UPDATE public.experiences e SET moderation_status = p_status
+        WHERE e.id = ANY(p_ids)
+          AND e.moderation_status <> p_status
+          AND p_status IN ('approved', 'rejected')
+        RETURNING e.id, e.profile_id
+    ),
+    audited AS (
+        INSERT INTO public.audit_log (user_id, action, target_table, target_id, details)
+        SELECT p_moderator_id, 'experience_' || p_status, 'experiences', c.id, jsonb_build_object('profile_id', c.profile_id)
+        FROM changed c
+    )
+    SELECT c.id, c.profile_id FROM changed c;
+$$ LANGUAGE sql;
+
+-- Same for profiles. An invite still waiting on the woman's consent (invite_token
+-- set), one that expired without it, or one whose photos are still being processed
+-- can never be approved from here.
+CREATE OR REPLACE FUNCTION public.moderate_female_profiles(p_ids UUID[], p_status TEXT, p_moderator_id UUID)
+RETURNS TABLE (id UUID, profile_id UUID) AS $$
+    WITH changed AS (
+        UPDATE public.female_profiles p SET moderation_status = p_status, updated_at = NOW()
+        WHERE p.id = ANY(p_ids)
+          AND p.moderation_status <> p_status
+          AND p.invite_token IS NULL
+          AND p.moderation_status NOT IN ('expired', 'processing')
+          AND p_status IN ('approved', 'rejected')
+        RETURNING p.id
+    ),
+    audited AS (
+        INSERT INTO public.audit_log (user_id, action, target_table, target_id)
+        SELECT p_moderator_id, 'profile_' || p_status, 'female_profiles', c.id
+        FROM changed c
+    )
+    SELECT c.id, c.id FROM changed c;
+$$ LANGUAGE sql;
+
+
+-- ### 10. EXPIRY REAPER ###
+-- Expiry used to be checked only when a token was presented, so expired rows stayed
+-- "live" forever. These run in bounded batches from the app's reaper green thread
+-- (or `flask --app app reap-expired`); SKIP LOCKED lets several workers reap at
+-- once without queueing behind each other.
+
+-- Deactivates up to p_limit active redeem sessions past expires_at, oldest first
+-- (idx_sessions_active_expires). Returns their rooms so live calls can be torn down.
+-- Called via: supabase.rpc('deactivate_expired_sessions', {'p_limit': 500})
+CREATE OR REPLACE FUNCTION public.deactivate_expired_sessions(p_limit INT DEFAULT 500)
+RETURNS TABLE (room_name TEXT) AS $$
+    UPDATE public.redeem_sessions s SET is_active = FALSE
+    WHERE s.id IN (
+        SELECT x.id FROM public.redeem_sessions x
+        WHERE x.is_active AND x.expires_at < NOW()
+        ORDER BY x.expires_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING s.room_name;
+$$ LANGUAGE sql;
+
+-- Deletes up to p_limit inactive sessions that expired before p_expired_before
+-- (idx_sessions_inactive_expires), so the token and room indexes shrink too.
+CREATE OR REPLACE FUNCTION public.purge_redeem_sessions(p_expired_before TIMESTAMPTZ, p_limit INT DEFAULT 500)
+RETURNS TABLE (purged INTEGER) AS $$
+    WITH gone AS (
+        DELETE FROM public.redeem_sessions s
+        WHERE s.id IN (
+            SELECT x.id FROM public.redeem_sessions x
+            WHERE NOT x.is_active AND x.expires_at < p_expired_before
+            ORDER BY x.expires_at
+            LIMIT p_limit
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM gone;
+$$ LANGUAGE sql;
+
+-- Burns up to p_limit invite tokens past invite_token_expires_at (idx_profiles_invite_expires).
+-- The profile never got the woman's consent, so it moves to 'expired' rather than into
+-- the moderation queue; it is kept, not deleted, because experiences may point at it.
+CREATE OR REPLACE FUNCTION public.expire_profile_invites(p_limit INT DEFAULT 500)
+RETURNS TABLE (id UUID) AS $$
+    WITH expired AS (
+        UPDATE public.female_profiles p SET
+            invite_token = NULL,
+            invite_token_expires_at = NULL,
+            moderation_status = 'expired',
+            updated_at = NOW()
+        WHERE p.id IN (
+            SELECT x.id FROM public.female_profiles x
+            WHERE x.invite_token IS NOT NULL AND x.invite_token_expires_at < NOW()
+            ORDER BY x.invite_token_expires_at
+            LIMIT p_limit
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING p.id
+    ),
+    audited AS (
+        INSERT INTO public.audit_log (user_id, action, target_table, target_id)
+        SELECT NULL::UUID, 'profile_invite_expired', 'female_profiles', e.id
+        FROM expired e
+    )
+    SELECT e.id FROM expired e;
+$$ LANGUAGE sql;
+
+
+-- ### 11. TOKEN REVOCATION ###
+-- JWTs carry the user's token_version as `ver` (and is_admin as `adm`), so the app
+-- authorizes requests without reading users. Anything that must invalidate
+-- outstanding tokens bumps token_version; this trigger records the bump in
+-- token_revocations, which every app process polls (idx_token_revocations_revoked_at).
+-- Changing is_admin or the password bumps it too, so stale `adm` claims and tokens
+-- from before a password change stop working. Deleting a user revokes everything.
+CREATE OR REPLACE FUNCTION public.users_revoke_tokens()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        INSERT INTO public.token_revocations (user_id, min_token_version, revoked_at)
+        VALUES (OLD.id, 2147483647, NOW())
+        ON CONFLICT (user_id) DO UPDATE SET
+            min_token_version = EXCLUDED.min_token_version, revoked_at = EXCLUDED.revoked_at;
+        RETURN OLD;
+    END IF;
+
+    IF NEW.is_admin IS DISTINCT FROM OLD.is_admin OR NEW.password_hash IS DISTINCT FROM OLD.password_hash THEN
+        NEW.token_version := GREATEST(NEW.token_version, OLD.token_version + 1);
+    END IF;
+    IF NEW.token_version > OLD.token_version THEN
+        INSERT INTO public.token_revocations (user_id, min_token_version, revoked_at)
+        VALUES (NEW.id, NEW.token_version, NOW())
+        ON CONFLICT (user_id) DO UPDATE SET
+            min_token_version = EXCLUDED.min_token_version, revoked_at = EXCLUDED.revoked_at;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_users_revoke_tokens ON public.users;
+CREATE TRIGGER trg_users_revoke_tokens
+BEFORE UPDATE OR DELETE ON public.users
+FOR EACH ROW EXECUTE FUNCTION public.users_revoke_tokens();
+
+-- "Sign out everywhere": every token issued to the user so far stops working.
+-- Returns the new version (no rows if the user does not exist).
+-- Called via: supabase.rpc('revoke_user_tokens', {'p_user_id': ...})
+CREATE OR REPLACE FUNCTION public.revoke_user_tokens(p_user_id UUID)
+RETURNS TABLE (token_version INTEGER) AS $$
+    UPDATE public.users u SET token_version = u.token_version + 1
+    WHERE u.id = p_user_id
+    RETURNING u.token_version;
+$$ LANGUAGE sql;
+
 
--- POLICY: "Allow authenticated read"
--- OPERATION: SELECT
--- TARGET ROLE: authenticated
--- USING: (true) -- All authenticated users can see photos
\ No newline at end of file
+-- ### 12. BULK EXPORT ###
+-- One page of the admin NDJSON export (/api/export): approved profiles, oldest first,
+-- with their rating averages (same shape as get_profile_bundle's) and how many approved
+-- experiences they have. The app walks the whole table by passing the last row's
+-- created_at and id as p_after_created_at / p_after_id, so every page is an index
+-- range scan on idx_profiles_status_created (read backwards) and a count per profile
+-- on idx_experiences_profile_score, however deep into the export it is. The first
+-- page compares against the lowest possible key rather than OR-ing in an IS NULL
+-- test, which would keep the planner from using the range at all. Keep p_limit
+-- at or below the API's max rows setting (1000 by default on Supabase).
+-- Called via: supabase.rpc('export_profiles', {'p_limit': 1000, 'p_after_created_at': ..., 'p_after_id': ...})
+CREATE OR REPLACE FUNCTION public.export_profiles(
+    p_limit INTEGER DEFAULT 1000,
+    p_after_created_at TIMESTAMPTZ DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    id UUID, display_name TEXT, bio TEXT, photos JSONB, created_at TIMESTAMPTZ, updated_at TIMESTAMPTZ,
+    experience_count INTEGER, average_ratings JSONB
+) AS $$
+    SELECT p.id, p.display_name, p.bio, p.photos, p.created_at, p.updated_at,
+        (
+            SELECT COUNT(*)::INTEGER FROM public.experiences e
+            WHERE e.profile_id = p.id AND e.moderation_status = 'approved'
+        ),
+        jsonb_build_object(
+            'honesty', COALESCE(ROUND(s.honesty_sum::NUMERIC / NULLIF(s.rating_count, 0), 1), 0),
+            'communication', COALESCE(ROUND(s.communication_sum::NUMERIC / NULLIF(s.rating_count, 0), 1), 0),
+            'accountability', COALESCE(ROUND(s.accountability_sum::NUMERIC / NULLIF(s.rating_count, 0), 1), 0),
+            'consistency', COALESCE(ROUND(s.consistency_sum::NUMERIC / NULLIF(s.rating_count, 0), 1), 0),
+            'drama_level', COALESCE(ROUND(s.drama_level_sum::NUMERIC / NULLIF(s.rating_count, 0), 1), 0),
+            'count', COALESCE(s.rating_count, 0)
+        )
+    FROM public.female_profiles p
+    LEFT JOIN public.profile_rating_stats s ON s.profile_id = p.id
+    WHERE p.moderation_status = 'approved'
+      AND (p.created_at, p.id) > (
+          COALESCE(p_after_created_at, '-infinity'), COALESCE(p_after_id, '00000000-0000-0000-0000-000000000000')
+      )
+    ORDER BY p.created_at, p.id
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
@@ -6,7 +6,10 @@ const SUPABASE_ANON_KEY = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJpc3MiOiJzdXBh
 // !! ----------------- !!
 
 // Initialize Socket.IO connection
-const socket = io(API_BASE_URL);
+// WebSocket only: long-polling needs sticky sessions, which we don't have once
+// the backend runs several workers/machines behind the Socket.IO message queue.
+// Not connected until a page sets socket.auth: the server refuses anonymous sockets.
+const socket = io(API_BASE_URL, { transports: ['websocket'], autoConnect: false });
 
 // Initialize Supabase client
 const supabaseClient = window.supabase.createClient(SUPABASE_URL, SUPABASE_ANON_KEY);
@@ -54,8 +57,11 @@ class API {
                 if (response.status === 401 && useAuth) {
                     this.logout();
                 }
-                // Pass the error message from the backend
-                throw new Error(data.error || `HTTP error! status: ${response.status}`);
+                // Pass the error message (and the full body, e.g. PII match spans) from the backend
+                const error = new Error(data.error || `HTTP error! status: ${response.status}`);
+                error.status = response.status;
+                error.data = data;
+                throw error;
             }
             
             return data;
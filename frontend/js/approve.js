@@ -56,24 +56,24 @@ async function handleSubmitApproval(e) {
         return;
     }
 
-    // 1. Upload photos to Supabase Storage
+    // 1. Ask the backend for one signed upload URL per photo, then PUT each file
+    // straight to storage. The backend strips EXIF and makes the thumbnails.
     uploadStatus.textContent = 'Uploading photos...';
-    const photoUrls = [];
+    const uploadKeys = [];
     try {
-        for (const file of files) {
-            const fileName = `${Date.now()}-${file.name}`;
-            const { data, error } = await supabase.storage
-                .from('profile_photos') // Bucket name
-                .upload(fileName, file);
-            
-            if (error) throw error;
+        const fileList = Array.from(files);
+        const { uploads } = await api.request(`/public/approve/uploads?token=${token}`, 'POST', {
+            files: fileList.map(file => ({ content_type: file.type, size: file.size }))
+        }, false);
 
-            // Get public URL
-            const { data: urlData } = supabase.storage
-                .from('profile_photos')
-                .getPublicUrl(fileName);
-            
-            photoUrls.push(urlData.publicUrl);
+        for (const [i, upload] of uploads.entries()) {
+            const response = await fetch(upload.upload_url, {
+                method: 'PUT',
+                headers: { 'Content-Type': upload.content_type },
+                body: fileList[i]
+            });
+            if (!response.ok) throw new Error(`upload of ${fileList[i].name} failed (${response.status})`);
+            uploadKeys.push(upload.key);
         }
         uploadStatus.textContent = 'Upload complete!';
     } catch (error) {
@@ -83,11 +83,11 @@ async function handleSubmitApproval(e) {
         return;
     }
 
-    // 2. Submit bio and URLs to backend
+    // 2. Submit bio and upload keys to backend
     try {
         const payload = {
             bio: bio,
-            photos: photoUrls
+            uploads: uploadKeys
         };
         const result = await api.request(`/public/approve/complete?token=${token}`, 'POST', payload, false);
         showMessage('Success!', result.message);
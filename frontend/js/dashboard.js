@@ -12,20 +12,59 @@ document.addEventListener('DOMContentLoaded', () => {
     logoutBtn.addEventListener('click', () => api.logout());
 
     // Load Profiles
+    document.getElementById('load-more-btn').addEventListener('click', loadProfiles);
+    document.getElementById('search-form').addEventListener('submit', handleSearch);
     loadProfiles();
 });
 
+let nextCursor = null;
+let searchQuery = '';
+
+function handleSearch(e) {
+    e.preventDefault();
+    // An empty box goes back to the newest-first listing
+    searchQuery = document.getElementById('search-input').value.trim();
+    nextCursor = null;
+    loadProfiles();
+}
+
+// Pixel width of a card's cover photo on this screen. Cards are at least 280px
+// wide with 1.5rem gaps (.profile-grid), so the API can send the smallest
+// variant that still fills one instead of the original upload.
+function cardPhotoWidth() {
+    const gridWidth = document.getElementById('profile-grid').clientWidth || 280;
+    const gap = 24;
+    const columns = Math.max(1, Math.floor((gridWidth + gap) / (280 + gap)));
+    const cardWidth = (gridWidth - (columns - 1) * gap) / columns;
+    return Math.round(cardWidth * (window.devicePixelRatio || 1));
+}
+
+function profilesEndpoint() {
+    const params = new URLSearchParams();
+    if (searchQuery) params.set('q', searchQuery);
+    if (nextCursor) params.set('cursor', nextCursor);
+    params.set('photo_width', cardPhotoWidth());
+    const query = params.toString();
+    return (searchQuery ? '/api/search' : '/api/profiles') + (query ? `?${query}` : '');
+}
+
 async function loadProfiles() {
     const grid = document.getElementById('profile-grid');
+    const loadMoreBtn = document.getElementById('load-more-btn');
     try {
-        const profiles = await api.request('/api/profiles', 'GET');
+        const page = await api.request(profilesEndpoint(), 'GET');
+        const cards = page.profiles.map(profile => createProfileCard(profile)).join('');
 
-        if (profiles.length === 0) {
-            grid.innerHTML = '<p>No approved profiles found yet.</p>';
-            return;
+        if (!nextCursor) {
+            const empty = searchQuery ? '<p>No profiles match your search.</p>' : '<p>No approved profiles found yet.</p>';
+            grid.innerHTML = page.profiles.length === 0 ? empty : cards;
+        } else {
+            grid.insertAdjacentHTML('beforeend', cards);
         }
 
-        grid.innerHTML = profiles.map(profile => createProfileCard(profile)).join('');
+        // Only show "Load more" while the API reports another page
+        nextCursor = page.next_cursor;
+        loadMoreBtn.style.display = nextCursor ? 'block' : 'none';
 
     } catch (error) {
         grid.innerHTML = `<p class="error-message">Failed to load profiles: ${error.message}</p>`;
@@ -33,12 +72,15 @@ async function loadProfiles() {
 }
 
 function createProfileCard(profile) {
-    const firstPhoto = (profile.photos && profile.photos.length > 0) ? profile.photos[0] : 'https://via.placeholder.com/300x200?text=No+Photo';
-    const bioSnippet = profile.bio ? profile.bio.substring(0, 100) + '...' : 'No bio provided.';
+    const firstPhoto = profile.cover_photo || 'https://via.placeholder.com/300x200?text=No+Photo';
+    const bioSnippet = profile.bio_snippet ? profile.bio_snippet + '...' : 'No bio provided.';
 
     return `
         <a href="profile.html?id=${profile.id}" class="profile-card">
-            <img src="${firstPhoto}" alt="${profile.display_name}">
+            <picture>
+                ${profile.cover_photo_avif ? `<source srcset="${profile.cover_photo_avif}" type="image/avif">` : ''}
+                <img src="${firstPhoto}" alt="${profile.display_name}" loading="lazy">
+            </picture>
             <div class="profile-card-body">
                 <h3>${profile.display_name}</h3>
                 <p>${bioSnippet}</p>
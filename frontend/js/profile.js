@@ -1,4 +1,10 @@
 let profileId = null;
+const RATING_KEYS = ['honesty', 'communication', 'accountability', 'consistency', 'drama_level'];
+// Ratings are written in the background (see WRITE_QUEUE_FLUSH_MS on the server), so a
+// reload right after submitting may not include them yet. The summary is updated locally
+// instead: averageRatings is the last one shown, myRating what this page last submitted.
+let averageRatings = null;
+let myRating = null;
 
 document.addEventListener('DOMContentLoaded', () => {
     // Auth check
@@ -27,6 +33,53 @@ document.addEventListener('DOMContentLoaded', () => {
     document.getElementById('rating-form').addEventListener('submit', handlePostRating);
 });
 
+// A processed photo has WebP (and usually AVIF) variants at several widths; let the
+// browser pick the one that fits. Profiles from before the photo pipeline hold plain URLs.
+function renderPhoto(photo) {
+    if (typeof photo === 'string') {
+        return `<img src="${photo}" alt="Profile photo">`;
+    }
+    const sizes = '(max-width: 768px) 100vw, 33vw';
+    const srcset = format => photo.variants
+        .filter(v => v.format === format)
+        .map(v => `${v.url} ${v.width}w`)
+        .join(', ');
+    const avif = srcset('avif');
+    const fallback = photo.variants.find(v => v.format === 'webp') || photo.variants[0];
+    return `
+        <picture>
+            ${avif ? `<source type="image/avif" srcset="${avif}" sizes="${sizes}">` : ''}
+            <img src="${fallback.url}" srcset="${srcset('webp')}" sizes="${sizes}"
+                 width="${photo.width}" height="${photo.height}" alt="Profile photo" loading="lazy">
+        </picture>
+    `;
+}
+
+function renderRatings(avg) {
+    averageRatings = avg;
+    document.getElementById('ratings-summary').innerHTML = `
+        <div class="rating-item"><span>Honesty:</span> <span>${avg.honesty}/5</span></div>
+        <div class="rating-item"><span>Communication:</span> <span>${avg.communication}/5</span></div>
+        <div class="rating-item"><span>Accountability:</span> <span>${avg.accountability}/5</span></div>
+        <div class="rating-item"><span>Consistency:</span> <span>${avg.consistency}/5</span></div>
+        <div class="rating-item"><span>Drama Level:</span> <span>${avg.drama_level}/5</span></div>
+        <div class="rating-item" style="margin-top: 10px; color: var(--text-muted);"><span>Total Ratings:</span> <span>${avg.count}</span></div>
+    `;
+}
+
+// The summary with `rating` applied the way the server will: it replaces this page's
+// earlier rating, if any, or counts as a new one. A rating made on an earlier visit
+// shows up as an extra count until the next load.
+function withRating(avg, previous, rating) {
+    const count = avg.count + (previous ? 0 : 1);
+    const next = { count };
+    for (const key of RATING_KEYS) {
+        const sum = avg[key] * avg.count - (previous ? previous[key] : 0) + rating[key];
+        next[key] = Math.round(sum / count * 10) / 10;
+    }
+    return next;
+}
+
 async function loadProfileDetails() {
     try {
         const profile = await api.request(`/api/profiles/${profileId}`);
@@ -38,22 +91,14 @@ async function loadProfileDetails() {
         // Render Photos
         const photosContainer = document.getElementById('profile-photos');
         if (profile.photos && profile.photos.length > 0) {
-            photosContainer.innerHTML = profile.photos.map(url => `<img src="${url}" alt="Profile photo">`).join('');
+            photosContainer.innerHTML = profile.photos.map(renderPhoto).join('');
         } else {
             photosContainer.innerHTML = '<img src="https://via.placeholder.com/300x400?text=No+Photo" alt="No photo">';
         }
 
         // Render Ratings
-        const ratingsContainer = document.getElementById('ratings-summary');
-        const avg = profile.average_ratings;
-        ratingsContainer.innerHTML = `
-            <div class="rating-item"><span>Honesty:</span> <span>${avg.honesty}/5</span></div>
-            <div class="rating-item"><span>Communication:</span> <span>${avg.communication}/5</span></div>
-            <div class="rating-item"><span>Accountability:</span> <span>${avg.accountability}/5</span></div>
-            <div class="rating-item"><span>Consistency:</span> <span>${avg.consistency}/5</span></div>
-            <div class="rating-item"><span>Drama Level:</span> <span>${avg.drama_level}/5</span></div>
-            <div class="rating-item" style="margin-top: 10px; color: var(--text-muted);"><span>Total Ratings:</span> <span>${avg.count}</span></div>
-        `;
+        myRating = null;
+        renderRatings(profile.average_ratings);
 
         // Render Experiences
         const experiencesContainer = document.getElementById('experiences-list');
@@ -75,7 +120,7 @@ function createExperiencePost(exp) {
             <p class="experience-meta">By <span>${exp.user.username}</span> on ${postDate}</p>
             <p>${exp.experience_text}</p>
             <div class="experience-votes">
-                <span>Accuracy:</span>
+                <span>Accuracy: ${exp.score} (${exp.upvotes} ▲ / ${exp.downvotes} ▼)</span>
                 <button class="vote-btn" onclick="handleVote('${exp.id}', 1)">▲ Upvote</button>
                 <button class="vote-btn" onclick="handleVote('${exp.id}', -1)">▼ Downvote</button>
                 </div>
@@ -83,11 +128,32 @@ function createExperiencePost(exp) {
     `;
 }
 
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+function renderPiiPreview(text, matches) {
+    // Server offsets count Unicode code points, so slice by code point, not UTF-16 unit
+    const chars = Array.from(text);
+    let html = '';
+    let pos = 0;
+    for (const match of matches) {
+        html += escapeHtml(chars.slice(pos, match.start).join(''));
+        html += `<mark title="${match.kind.replace('_', ' ')}">${escapeHtml(chars.slice(match.start, match.end).join(''))}</mark>`;
+        pos = match.end;
+    }
+    return html + escapeHtml(chars.slice(pos).join(''));
+}
+
 async function handlePostExperience(e) {
     e.preventDefault();
     const errorEl = document.getElementById('experience-error');
+    const previewEl = document.getElementById('experience-pii-preview');
     const text = document.getElementById('experience-text').value;
     errorEl.textContent = '';
+    previewEl.style.display = 'none';
 
     try {
         await api.request(`/api/profiles/${profileId}/experience`, 'POST', { experience_text: text });
@@ -96,6 +162,10 @@ async function handlePostExperience(e) {
         // Note: Post won't appear until re-load and approved
     } catch (error) {
         errorEl.textContent = error.message;
+        if (error.data && error.data.matches) {
+            previewEl.innerHTML = renderPiiPreview(text, error.data.matches);
+            previewEl.style.display = 'block';
+        }
     }
 }
 
@@ -105,18 +175,17 @@ async function handlePostRating(e) {
     errorEl.textContent = '';
     
     try {
-        const rating = {
-            honesty: parseInt(document.getElementById('rating-honesty').value),
-            communication: parseInt(document.getElementById('rating-communication').value),
-            accountability: parseInt(document.getElementById('rating-accountability').value),
-            consistency: parseInt(document.getElementById('rating-consistency').value),
-            drama_level: parseInt(document.getElementById('rating-drama_level').value),
-        };
+        const rating = {};
+        for (const key of RATING_KEYS) {
+            rating[key] = parseInt(document.getElementById(`rating-${key}`).value);
+        }
 
         await api.request(`/api/profiles/${profileId}/rating`, 'POST', rating);
         errorEl.textContent = 'Rating submitted/updated!';
-        // Reload ratings
-        loadProfileDetails(); 
+        if (averageRatings) {
+            renderRatings(withRating(averageRatings, myRating, rating));
+        }
+        myRating = rating;
     } catch (error) {
         errorEl.textContent = error.message;
     }
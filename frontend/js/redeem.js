@@ -44,7 +44,9 @@ document.addEventListener('DOMContentLoaded', async () => {
         // 3. Setup Socket.IO listeners
         setupSocketListeners();
         
-        // 4. Join the room
+        // 4. Connect (the woman with her redeem token, a man with his JWT) and join the room
+        socket.auth = womanToken ? { session_token: womanToken } : { token: manToken };
+        socket.connect();
         socket.emit('join_room', { room_name: roomName });
         callStatus.textContent = `In room: ${roomName}`;
 
@@ -91,6 +93,32 @@ function setupSocketListeners() {
         }
     });
 
+    // The server refused the connection itself (missing, invalid or revoked credentials)
+    socket.on('connect_error', (error) => {
+        callStatus.textContent = `Error: ${error.message}`;
+    });
+
+    // An offer/answer was too large to relay
+    socket.on('signaling_error', (data) => {
+        console.error('Signaling error:', data.error);
+    });
+
+    // The server refused to let us into the room (expired, unknown or full)
+    socket.on('join_error', (data) => {
+        callStatus.textContent = `Error: ${data.error}`;
+    });
+
+    // The session ran out and the server closed the room
+    socket.on('room_expired', () => {
+        callStatus.textContent = 'This session has expired. The call has ended.';
+        peerManager.closeAllPeers();
+        remoteVideo.srcObject = null;
+        if (localStream) {
+            localStream.getTracks().forEach(track => track.stop());
+        }
+        socket.disconnect();
+    });
+
     // --- WebRTC Signaling ---
     socket.on('webrtc_offer', (data) => {
         // This is only received by the man
@@ -112,6 +140,10 @@ function setupSocketListeners() {
     socket.on('webrtc_ice_candidate', (data) => {
         peerManager.handleIceCandidate(data.candidate, data.sender_sid);
     });
+
+    socket.on('webrtc_ice_candidates', (data) => {
+        peerManager.handleIceCandidates(data.candidates, data.sender_sid, data.done);
+    });
     
     // --- Stream Handling ---
     peerManager.onRemoteStream((stream, sid) => {
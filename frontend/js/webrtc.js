@@ -7,11 +7,16 @@ const ICE_SERVERS = [
     { urls: 'stun:stun1.l.google.com:19302' },
 ];
 
+// Local candidates are sent in batches: one 'webrtc_ice_candidates' message per
+// peer every ICE_BATCH_MS, or immediately once gathering is complete.
+const ICE_BATCH_MS = 20;
+
 class PeerConnectionManager {
     constructor(localStream, socket) {
         this.localStream = localStream;
         this.socket = socket;
         this.peerConnections = {}; // Stores { sid: RTCPeerConnection }
+        this.pendingCandidates = {}; // Stores { sid: { candidates: [], timer } }
         this.onRemoteStreamCallback = null;
     }
 
@@ -76,13 +81,21 @@ class PeerConnectionManager {
         }
     }
 
-    // Called when an ICE candidate is received
+    // Called when a batch of ICE candidates is received; done marks the end of the sender's gathering
+    handleIceCandidates(candidates, senderSid, done) {
+        candidates.forEach(candidate => this.handleIceCandidate(candidate, senderSid));
+        if (done) {
+            this.handleIceCandidate(null, senderSid);
+        }
+    }
+
+    // Called when an ICE candidate is received; null signals end-of-candidates
     handleIceCandidate(candidate, senderSid) {
         // console.log(`Handling ICE candidate from ${senderSid}`);
         const pc = this.peerConnections[senderSid];
         if (pc) {
             try {
-                pc.addIceCandidate(new RTCIceCandidate(candidate));
+                pc.addIceCandidate(candidate ? new RTCIceCandidate(candidate) : null);
             } catch (error) {
                 console.error(`Error adding ICE candidate:`, error);
             }
@@ -98,12 +111,8 @@ class PeerConnectionManager {
         const pc = new RTCPeerConnection({ iceServers: ICE_SERVERS });
         
         pc.onicecandidate = (event) => {
-            if (event.candidate) {
-                this.socket.emit('webrtc_ice_candidate', {
-                    target_sid: targetSid,
-                    candidate: event.candidate
-                });
-            }
+            // A null candidate means gathering is complete
+            this.queueIceCandidate(targetSid, event.candidate);
         };
 
         pc.ontrack = (event) => {
@@ -124,11 +133,47 @@ class PeerConnectionManager {
         return pc;
     }
 
+    queueIceCandidate(targetSid, candidate) {
+        let pending = this.pendingCandidates[targetSid];
+        if (!pending) {
+            pending = this.pendingCandidates[targetSid] = { candidates: [], timer: null };
+        }
+        if (candidate) {
+            pending.candidates.push(candidate);
+            if (!pending.timer) {
+                pending.timer = setTimeout(() => this.flushIceCandidates(targetSid, false), ICE_BATCH_MS);
+            }
+        } else {
+            this.flushIceCandidates(targetSid, true);
+        }
+    }
+
+    flushIceCandidates(targetSid, done) {
+        const pending = this.pendingCandidates[targetSid];
+        if (!pending) {
+            return;
+        }
+        clearTimeout(pending.timer);
+        pending.timer = null;
+        if (pending.candidates.length > 0 || done) {
+            this.socket.emit('webrtc_ice_candidates', {
+                target_sid: targetSid,
+                candidates: pending.candidates,
+                done
+            });
+        }
+        pending.candidates = [];
+    }
+
     onRemoteStream(callback) {
         this.onRemoteStreamCallback = callback;
     }
 
     closePeer(sid) {
+        if (this.pendingCandidates[sid]) {
+            clearTimeout(this.pendingCandidates[sid].timer);
+            delete this.pendingCandidates[sid];
+        }
         if (this.peerConnections[sid]) {
             this.peerConnections[sid].close();
             delete this.peerConnections[sid];